@@ -0,0 +1,104 @@
+import abc
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactSink(object):
+    """Destination of intermediate frames (instructions, features, indicator inputs) traced during a run."""
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, run: str = None):
+        # per process default keeps parallel workers from overwriting each other
+        self.run = run if run is not None else "{}_{}".format(datetime.now().strftime("%Y%m%d_%H%M%S"), os.getpid())
+
+    @abc.abstractmethod
+    def write(self, name: str, data: pd.DataFrame):
+        pass
+
+
+class MemoryArtifactSink(ArtifactSink):
+    """Keeps copies of latest artifact per name, oldest names dropped over max_items."""
+
+    def __init__(self, run: str = None, max_items=1000):
+        super(MemoryArtifactSink, self).__init__(run)
+        self.max_items = max_items
+        self.items = OrderedDict()
+
+    def write(self, name: str, data: pd.DataFrame):
+        self.items.pop(name, None)
+        self.items[name] = data.copy()
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+    def get(self, name: str) -> pd.DataFrame:
+        return self.items.get(name)
+
+    def names(self) -> list:
+        return list(self.items.keys())
+
+
+class DiskArtifactSink(ArtifactSink):
+    """Pickles every artifact as <base_dir>/<run>/<name>.pkl."""
+    Suffix = ".pkl"
+
+    def __init__(self, base_dir: str, run: str = None):
+        super(DiskArtifactSink, self).__init__(run)
+        self.base_dir = base_dir
+        self.run_dir = os.path.join(base_dir, self.run)
+        if not os.path.exists(self.run_dir):
+            os.makedirs(self.run_dir)
+
+    def write(self, name: str, data: pd.DataFrame):
+        self.save(data, self.name_to_path(name))
+
+    def save(self, data: pd.DataFrame, file_path: str):
+        data.to_pickle(file_path)
+
+    def read(self, name: str) -> pd.DataFrame:
+        return pd.read_pickle(self.name_to_path(name))
+
+    def name_to_path(self, name: str):
+        return os.path.join(self.run_dir, name + self.Suffix)
+
+
+class CsvArtifactSink(DiskArtifactSink):
+    """Readable <base_dir>/<run>/<name>.csv files, same content as former dump files."""
+    Suffix = ".csv"
+
+    def save(self, data: pd.DataFrame, file_path: str):
+        data.to_csv(file_path)
+
+    def read(self, name: str) -> pd.DataFrame:
+        return pd.read_csv(self.name_to_path(name), index_col=0, parse_dates=True)
+
+
+class Artifacts(object):
+    """Opt-in tracing of intermediate frames, nothing is kept or written unless a sink is enabled."""
+    sink = None
+
+    @staticmethod
+    def enable(sink: ArtifactSink = None) -> ArtifactSink:
+        """Route artifacts to sink, in memory if not specified"""
+        Artifacts.sink = sink if sink is not None else MemoryArtifactSink()
+        logger.info("Tracing artifacts of run %s to %s", Artifacts.sink.run, type(Artifacts.sink).__name__)
+        return Artifacts.sink
+
+    @staticmethod
+    def disable():
+        Artifacts.sink = None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return Artifacts.sink is not None
+
+    @staticmethod
+    def write(name: str, data: pd.DataFrame):
+        sink = Artifacts.sink
+        if sink is not None:
+            sink.write(name, data)
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from PortfolioBasic.MachineLearning.SimpleAlgoTrader import BaseAlgoTrader
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStore(object):
+    """Trained algo traders pickled as <base_dir>/<name>.pkl together with trader fingerprint (type, indicators
+    and parameters), training window and training data hash. Stored trader is reused instead of retraining while
+    fingerprint and data are unchanged."""
+    DataSuffix = ".pkl"
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self.loads = 0
+        self.trains = 0
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+
+    @staticmethod
+    def get_data_hash(data: pd.DataFrame) -> str:
+        """Content hash of data values, index and columns"""
+        digest = hashlib.sha1(repr(list(data.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        return digest.hexdigest()
+
+    def train(self, name: str, algo: BaseAlgoTrader, data: pd.DataFrame) -> BaseAlgoTrader:
+        """Stored trader if it was trained by same configuration on same data, otherwise algo trained on data
+        and stored"""
+        data_hash = ModelStore.get_data_hash(data)
+        stored = self.load(name, algo.fingerprint(), data_hash)
+        if stored is not None:
+            return stored
+        logger.info("Training model %s on %d rows", name, len(data))
+        algo.train(data)
+        self.trains += 1
+        self.save(name, algo, data, data_hash)
+        return algo
+
+    def load(self, name: str, fingerprint: str, data_hash: str):
+        """Stored trader with matching fingerprint and data hash or None"""
+        record = self.get_record(name)
+        if record is None:
+            return None
+        if record['fingerprint'] != fingerprint or record['data_hash'] != data_hash:
+            logger.info("Stored model %s is outdated", name)
+            return None
+        self.loads += 1
+        logger.info("Loaded model %s trained %s - %s", name, record['start'], record['end'])
+        return record['algo']
+
+    def save(self, name: str, algo: BaseAlgoTrader, data: pd.DataFrame, data_hash: str = None):
+        record = dict(fingerprint=algo.fingerprint(),
+                      data_hash=data_hash if data_hash is not None else ModelStore.get_data_hash(data),
+                      start=data.index[0] if len(data) > 0 else None,
+                      end=data.index[-1] if len(data) > 0 else None,
+                      algo=algo)
+        # written next to target and renamed, readers never see partial file
+        handle, temp_path = tempfile.mkstemp(suffix=ModelStore.DataSuffix, dir=self.base_dir)
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                pickle.dump(record, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.name_to_path(name))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def get_record(self, name: str):
+        """Stored fingerprint, data_hash, start, end and algo of name or None"""
+        file_path = self.name_to_path(name)
+        if not os.path.isfile(file_path):
+            return None
+        try:
+            with open(file_path, 'rb') as file:
+                return pickle.load(file)
+        except Exception as e:
+            logger.warning("Stored model %s can't be loaded: %s", name, e)
+            return None
+
+    def remove(self, name: str):
+        file_path = self.name_to_path(name)
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+    def name_to_path(self, name: str) -> str:
+        return os.path.join(self.base_dir, name + ModelStore.DataSuffix)
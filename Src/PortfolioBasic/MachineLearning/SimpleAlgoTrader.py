@@ -1,10 +1,14 @@
 import abc
 import math
+from collections import deque
+
 import pandas as pd
 from sklearn import linear_model
 from sklearn.preprocessing import StandardScaler
 
+from PortfolioBasic.Artifacts import Artifacts
 from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
 from PortfolioBasic.Technical.Indicators import CombinedIndicator
 import numpy as np
 
@@ -24,17 +28,35 @@ class BaseAlgoTrader(object):
     def predict(self, data: pd.DataFrame):
         pass
 
+    def fingerprint(self) -> str:
+        """Trader type with indicators and parameters, equal for traders fitting same model on same data"""
+        parameters = ["{}={}".format(name, value) for name, value in sorted(self.get_parameters().items())]
+        return "{}({})".format(type(self).__name__, ",".join(parameters))
+
+    def get_parameters(self) -> dict:
+        return dict(indicators=self.indicators.fingerprint(), prediction_days=self.prediction_days)
+
 
 class LinearAlgoTrader(BaseAlgoTrader):
-    def __init__(self, indicators: CombinedIndicator, prediction_days=5, dump=False):
+    def __init__(self, indicators: CombinedIndicator, prediction_days=5, dump=False, dtype=np.float64):
         self.dump = dump
+        self.dtype = dtype
         self.regression = linear_model.LinearRegression()
         super(LinearAlgoTrader, self).__init__(indicators, prediction_days)
 
+    def get_parameters(self) -> dict:
+        parameters = super(LinearAlgoTrader, self).get_parameters()
+        parameters['dtype'] = np.dtype(self.dtype).name
+        return parameters
+
     def train(self, data: pd.DataFrame):
         x_data_train, y_data_train = self.get_data(data)
+        self.train_features(x_data_train, y_data_train)
+
+    def train_features(self, x_data_train: pd.DataFrame, y_data_train: pd.Series):
+        """Fit on features and targets of get_data, last prediction_days rows have no known target and are skipped"""
         if self.dump:
-            x_data_train.join(y_data_train, rsuffix='_Traing').to_csv("testing.csv")
+            Artifacts.write("training", x_data_train.join(y_data_train, rsuffix='_Traing'))
 
         x_data_train = x_data_train.iloc[:-self.prediction_days, :].values
         y_data_train = y_data_train.iloc[:-self.prediction_days].values
@@ -42,8 +64,12 @@ class LinearAlgoTrader(BaseAlgoTrader):
 
     def predict(self, data: pd.DataFrame):
         x_data_test, y_data_test = self.get_data(data)
+        return self.predict_features(x_data_test, y_data_test)
+
+    def predict_features(self, x_data_test: pd.DataFrame, y_data_test: pd.Series):
+        """Predictions frame, RMSE and correlation on features and targets of get_data"""
         if self.dump:
-            x_data_test.join(y_data_test, rsuffix='_Test').to_csv("testing.csv")
+            Artifacts.write("testing", x_data_test.join(y_data_test, rsuffix='_Test'))
 
         y_predict = self.regression.predict(x_data_test)
         result = pd.DataFrame(index=x_data_test.index, data=y_predict, columns=[HeaderFactory.MACHINE])
@@ -55,8 +81,192 @@ class LinearAlgoTrader(BaseAlgoTrader):
         return result, rmse, c[0, 1]
 
     def get_data(self, data: pd.DataFrame):
-        x_data = self.indicators.calculate(data)
-        y_data = data.shift(-self.prediction_days) / data - 1.0
-        x_data.dropna(inplace=True)
-        y_data = y_data.loc[x_data.index, HeaderFactory.Price]
-        return x_data, y_data
\ No newline at end of file
+        """Features frame of rows with all indicators and target Series, both backed by get_matrix arrays"""
+        x_values, y_values, valid = self.get_matrix(data)
+        rows = np.flatnonzero(valid)
+        if len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows):
+            # valid rows are one block after warm up, slicing keeps views instead of copying matrix
+            rows = slice(rows[0], rows[-1] + 1)
+        x_data = pd.DataFrame(x_values[rows], index=data.index[rows], columns=self.indicators.columns(), copy=False)
+        y_data = pd.Series(y_values[rows], index=x_data.index, name=HeaderFactory.Price, copy=False)
+        return x_data, y_data
+
+    def get_matrix(self, data: pd.DataFrame):
+        """Preallocated features matrix (C-contiguous, dtype of trader), target return of Price column and mask of
+        rows with all features"""
+        x_values = self.indicators.calculate_matrix(data, self.dtype)
+        prices = data[HeaderFactory.Price].values
+        y_values = np.full(len(prices), np.nan, dtype=self.dtype)
+        if len(prices) > self.prediction_days:
+            y_values[:len(prices) - self.prediction_days] = prices[self.prediction_days:] / \
+                                                            prices[:len(prices) - self.prediction_days] - 1.0
+        valid = ~np.isnan(x_values).any(axis=1)
+        return x_values, y_values, valid
+
+
+class OnlineLinearAlgoTrader(LinearAlgoTrader):
+    """LinearAlgoTrader keeping least squares statistics X'X and X'y (with intercept column), so adding a row with
+    known target costs O(features^2) instead of full refit. Older rows are discounted by forgetting factor per
+    added row and dropped after window rows if window is set. Same regression as LinearAlgoTrader without
+    forgetting and window."""
+
+    def __init__(self, indicators: CombinedIndicator, prediction_days=5, window=None, forgetting=1.0, dump=False):
+        if not 0 < forgetting <= 1:
+            raise ValueError("Forgetting factor has to be in (0, 1]")
+        self.window = window
+        self.forgetting = forgetting
+        self.covariance = None
+        self.moment = None
+        self.rows = deque()
+        super(OnlineLinearAlgoTrader, self).__init__(indicators, prediction_days, dump)
+
+    def get_parameters(self) -> dict:
+        parameters = super(OnlineLinearAlgoTrader, self).get_parameters()
+        parameters.update(window=self.window, forgetting=self.forgetting)
+        return parameters
+
+    def train_features(self, x_data_train: pd.DataFrame, y_data_train: pd.Series):
+        if self.dump:
+            Artifacts.write("training", x_data_train.join(y_data_train, rsuffix='_Traing'))
+
+        x_values = x_data_train.iloc[:-self.prediction_days, :].values
+        y_values = y_data_train.iloc[:-self.prediction_days].values
+        if self.window is not None:
+            x_values = x_values[-self.window:]
+            y_values = y_values[-self.window:]
+        rows = OnlineLinearAlgoTrader.add_intercept(x_values)
+        weights = self.forgetting ** np.arange(len(rows) - 1, -1, -1, dtype=np.float64)
+        self.covariance = rows.T.dot(rows * weights[:, np.newaxis])
+        self.moment = rows.T.dot(y_values * weights)
+        self.rows = deque(zip(rows, y_values)) if self.window is not None else deque()
+        self.solve()
+
+    def update(self, x_row: np.ndarray, y: float):
+        """Add row whose target became known, dropping row leaving window, and refresh coefficients"""
+        row = OnlineLinearAlgoTrader.add_intercept(np.asarray(x_row, dtype=np.float64)[np.newaxis])[0]
+        if self.covariance is None:
+            self.covariance = np.zeros((len(row), len(row)))
+            self.moment = np.zeros(len(row))
+        self.covariance *= self.forgetting
+        self.moment *= self.forgetting
+        self.covariance += np.outer(row, row)
+        self.moment += row * y
+        if self.window is not None:
+            self.rows.append((row, y))
+            if len(self.rows) > self.window:
+                removed, removed_y = self.rows.popleft()
+                weight = self.forgetting ** self.window
+                self.covariance -= weight * np.outer(removed, removed)
+                self.moment -= weight * removed * removed_y
+        self.solve()
+
+    def update_features(self, x_data: pd.DataFrame, y_data: pd.Series):
+        """Add rows with known targets in date order"""
+        for x_row, y in zip(x_data.values, y_data.values):
+            self.update(x_row, y)
+
+    def solve(self):
+        try:
+            solution = np.linalg.solve(self.covariance, self.moment)
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(self.covariance, self.moment, rcond=None)[0]
+        self.regression.intercept_ = solution[0]
+        self.regression.coef_ = solution[1:]
+        self.regression.n_features_in_ = len(solution) - 1
+
+    @staticmethod
+    def add_intercept(x_values: np.ndarray) -> np.ndarray:
+        rows = np.empty((len(x_values), x_values.shape[1] + 1))
+        rows[:, 0] = 1.0
+        rows[:, 1:] = x_values
+        return rows
+
+
+class BatchLinearAlgoTrader(BaseAlgoTrader):
+    """Linear models of many symbols fitted together. Indicators are evaluated for all symbol columns of price
+    frame at once into symbol x date x feature tensor, per symbol least squares (with intercept) are solved in one
+    batched pseudo inverse, or one pooled model is fitted over all symbols. Rows are used as by LinearAlgoTrader:
+    rows with missing feature are skipped, last prediction_days valid rows of each symbol have no known target."""
+
+    def __init__(self, indicators: CombinedIndicator, symbols: list, prediction_days=5, pooled=False):
+        self.symbols = symbols
+        self.pooled = pooled
+        self.coefficients = None
+        super(BatchLinearAlgoTrader, self).__init__(indicators, prediction_days)
+
+    def get_parameters(self) -> dict:
+        parameters = super(BatchLinearAlgoTrader, self).get_parameters()
+        parameters.update(symbols=",".join(self.symbols), pooled=self.pooled)
+        return parameters
+
+    def get_tensor(self, data: pd.DataFrame):
+        """Features (symbol x date x feature with intercept column first), targets (symbol x date) and mask of
+        rows with all features"""
+        prices = data[self.symbols].astype(np.float64)
+        features = self.indicators.evaluate(ComputationGraph(prices, column=None))
+        x_data = np.empty((len(self.symbols), len(prices), len(features) + 1))
+        x_data[:, :, 0] = 1.0
+        for position, values in enumerate(features):
+            x_data[:, :, position + 1] = np.asarray(values, dtype=np.float64).T
+        values = prices.values
+        y_data = np.full(values.shape, np.nan)
+        y_data[:-self.prediction_days] = values[self.prediction_days:] / values[:-self.prediction_days] - 1.0
+        valid = ~np.isnan(x_data).any(axis=2)
+        return x_data, y_data.T, valid
+
+    def get_known(self, y_data: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """Valid rows except last prediction_days valid rows per symbol, with target"""
+        remaining = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+        return valid & (remaining > self.prediction_days) & ~np.isnan(y_data)
+
+    def train(self, data: pd.DataFrame):
+        x_data, y_data, valid = self.get_tensor(data)
+        known = self.get_known(y_data, valid)
+        x_data = np.where(known[:, :, np.newaxis], x_data, 0.0)
+        y_data = np.where(known, y_data, 0.0)
+        if self.pooled:
+            x_data = x_data.reshape(1, -1, x_data.shape[2])
+            y_data = y_data.reshape(1, -1)
+            known = known.reshape(1, -1)
+        # centered normal equations, pseudo inverse keeps minimum norm solution of collinear features as sklearn
+        count = known.sum(axis=1)[:, np.newaxis]
+        x_mean = x_data[:, :, 1:].sum(axis=1) / count
+        y_mean = y_data.sum(axis=1, keepdims=True) / count
+        x_centered = np.where(known[:, :, np.newaxis], x_data[:, :, 1:] - x_mean[:, np.newaxis, :], 0.0)
+        y_centered = np.where(known, y_data - y_mean, 0.0)
+        covariance = np.einsum('sdi,sdj->sij', x_centered, x_centered)
+        moment = np.einsum('sdi,sd->si', x_centered, y_centered)
+        weights = np.einsum('sij,sj->si', np.linalg.pinv(covariance, hermitian=True), moment)
+        coefficients = np.empty((len(weights), weights.shape[1] + 1))
+        coefficients[:, 0] = y_mean[:, 0] - (x_mean * weights).sum(axis=1)
+        coefficients[:, 1:] = weights
+        if self.pooled:
+            coefficients = np.repeat(coefficients, len(self.symbols), axis=0)
+        self.coefficients = coefficients
+
+    def predict(self, data: pd.DataFrame):
+        """Predictions frame with <symbol>_MACHINE column per symbol, RMSE and correlation per symbol"""
+        x_data, y_data, valid = self.get_tensor(data)
+        y_predict = np.einsum('sdi,si->sd', x_data, self.coefficients)
+        y_predict[~valid] = np.nan
+        columns = [HeaderFactory.get_name(symbol, HeaderFactory.MACHINE) for symbol in self.symbols]
+        result = pd.DataFrame(y_predict.T, index=data.index, columns=columns)
+
+        known = self.get_known(y_data, valid)
+        count = known.sum(axis=1)
+        y_data = np.where(known, y_data, 0.0)
+        y_predict = np.where(known, y_predict, 0.0)
+        rmse = np.sqrt(((y_data - y_predict) ** 2).sum(axis=1) / count)
+        y_data = np.where(known, y_data - y_data.sum(axis=1, keepdims=True) / count[:, np.newaxis], 0.0)
+        y_predict = np.where(known, y_predict - y_predict.sum(axis=1, keepdims=True) / count[:, np.newaxis], 0.0)
+        c = (y_data * y_predict).sum(axis=1) / np.sqrt((y_data ** 2).sum(axis=1) * (y_predict ** 2).sum(axis=1))
+        return result, pd.Series(rmse, index=self.symbols), pd.Series(c, index=self.symbols)
+
+    def get_trader(self, symbol: str) -> LinearAlgoTrader:
+        """Trained single symbol LinearAlgoTrader, usable with MachineStrategyManager"""
+        trader = LinearAlgoTrader(self.indicators, self.prediction_days)
+        coefficients = self.coefficients[self.symbols.index(symbol)]
+        trader.regression.intercept_ = coefficients[0]
+        trader.regression.coef_ = coefficients[1:]
+        trader.regression.n_features_in_ = len(coefficients) - 1
+        return trader
@@ -0,0 +1,125 @@
+import abc
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from PortfolioBasic.Market.MarketDataService import MarketDataSource
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMarketDataSource(object):
+    """Remote source fetched with bounded concurrency and retries, concurrent requests for symbol share fetch."""
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, max_concurrency=8, retries=3, backoff=0.5):
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self._loop = None
+        self._semaphore = None
+        self._in_flight = {}
+
+    @abc.abstractmethod
+    async def fetch_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        """Fetch stock data frame from remote"""
+        return None
+
+    def can_use(self, symbol):
+        return True
+
+    async def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        self._bind_loop()
+        while symbol in self._in_flight:
+            (pending_from, pending_to), task = self._in_flight[symbol]
+            data = await asyncio.shield(task)
+            if AsyncMarketDataSource._covers(pending_from, pending_to, from_date, to_date):
+                logger.debug("%s served by in flight request", symbol)
+                return data.sort_index().loc[from_date:to_date].copy()
+            # different range, wait for it to finish before fetching own
+            await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(self._fetch_with_retry(symbol, from_date, to_date))
+        self._in_flight[symbol] = ((from_date, to_date), task)
+        try:
+            data = await asyncio.shield(task)
+        finally:
+            if self._in_flight.get(symbol, (None, None))[1] is task:
+                del self._in_flight[symbol]
+        return data.copy()
+
+    @staticmethod
+    def _covers(pending_from: datetime, pending_to: datetime, from_date: datetime, to_date: datetime) -> bool:
+        """Whether pending range contains requested one, None date is unbounded"""
+        if pending_from is not None and (from_date is None or from_date < pending_from):
+            return False
+        return pending_to is None or (to_date is not None and to_date <= pending_to)
+
+    async def get_many(self, requests: list) -> list:
+        """Get (data, seconds) per (symbol, from date, to date) request, preserving requests order."""
+        return await asyncio.gather(*[self._timed(*request) for request in requests])
+
+    async def _timed(self, symbol: str, from_date: datetime, to_date: datetime):
+        started = time.perf_counter()
+        data = await self.get_stock_data(symbol, from_date, to_date)
+        return data, time.perf_counter() - started
+
+    async def _fetch_with_retry(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await self.fetch_stock_data(symbol, from_date, to_date)
+            except Exception as error:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning("Failed to fetch %s (%s), retry %d in %.2f seconds", symbol, error, attempt, delay)
+                await asyncio.sleep(delay)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._in_flight = {}
+
+
+class ExecutorAsyncMarketDataSource(AsyncMarketDataSource):
+    """Blocking source, for example YahooMarketDataSource, fetched on default executor threads."""
+
+    def __init__(self, source: MarketDataSource, max_concurrency=8, retries=3, backoff=0.5):
+        super(ExecutorAsyncMarketDataSource, self).__init__(max_concurrency, retries, backoff)
+        self.source = source
+
+    def can_use(self, symbol):
+        return self.source.can_use(symbol)
+
+    async def fetch_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.source.get_stock_data, symbol, from_date, to_date)
+
+
+class SyncMarketDataSource(MarketDataSource):
+    """Adapter letting Portfolio.resources users call get_data on asynchronous source, symbols are fetched
+    concurrently."""
+
+    def __init__(self, source: AsyncMarketDataSource):
+        self.source = source
+
+    def can_use(self, symbol):
+        return self.source.can_use(symbol)
+
+    def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        return self.fetch([(symbol, from_date, to_date)])[0][0]
+
+    def fetch(self, requests: list) -> list:
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.source.get_many(requests))
+        finally:
+            loop.close()
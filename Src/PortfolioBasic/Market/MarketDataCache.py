@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataCacheEntry(object):
+    def __init__(self, from_date: datetime, to_date: datetime, data: pd.DataFrame):
+        self.from_date = from_date
+        self.to_date = to_date
+        self.data = data
+        self.size = int(data.memory_usage(index=True, deep=True).sum())
+
+    def covers(self, from_date: datetime, to_date: datetime):
+        """None bound means unbounded history on that side."""
+        if self.from_date is not None and (from_date is None or from_date < self.from_date):
+            return False
+        if self.to_date is not None and (to_date is None or to_date > self.to_date):
+            return False
+        return True
+
+
+class MarketDataCache(object):
+    """Bounded LRU cache of symbol frames, each entry holding the widest range loaded so far."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_symbols=None):
+        self.max_bytes = max_bytes
+        self.max_symbols = max_symbols
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        """Return copy of cached symbol data for requested range or None if range is not covered."""
+        entry = self.entries.get(symbol)
+        if entry is None or not entry.covers(from_date, to_date):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(symbol)
+        return entry.data.loc[from_date:to_date].copy()
+
+    def get_range(self, symbol: str, from_date: datetime, to_date: datetime):
+        """Range to load on miss: union of requested and already cached range, so entry only grows."""
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return from_date, to_date
+        if from_date is not None and entry.from_date is not None:
+            from_date = min(from_date, entry.from_date)
+        else:
+            from_date = None
+        if to_date is not None and entry.to_date is not None:
+            to_date = max(to_date, entry.to_date)
+        else:
+            to_date = None
+        return from_date, to_date
+
+    def put(self, symbol: str, from_date: datetime, to_date: datetime, data: pd.DataFrame) -> pd.DataFrame:
+        """Store symbol data loaded for range, returns it date sorted."""
+        self.invalidate(symbol)
+        data = data.set_index(pd.DatetimeIndex(data.index)).sort_index()
+        entry = MarketDataCacheEntry(from_date, to_date, data)
+        if entry.size > self.max_bytes:
+            logger.debug("%s (%d bytes) exceeds cache size, not cached", symbol, entry.size)
+            return data
+        self.entries[symbol] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes or (self.max_symbols is not None and len(self.entries) > self.max_symbols):
+            evicted, evicted_entry = self.entries.popitem(last=False)
+            self.size -= evicted_entry.size
+            self.evictions += 1
+            logger.debug("Evicted %s from market data cache", evicted)
+        return data
+
+    def invalidate(self, symbol: str = None):
+        """Drop cached symbol or everything if symbol is not specified."""
+        if symbol is None:
+            self.entries.clear()
+            self.size = 0
+            return
+        entry = self.entries.pop(symbol, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, symbols=len(self.entries),
+                    size=self.size)
+
+
+class MarketDataDiskCache(object):
+    """Per symbol CSV holding union of all fetched date ranges, ranges kept in <symbol>.ranges.json next to it."""
+    RangesSuffix = ".ranges.json"
+    DataSuffix = ".csv"
+
+    def __init__(self, base_dir: str, max_bytes=512 * 1024 * 1024):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+
+    def get_missing(self, symbol: str, from_date: datetime, to_date: datetime) -> list:
+        """Sub ranges of [from_date, to_date] not fetched yet."""
+        from_date, to_date = pd.Timestamp(from_date).normalize(), pd.Timestamp(to_date).normalize()
+        missing = []
+        for covered_from, covered_to in self.get_ranges(symbol):
+            if covered_to < from_date or covered_from > to_date:
+                continue
+            if covered_from > from_date:
+                missing.append((from_date, covered_from - timedelta(days=1)))
+            from_date = max(from_date, covered_to + timedelta(days=1))
+        if from_date <= to_date:
+            missing.append((from_date, to_date))
+        return missing
+
+    def get_ranges(self, symbol: str) -> list:
+        file_path = self.symbol_to_path(symbol, MarketDataDiskCache.RangesSuffix)
+        if not os.path.isfile(file_path):
+            return []
+        with open(file_path) as ranges_file:
+            stored = json.load(ranges_file)
+        return [(pd.Timestamp(covered_from), pd.Timestamp(covered_to)) for covered_from, covered_to in stored]
+
+    def merge(self, symbol: str, ranges: list, frames: list):
+        """Add frames fetched for ranges to symbol data."""
+        data_path = self.symbol_to_path(symbol, MarketDataDiskCache.DataSuffix)
+        if os.path.isfile(data_path):
+            frames = [self.read(symbol)] + frames
+        frames = [frame for frame in frames if len(frame) > 0]
+        if len(frames) > 0:
+            data = pd.concat(frames)
+            data.index = pd.DatetimeIndex(data.index, name="Date")
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            data.to_csv(data_path)
+
+        # bars of today and later may not be published yet, they stay missing and are fetched again
+        last_complete = pd.Timestamp.now().normalize() - timedelta(days=1)
+        fetched = []
+        for covered_from, covered_to in ranges:
+            covered_from = pd.Timestamp(covered_from).normalize()
+            covered_to = min(pd.Timestamp(covered_to).normalize(), last_complete)
+            if covered_from <= covered_to:
+                fetched.append((covered_from, covered_to))
+        merged = []
+        for covered_from, covered_to in sorted(self.get_ranges(symbol) + fetched):
+            if len(merged) > 0 and covered_from <= merged[-1][1] + timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], covered_to))
+            else:
+                merged.append((covered_from, covered_to))
+        with open(self.symbol_to_path(symbol, MarketDataDiskCache.RangesSuffix), 'w') as ranges_file:
+            json.dump([(covered_from.isoformat(), covered_to.isoformat()) for covered_from, covered_to in merged],
+                      ranges_file)
+        self.evict(symbol)
+
+    def read(self, symbol: str, from_date: datetime = None, to_date: datetime = None) -> pd.DataFrame:
+        data_path = self.symbol_to_path(symbol, MarketDataDiskCache.DataSuffix)
+        if not os.path.isfile(data_path):
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"))
+        # last use is kept as modification time, eviction removes oldest first
+        os.utime(data_path)
+        data = pd.read_csv(data_path, parse_dates=True, index_col="Date", na_values=["nan"])
+        return data.loc[from_date:to_date]
+
+    def get_size(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.base_dir, file_name)) for file_name in os.listdir(self.base_dir)
+                   if file_name.endswith(MarketDataDiskCache.DataSuffix))
+
+    def evict(self, keep: str = None):
+        """Remove least recently used symbols until cache fits max_bytes, keep symbol is never removed."""
+        if self.max_bytes is None:
+            return
+        size = self.get_size()
+        if size <= self.max_bytes:
+            return
+        symbols = [file_name[:-len(MarketDataDiskCache.DataSuffix)] for file_name in os.listdir(self.base_dir)
+                   if file_name.endswith(MarketDataDiskCache.DataSuffix)]
+        symbols = [symbol for symbol in symbols if symbol != keep]
+        symbols.sort(key=lambda x: os.path.getmtime(self.symbol_to_path(x, MarketDataDiskCache.DataSuffix)))
+        for symbol in symbols:
+            if size <= self.max_bytes:
+                break
+            size -= os.path.getsize(self.symbol_to_path(symbol, MarketDataDiskCache.DataSuffix))
+            self.remove(symbol)
+            logger.info("Evicted %s from disk cache", symbol)
+
+    def remove(self, symbol: str):
+        for suffix in (MarketDataDiskCache.DataSuffix, MarketDataDiskCache.RangesSuffix):
+            file_path = self.symbol_to_path(symbol, suffix)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+    def symbol_to_path(self, symbol: str, suffix: str):
+        return os.path.join(self.base_dir, str(symbol) + suffix)
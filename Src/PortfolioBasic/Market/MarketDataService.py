@@ -1,5 +1,9 @@
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
+from itertools import repeat
 from os import listdir
 from os.path import isfile, join
 import abc
@@ -8,15 +12,29 @@ import pandas as pd
 import logging
 
 import shutil
+from multiprocessing.shared_memory import SharedMemory
 from yahoo_finance import Share
 
-from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Market.MarketDataCache import MarketDataCache, MarketDataDiskCache
+from PortfolioBasic.Market.MarketPanel import MarketPanel
 
 logger = logging.getLogger(__name__)
 
 
+def fetch_stock_data(source, symbol: str, from_date: datetime, to_date: datetime):
+    """Get stock data frame and seconds it took, module level to be usable by process pool."""
+    started = time.perf_counter()
+    data = source.get_stock_data(symbol, from_date, to_date)
+    return data, time.perf_counter() - started
+
+
 class MarketDataSource(object):
     __metaclass__ = abc.ABCMeta
+    cache = None
+    full_history = False
+    workers = 1
+    use_processes = False
+    load_latency = None
 
     @abc.abstractmethod
     def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
@@ -30,38 +48,82 @@ class MarketDataSource(object):
     def get_index(self, symbols: list):
         return "SPY"
 
-    def get_data(self, symbols: list, start_date: datetime, end_date: datetime, use_single=False):
+    def enable_cache(self, max_bytes=256 * 1024 * 1024, max_symbols=None) -> MarketDataCache:
+        self.cache = MarketDataCache(max_bytes, max_symbols)
+        return self.cache
 
-        symbols = symbols.copy()
-        dates = pd.date_range(start_date, end_date)  # date range as index
-        df_final = pd.DataFrame(index=dates)
-        index = self.get_index(symbols)
-        if index not in symbols:  # add SPY for reference, if absent
-            symbols.insert(0, index)
+    def disable_cache(self):
+        self.cache = None
+
+    def set_parallel(self, workers=4, use_processes=False):
+        """Fetch symbols with pool of workers: threads for I/O bound sources, processes for CPU heavy parsing."""
+        self.workers = workers
+        self.use_processes = use_processes
+
+    def __getstate__(self):
+        # cache stays in owning process
+        state = self.__dict__.copy()
+        state.pop('cache', None)
+        return state
 
+    def load_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        """Get stock data frame, served from cache when enabled"""
+        return self.load_symbols([symbol], from_date, to_date)[0]
+
+    def load_symbols(self, symbols: list, start_date: datetime, end_date: datetime) -> list:
+        """Get stock data frames in symbols order, load_latency keeps seconds spent per symbol."""
+        latency = {}
+        frames = {}
+        requests = []
         for symbol in symbols:
             logging.info("Requesting stock information %s from %s to %s...", symbol, start_date, end_date)
-            df_temp = self.get_stock_data(symbol, start_date, end_date)
-
-            if symbol == index:  # in case of index take only index value
-                df_temp = df_temp[index]
-                df_temp.name = HeaderFactory.Index
-                df_temp = pd.DataFrame(df_temp)
+            started = time.perf_counter()
+            data = None if self.cache is None else self.cache.get(symbol, start_date, end_date)
+            if data is None:
+                requests.append((symbol,) + self.get_load_range(symbol, start_date, end_date))
             else:
-                if not use_single:
-                    df_temp.rename(columns=lambda x: x + '_' + symbol if x in HeaderFactory.Columns else x,
-                                   inplace=True)
-                else:
-                    df_temp.rename(columns={symbol: HeaderFactory.Price}, inplace=True)
+                frames[symbol] = data
+                latency[symbol] = time.perf_counter() - started
+
+        for (symbol, load_from, load_to), (data, elapsed) in zip(requests, self.fetch(requests)):
+            logger.debug("Loaded %s in %.3f seconds", symbol, elapsed)
+            if self.cache is not None:
+                data = self.cache.put(symbol, load_from, load_to, data).loc[start_date:end_date].copy()
+            frames[symbol] = data
+            latency[symbol] = elapsed
 
-            df_final = df_final.join(df_temp)
-            if symbol == index:  # drop dates SPY did not trade
-                df_final = df_final.dropna(subset=[HeaderFactory.Index])
+        self.load_latency = OrderedDict((symbol, latency[symbol]) for symbol in symbols)
+        return [frames[symbol] for symbol in symbols]
 
-        return df_final
+    def get_load_range(self, symbol: str, from_date: datetime, to_date: datetime):
+        if self.cache is None:
+            return from_date, to_date
+        if self.full_history:
+            return None, None
+        return self.cache.get_range(symbol, from_date, to_date)
+
+    def fetch(self, requests: list) -> list:
+        """Get (data, seconds) per (symbol, from date, to date) request, preserving requests order."""
+        if self.workers <= 1 or len(requests) <= 1:
+            return [fetch_stock_data(self, *request) for request in requests]
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=self.workers) as executor:
+            return list(executor.map(fetch_stock_data, repeat(self, len(requests)), *zip(*requests)))
+
+    def get_data(self, symbols: list, start_date: datetime, end_date: datetime, use_single=False):
+        return self.get_panel(symbols, start_date, end_date).to_frame(use_single)
+
+    def get_panel(self, symbols: list, start_date: datetime, end_date: datetime) -> MarketPanel:
+        """Load index and symbols, aligned to dates index traded between start and end date"""
+        index = self.get_index(symbols)
+        position = symbols.index(index) if index in symbols else 0
+        symbols = [symbol for symbol in symbols if symbol != index]
+        frames = self.load_symbols([index] + symbols, start_date, end_date)
+        return MarketPanel.build(frames[0][index], symbols, frames[1:], start_date, end_date, position)
 
 
 class LocalMarketDataSource(MarketDataSource):
+    full_history = True
 
     def can_use(self, symbol):
         return symbol in self.indexes
@@ -83,12 +145,146 @@ class LocalMarketDataSource(MarketDataSource):
         return os.path.join(self.base_dir, "{}.csv".format(str(symbol)))
 
 
-class YahooMarketDataSource(MarketDataSource):
+class BinaryMarketDataSource(MarketDataSource):
+    """Columnar price store: one sorted date vector and one field x date matrix per symbol, memory-mapped on read."""
+    full_history = True
+    Fields = ["Open", "High", "Low", "Close", "Volume", "Adj Close"]
+    DatesSuffix = ".dates.npy"
+    ValuesSuffix = ".values.npy"
 
-    def __init__(self, base_dir="..\cache\data"):
+    def __init__(self, base_dir="..\\binary\\data"):
         self.base_dir = base_dir
         if not os.path.exists(base_dir):
             os.makedirs(base_dir)
+        self.indexes = [file_name[:-len(BinaryMarketDataSource.DatesSuffix)] for file_name in listdir(base_dir)
+                        if file_name.endswith(BinaryMarketDataSource.DatesSuffix)]
+
+    def can_use(self, symbol):
+        return symbol in self.indexes
+
+    def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        dates_path, values_path = self.symbol_to_paths(symbol)
+        dates = np.load(dates_path, mmap_mode='r')
+        values = np.load(values_path, mmap_mode='r')
+        start = 0 if from_date is None else np.searchsorted(dates, BinaryMarketDataSource.to_key(from_date), 'left')
+        end = len(dates) if to_date is None else np.searchsorted(dates, BinaryMarketDataSource.to_key(to_date), 'right')
+        columns = BinaryMarketDataSource.Fields[:-1] + [symbol]
+        index = pd.DatetimeIndex(np.array(dates[start:end]).view('datetime64[ns]'), name="Date")
+        return pd.DataFrame(np.array(values[:, start:end]).T, index=index, columns=columns)
+
+    @staticmethod
+    def to_key(date: datetime):
+        """Return date as int64 nanoseconds, the representation of stored date vectors."""
+        return pd.Timestamp(date).value
+
+    def symbol_to_paths(self, symbol):
+        """Return dates and values file paths given ticker symbol."""
+        return (os.path.join(self.base_dir, str(symbol) + BinaryMarketDataSource.DatesSuffix),
+                os.path.join(self.base_dir, str(symbol) + BinaryMarketDataSource.ValuesSuffix))
+
+    def store(self, symbol: str, data: pd.DataFrame):
+        """Write symbol data (Open, High, Low, Close, Volume and Adj Close columns) sorted by date."""
+        data = data.sort_index()
+        data = data[~data.index.duplicated(keep='last')]
+        dates = pd.DatetimeIndex(data.index).values.astype('datetime64[ns]').astype(np.int64)
+        values = np.ascontiguousarray(data[BinaryMarketDataSource.Fields].values.T, dtype=np.float64)
+        dates_path, values_path = self.symbol_to_paths(symbol)
+        np.save(values_path, values)
+        np.save(dates_path, dates)
+        if symbol not in self.indexes:
+            self.indexes.append(symbol)
+
+    @staticmethod
+    def convert(source: LocalMarketDataSource, base_dir="..\\binary\\data", symbols: list = None):
+        """Convert CSV files of local source once, files already converted and not older than CSV are skipped."""
+        target = BinaryMarketDataSource(base_dir)
+        if symbols is None:
+            symbols = source.indexes
+        for symbol in symbols:
+            csv_path = source.symbol_to_path(symbol)
+            dates_path, _ = target.symbol_to_paths(symbol)
+            if os.path.isfile(dates_path) and os.path.getmtime(dates_path) >= os.path.getmtime(csv_path):
+                continue
+            logging.info("Converting %s to binary format...", symbol)
+            data = source.get_stock_data(symbol, None, None)
+            data = data.rename(columns={symbol: "Adj Close"})
+            target.store(symbol, data)
+        return target
+
+
+class SharedMarketDataSource(MarketDataSource):
+    """Stock data of fixed symbols preloaded into one shared memory block. Pickled source carries only block name
+    and layout, process pool workers attach to same memory without reloading or copying prices.
+    Block is owned by creating process and freed by release."""
+    full_history = True
+
+    def __init__(self, frames: dict, index="SPY"):
+        self.index = index
+        self.layout = OrderedDict()
+        size = 0
+        for symbol, data in frames.items():
+            # per symbol int64 dates followed by date x column values
+            self.layout[symbol] = (size, len(data), list(data.columns))
+            size += len(data) * (len(data.columns) + 1)
+        self.memory = SharedMemory(create=True, size=max(size, 1) * 8)
+        self.owner = True
+        for symbol, data in frames.items():
+            data = data.sort_index()
+            dates, values = self.get_arrays(symbol)
+            dates[:] = pd.DatetimeIndex(data.index).values.astype('datetime64[ns]').astype(np.int64)
+            values[:] = data.values
+        logger.info("Shared %d symbols in %d bytes", len(frames), self.memory.size)
+
+    @staticmethod
+    def preload(source: MarketDataSource, symbols: list, start_date: datetime, end_date: datetime):
+        """Load symbols and their index once from source"""
+        index = source.get_index(symbols)
+        symbols = [index] + [symbol for symbol in symbols if symbol != index]
+        frames = source.load_symbols(symbols, start_date, end_date)
+        return SharedMarketDataSource(OrderedDict(zip(symbols, frames)), index)
+
+    def __getstate__(self):
+        state = super(SharedMarketDataSource, self).__getstate__()
+        state['memory'] = self.memory.name
+        state['owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.memory = SharedMemory(name=state['memory'])
+
+    def release(self):
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def get_arrays(self, symbol: str):
+        offset, rows, columns = self.layout[symbol]
+        dates = np.ndarray((rows,), dtype=np.int64, buffer=self.memory.buf, offset=offset * 8)
+        values = np.ndarray((rows, len(columns)), dtype=np.float64, buffer=self.memory.buf,
+                            offset=(offset + rows) * 8)
+        return dates, values
+
+    def can_use(self, symbol):
+        return symbol in self.layout
+
+    def get_index(self, symbols: list):
+        return self.index
+
+    def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        dates, values = self.get_arrays(symbol)
+        start = 0 if from_date is None else np.searchsorted(dates, BinaryMarketDataSource.to_key(from_date), 'left')
+        end = len(dates) if to_date is None else np.searchsorted(dates, BinaryMarketDataSource.to_key(to_date), 'right')
+        index = pd.DatetimeIndex(dates[start:end].copy().view('datetime64[ns]'), name="Date")
+        return pd.DataFrame(values[start:end].copy(), index=index, columns=self.layout[symbol][2])
+
+
+class YahooMarketDataSource(MarketDataSource):
+
+    def __init__(self, base_dir="..\cache\data", max_bytes=512 * 1024 * 1024, share_factory=Share):
+        self.base_dir = base_dir
+        self.share_factory = share_factory
+        self.store = MarketDataDiskCache(base_dir, max_bytes)
 
     def reset_cache(self):
         shutil.rmtree(self.base_dir)
@@ -98,18 +294,24 @@ class YahooMarketDataSource(MarketDataSource):
         return True
 
     def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
-        filename = "{}-{}-{}.csv".format(str(symbol), from_date.strftime('%Y%m%d'), to_date.strftime('%Y%m%d'))
-        filename = os.path.join(self.base_dir, filename)
-        if os.path.isfile(filename):
-            return pd.read_csv(filename, parse_dates=True, index_col="Date", na_values=["nan"])
-        share = Share(symbol)
+        missing = self.store.get_missing(symbol, from_date, to_date)
+        if len(missing) > 0:
+            frames = [self.download(symbol, missing_from, missing_to) for missing_from, missing_to in missing]
+            self.store.merge(symbol, missing, frames)
+        return self.store.read(symbol, from_date, to_date)
+
+    def download(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        logging.info("Downloading %s from %s to %s...", symbol, from_date, to_date)
+        share = self.share_factory(symbol)
         from_date_str = from_date.strftime('%Y-%m-%d')
         to_date_str = to_date.strftime('%Y-%m-%d')
         data = share.get_historical(from_date_str, to_date_str)
-        data_frame = pd.DataFrame(data, dtype=np.float32)
         columns = ["Date", "Adj_Close", "Open", "High", "Low", "Close", "Volume"]
-        data_frame = data_frame[columns]
+        if len(data) == 0:
+            data_frame = pd.DataFrame(columns=columns)
+        else:
+            data_frame = pd.DataFrame(data, dtype=np.float32)
+            data_frame = data_frame[columns]
         data_frame = data_frame.set_index(['Date'])
         data_frame = data_frame.rename(columns={"Adj_Close": symbol})
-        data_frame.to_csv(filename)
         return data_frame
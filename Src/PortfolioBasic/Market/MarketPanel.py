@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+
+
+class MarketPanel(object):
+    """Symbol data aligned to index trading calendar as single date x symbol x field array."""
+    Fields = HeaderFactory.Columns + [HeaderFactory.Price]
+
+    def __init__(self, dates: pd.DatetimeIndex, index: np.ndarray, symbols: list, values: np.ndarray,
+                 present: np.ndarray, index_position=0):
+        self.dates = dates
+        self.index = index
+        self.symbols = symbols
+        self.values = values
+        # symbol x field, False for fields not supplied by data source
+        self.present = present
+        # number of symbols before Index column in wide layout, index symbol keeps its requested place
+        self.index_position = index_position
+
+    @staticmethod
+    def build(index_data: pd.Series, symbols: list, frames: list, start_date, end_date,
+              index_position=0) -> 'MarketPanel':
+        """Align index and symbol frames, each symbol frame has fields columns with adjusted close named by symbol."""
+        index_data = MarketPanel._prepare(index_data)
+        index_data = index_data.reindex(pd.date_range(start_date, end_date))
+        index_data = index_data[index_data.notnull()]
+        dates = index_data.index
+        fields = MarketPanel.Fields
+        values = np.full((len(dates), len(symbols), len(fields)), np.nan)
+        present = np.zeros((len(symbols), len(fields)), dtype=bool)
+        for position, (symbol, frame) in enumerate(zip(symbols, frames)):
+            columns = [field if field != HeaderFactory.Price else symbol for field in fields]
+            present[position] = [column in frame.columns for column in columns]
+            frame = MarketPanel._prepare(frame)
+            values[:, position, :] = frame.reindex(index=dates, columns=columns).values
+        return MarketPanel(dates, index_data.values.astype(np.float64), symbols, values, present, index_position)
+
+    @staticmethod
+    def _prepare(data):
+        if not isinstance(data.index, pd.DatetimeIndex):
+            data = data.copy()
+            data.index = pd.DatetimeIndex(data.index)
+        if not data.index.is_unique:
+            data = data[~data.index.duplicated()]
+        return data
+
+    def get_field(self, field: str) -> pd.DataFrame:
+        """Date x symbol frame of one field, view on panel values."""
+        return pd.DataFrame(self.values[:, :, MarketPanel.Fields.index(field)], index=self.dates,
+                            columns=self.symbols, copy=False)
+
+    def to_multi_frame(self) -> pd.DataFrame:
+        """Frame with (symbol, field) MultiIndex columns, view on panel values."""
+        columns = pd.MultiIndex.from_product([self.symbols, MarketPanel.Fields])
+        data = self.values.reshape(len(self.dates), len(self.symbols) * len(MarketPanel.Fields))
+        return pd.DataFrame(data, index=self.dates, columns=columns, copy=False)
+
+    def to_frame(self, use_single=False) -> pd.DataFrame:
+        """Wide layout: Open_IBM ... Volume_IBM, IBM per symbol, or Open ... Price if use_single, with Index column
+        first or at index_position."""
+        columns = []
+        for symbol in self.symbols:
+            for field in MarketPanel.Fields:
+                if use_single:
+                    columns.append(field)
+                elif field == HeaderFactory.Price:
+                    columns.append(symbol)
+                else:
+                    columns.append(field + '_' + symbol)
+        offset = self.index_position * len(MarketPanel.Fields)
+        columns.insert(offset, HeaderFactory.Index)
+        selected = np.insert(self.present.ravel(), offset, True)
+        values = self.values.reshape(len(self.dates), len(columns) - 1)
+        data = np.empty((len(self.dates), len(columns)))
+        data[:, :offset] = values[:, :offset]
+        data[:, offset] = self.index
+        data[:, offset + 1:] = values[:, offset:]
+        if not selected.all():
+            data = data[:, selected]
+            columns = [column for column, keep in zip(columns, selected) if keep]
+        return pd.DataFrame(data, index=self.dates, columns=columns, copy=False)
@@ -25,11 +25,36 @@ class Portfolio(object):
         return None
 
 
+class OrdersSimulator(object):
+    """Market simulation on arrays: orders mapped to calendar day and symbol positions."""
+
+    @staticmethod
+    def get_trades(days: np.ndarray, symbols: np.ndarray, shares: np.ndarray, shape: tuple) -> np.ndarray:
+        """Calendar x symbol matrix of signed shares traded."""
+        flat = days * shape[1] + symbols
+        return np.bincount(flat, weights=shares, minlength=shape[0] * shape[1]).reshape(shape)
+
+    @staticmethod
+    def simulate(trades: np.ndarray, prices: np.ndarray, start_val: float):
+        """Prices are calendar x symbol with NaN on days not traded, trades on such days are free.
+        Returns holdings, cash, values per symbol and mask of days with all symbols priced."""
+        cost = np.nansum(trades * prices, axis=1)
+        holdings = np.cumsum(trades, axis=0)
+        cash = start_val - np.cumsum(cost)
+        values = holdings * prices
+        valid = ~np.isnan(values).any(axis=1)
+        return holdings, cash, values, valid
+
+    @staticmethod
+    def get_leverage(values: np.ndarray, cash: np.ndarray) -> np.ndarray:
+        return np.abs(values).sum(axis=1) / (values.sum(axis=1) + cash)
+
+
 class PortfolioOrders(Portfolio):
 
     def __init__(self, orders: pd.DataFrame, start_val: float, end_date: datetime = None):
         self.start_val = start_val
-        symbols = orders.Symbol.unique()
+        symbol_positions, symbols = pd.factorize(orders.Symbol.values)
         orders['Shares'] = orders.Shares.where(orders.Order == 'BUY', other=-orders.Shares)
         if end_date is None:
             end_date = orders.index[-1]
@@ -37,26 +62,20 @@ class PortfolioOrders(Portfolio):
         super().__init__(symbols, start_date, end_date)
         self.df_prices = PortfolioOrders.resources.get_data(self.symbols.tolist(), start_date, end_date)
         self.orders = orders
-        df_trades = orders.reset_index().groupby(['Date', 'Symbol']).sum().reset_index()
-        df_trades = df_trades.pivot(index='Date', columns='Symbol', values='Shares')
-        df_trades.fillna(value=0, inplace=True)
-        idx = pd.date_range(start_date, end_date)
-        df_trades = df_trades.reindex(idx, fill_value=0)
-        df_positions = self.df_prices * df_trades
-        df_holdings = df_trades.copy()
-
-        df_positions['Total'] = df_positions.sum(axis=1)
-        df_holdings.loc[df_positions.index, 'Total'] = df_positions.Total
-        df_holdings = df_holdings.cumsum()
-        df_holdings['Cash'] = start_val - df_holdings['Total']
-        df_holdings.fillna(method='ffill', inplace=True)
-        self.df_value = df_holdings[self.symbols] * self.df_prices[self.symbols]
-        self.df_value = self.df_value.dropna()
-        self.df_value["Cash"] = df_holdings['Cash']
-        self.daily_portfolio_values = self.df_value.sum(axis=1)
-        self.df_value["Leverage"] = self.df_value[self.symbols].abs().sum(axis=1) / (self.df_value[self.symbols]
-                                                                                     .sum(axis=1) + self.df_value.Cash)
-        pass
+
+        calendar = pd.date_range(start_date, end_date)
+        days = calendar.get_indexer(orders.index)
+        inside = days >= 0
+        prices = self.df_prices[self.symbols].reindex(calendar).values.astype(np.float64)
+        trades = OrdersSimulator.get_trades(days[inside], symbol_positions[inside],
+                                            orders.Shares.values[inside].astype(np.float64), prices.shape)
+        _, cash, values, valid = OrdersSimulator.simulate(trades, prices, start_val)
+        values = values[valid]
+        cash = cash[valid]
+        self.df_value = pd.DataFrame(values, index=calendar[valid], columns=self.symbols)
+        self.df_value["Cash"] = cash
+        self.daily_portfolio_values = pd.Series(values.sum(axis=1) + cash, index=self.df_value.index)
+        self.df_value["Leverage"] = OrdersSimulator.get_leverage(values, cash)
 
     def is_over_leveraged(self, max_leverage=2):
         return self.df_value["Leverage"].max() > max_leverage
@@ -68,15 +87,53 @@ class PortfolioOrders(Portfolio):
 class PortfolioOrdersLeverageManager:
     @staticmethod
     def deleverage(portfolio: PortfolioOrders, max_leverage=2):
-        while portfolio.is_over_leveraged(max_leverage):
-            develeveraged = PortfolioOrdersLeverageManager.deleverage_once(portfolio, max_leverage)
-            if develeveraged is None:
-                logger.warn("Failed to deleverage")
-                return portfolio
-            else:
-                portfolio = develeveraged
+        """Same result as repeating deleverage_once, computed in single chronological pass over orders."""
+        if not portfolio.is_over_leveraged(max_leverage):
+            return portfolio
+        accepted = PortfolioOrdersLeverageManager.get_accepted(portfolio, max_leverage)
+        orders = portfolio.orders.loc[accepted].copy()
+        orders["Shares"] = orders.Shares.abs()
+        portfolio = PortfolioOrders(orders, portfolio.start_val, portfolio.end_date)
+        if portfolio.is_over_leveraged(max_leverage):
+            logger.warn("Failed to deleverage")
         return portfolio
 
+    @staticmethod
+    def get_accepted(portfolio: PortfolioOrders, max_leverage=2) -> np.ndarray:
+        """Mask of orders kept: walking order days, while day closes over max_leverage its first remaining order
+        is rejected. Days with unpriced symbols have no leverage and reject nothing."""
+        orders = portfolio.orders
+        calendar = pd.date_range(portfolio.start_date, portfolio.end_date)
+        prices = portfolio.df_prices[portfolio.symbols].reindex(calendar).values.astype(np.float64)
+        days = calendar.get_indexer(orders.index)
+        symbols = pd.Index(portfolio.symbols).get_indexer(orders.Symbol)
+        shares = orders.Shares.values.astype(np.float64)
+        accepted = np.ones(len(orders), dtype=bool)
+        holdings = np.zeros(len(portfolio.symbols))
+        cash = float(portfolio.start_val)
+
+        order_positions = np.argsort(days, kind='mergesort')
+        order_positions = order_positions[days[order_positions] >= 0]
+        day_starts = np.flatnonzero(np.diff(days[order_positions], prepend=-1))
+        for day_orders in np.split(order_positions, day_starts[1:]):
+            day_prices = prices[days[day_orders[0]]]
+            day_trades = np.zeros(len(holdings))
+            np.add.at(day_trades, symbols[day_orders], shares[day_orders])
+            priced = not np.isnan(day_prices).any()
+            remaining = list(day_orders)
+            while priced and len(remaining) > 0:
+                day_holdings = holdings + day_trades
+                values = day_holdings * day_prices
+                day_cash = cash - np.nansum(day_trades * day_prices)
+                if not OrdersSimulator.get_leverage(values[np.newaxis], np.array([day_cash]))[0] > max_leverage:
+                    break
+                rejected = remaining.pop(0)
+                accepted[rejected] = False
+                day_trades[symbols[rejected]] -= shares[rejected]
+            holdings += day_trades
+            cash -= np.nansum(day_trades * day_prices)
+        return accepted
+
     @staticmethod
     def deleverage_once(portfolio: PortfolioOrders, max_leverage=2):
         orders = portfolio.orders
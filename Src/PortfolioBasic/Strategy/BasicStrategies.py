@@ -3,8 +3,9 @@ import datetime
 
 import pandas as pd
 
+from PortfolioBasic.Artifacts import Artifacts
 from PortfolioBasic.Portfolio import PortfolioOrders
-from PortfolioBasic.Strategy.StopLossStrategies import StopLossStrategy
+from PortfolioBasic.Strategy.StopLossStrategies import StopLossStrategy, ATRStopLossStrategy, TrailingStopLossStrategy
 from PortfolioBasic.Technical.Analysis import TechnicalPerformance, HeaderFactory
 
 
@@ -14,7 +15,11 @@ class StrategyManager(object):
         self.df_prices = PortfolioOrders.resources.get_data(symbols, start_date, end_date)
         self.instruction = pd.DataFrame(index=["Date"], columns=["Symbol", HeaderFactory.Order, "Shares"])
 
-    def process_strategy(self, strategy, stop_loss=None):
+    def process_strategy(self, strategy, stop_loss=None, trailing=None):
+        """trailing True or False replaces ATRStopLossStrategy rule by stops tracked per position (trailing or fixed)
+        with same bounds, see TrailingStopLossStrategy"""
+        if trailing is not None and isinstance(stop_loss, ATRStopLossStrategy):
+            stop_loss = TrailingStopLossStrategy(stop_loss.low, stop_loss.high, trailing)
         created = strategy(self.symbols, self.df_prices, stop_loss)
         strategy_instructions = created.instructions
         for instruction in strategy_instructions:
@@ -45,7 +50,7 @@ class BaseStrategy(object):
             data = self.setup_data(symbol)
             symbol_instructions = self.process_symbol(data)
             self.instructions.append(symbol_instructions)
-            symbol_instructions.to_csv("{}_instructions.csv".format(symbol))
+            Artifacts.write("{}_instructions".format(symbol), symbol_instructions)
 
     def process_symbol(self, data: pd.DataFrame):
         instruction = data.copy()
@@ -56,12 +61,12 @@ class BaseStrategy(object):
         instruction.loc[sell_instructions.index, HeaderFactory.Order] = HeaderFactory.SELL
 
         if self.dump:
-            instruction.to_csv("ins_buy_sell.csv")
+            Artifacts.write("ins_buy_sell", instruction)
 
         instruction = self.full_exit(data, instruction)
 
         if self.dump:
-            instruction.to_csv("ins_after_stop.csv")
+            Artifacts.write("ins_after_stop", instruction)
 
         previous_instruction = instruction.shift(1)
         instruction.loc[(instruction[HeaderFactory.Order] == HeaderFactory.EXIT) & 
@@ -77,11 +82,11 @@ class BaseStrategy(object):
         exit_instructions = self.process_exit(data, instruction)
         instruction.loc[exit_instructions.index, HeaderFactory.Order] = HeaderFactory.EXIT
         if self.dump:
-            instruction.to_csv("ins_before_stop_dup.csv")
+            Artifacts.write("ins_before_stop_dup", instruction)
         instruction = self.remove_dublicates(instruction)
 
         if self.dump:
-            instruction.to_csv("ins_before_stop.csv")
+            Artifacts.write("ins_before_stop", instruction)
 
         if self.stop_loss is not None:
             instruction = self.stop_loss.process(data, instruction)
@@ -96,19 +101,23 @@ class BaseStrategy(object):
         return instruction.loc[mask.index, :].copy()
 
     def setup_data(self, symbol: str) -> pd.DataFrame:
-        df_prices = self.df_prices.select(lambda x: x == symbol, axis=1)
+        df_prices = self.select_columns(lambda x: x == symbol)
         if len(df_prices.columns) == 0:
-            df_prices = self.df_prices.select(lambda x: x == HeaderFactory.Price, axis=1)
+            df_prices = self.select_columns(lambda x: x == HeaderFactory.Price)
         df_prices.columns = [HeaderFactory.Price]
         df_prices = df_prices.join(self.df_prices[HeaderFactory.Index])
-        selected = self.df_prices.select(lambda x: x in HeaderFactory.Columns, axis=1)
+        selected = self.select_columns(lambda x: x in HeaderFactory.Columns)
         if len(selected.columns) == 0:
-            selected = self.df_prices.select(lambda x: x[:-(len(symbol) + 1)] in HeaderFactory.Columns, axis=1)
+            selected = self.select_columns(lambda x: x[:-(len(symbol) + 1)] in HeaderFactory.Columns)
             selected.rename(columns=lambda x: x[:-(len(symbol) + 1)], inplace=True)
         df_prices = df_prices.join(selected)
         instruction = StrategyDataFactory.construct_instructions(symbol, df_prices)
         return instruction
 
+    def select_columns(self, condition) -> pd.DataFrame:
+        """Copy of price columns matching condition, as removed DataFrame.select on columns"""
+        return self.df_prices.loc[:, [column for column in self.df_prices.columns if condition(column)]].copy()
+
     @abc.abstractmethod
     def process_buy(self, data: pd.DataFrame) -> pd.DataFrame:
         pass
@@ -0,0 +1,326 @@
+import abc
+import logging
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Technical.Indicators import BollingerIndicator
+
+logger = logging.getLogger(__name__)
+
+
+class Bar(object):
+    """Prices of all symbols on one date, valid is False for symbols with any missing market field."""
+    __slots__ = ('date', 'prices', 'valid')
+
+    def __init__(self, date, prices: np.ndarray, valid: np.ndarray):
+        self.date = date
+        self.prices = prices
+        self.valid = valid
+
+
+class BarStream(object):
+    """Bars of strategy price frame (symbol price columns, Index and market field columns) one date at a time.
+    Fields checked per symbol are those BaseStrategy.setup_data joins for the symbol."""
+
+    def __init__(self, df_prices: pd.DataFrame, symbols: list):
+        self.df_prices = df_prices
+        self.symbols = symbols
+        columns = list(df_prices.columns)
+        self.price_columns = np.array([columns.index(symbol) for symbol in symbols])
+        self.field_columns = [np.array([columns.index(column) for column in BarStream.get_fields(columns, symbol)])
+                              for symbol in symbols]
+
+    @staticmethod
+    def get_fields(columns: list, symbol: str) -> list:
+        fields = [column for column in columns if column in HeaderFactory.Columns]
+        if len(fields) == 0:
+            fields = [column for column in columns if column[:-(len(symbol) + 1)] in HeaderFactory.Columns]
+        return [symbol, HeaderFactory.Index] + fields
+
+    def __iter__(self):
+        values = self.df_prices.values
+        for date, row in zip(self.df_prices.index, values):
+            row = row.astype(np.float64)
+            valid = np.array([not np.isnan(row[fields]).any() for fields in self.field_columns], dtype=bool)
+            yield Bar(date, row[self.price_columns], valid)
+
+    def __len__(self):
+        return len(self.df_prices)
+
+
+class Order(object):
+    __slots__ = ('date', 'symbol', 'order', 'shares')
+
+    def __init__(self, date, symbol: str, order: str, shares: int):
+        self.date = date
+        self.symbol = symbol
+        self.order = order
+        self.shares = shares
+
+    def get_signed_shares(self) -> float:
+        return self.shares if self.order == HeaderFactory.BUY else -self.shares
+
+
+class MacdState(object):
+    """Running talib MACD, same values as TechnicalPerformance.compute_macd. Leading missing prices are skipped,
+    missing price afterwards makes all following values missing as in talib."""
+
+    def __init__(self, n_fast=12, n_slow=26, signal_period=9):
+        if n_slow < n_fast:
+            n_fast, n_slow = n_slow, n_fast
+        self.n_fast = n_fast
+        self.n_slow = n_slow
+        self.signal_period = signal_period
+        self.reset()
+
+    def reset(self):
+        self._prices = deque(maxlen=self.n_slow)
+        self._macds = []
+        self._count = 0
+        self._fast = np.nan
+        self._slow = np.nan
+        self._signal = np.nan
+
+    def update(self, price: float):
+        """Return macd and signal after price, missing until signal period is complete"""
+        if self._count == 0 and price != price:
+            return np.nan, np.nan
+        self._count += 1
+        if self._count < self.n_slow:
+            self._prices.append(price)
+            return np.nan, np.nan
+        if self._count == self.n_slow:
+            self._prices.append(price)
+            prices = list(self._prices)
+            self._fast = MacdState._get_mean(prices[-self.n_fast:])
+            self._slow = MacdState._get_mean(prices)
+        else:
+            self._fast = MacdState._get_ema(self._fast, price, self.n_fast)
+            self._slow = MacdState._get_ema(self._slow, price, self.n_slow)
+        macd = self._fast - self._slow
+        position = self._count - self.n_slow
+        if position < self.signal_period - 1:
+            self._macds.append(macd)
+            return np.nan, np.nan
+        if position == self.signal_period - 1:
+            self._macds.append(macd)
+            self._signal = MacdState._get_mean(self._macds)
+            self._macds = []
+        else:
+            self._signal = MacdState._get_ema(self._signal, macd, self.signal_period)
+        return macd, self._signal
+
+    @staticmethod
+    def _get_mean(values: list) -> float:
+        # sequential sum as talib
+        total = values[0]
+        for value in values[1:]:
+            total += value
+        return total / len(values)
+
+    @staticmethod
+    def _get_ema(previous: float, value: float, period: int) -> float:
+        return ((value - previous) * (2.0 / (period + 1))) + previous
+
+
+class BollingerSignal(object):
+    """Bar by bar BollingerBandStrategy raw orders of one symbol: BUY on Bollinger value rising over -1, SELL on
+    falling under 1 and EXIT on price crossing rolling mean. EXIT wins over SELL, SELL over BUY."""
+
+    def __init__(self, window=20):
+        self.bollinger = BollingerIndicator(window)
+        self.previous = None
+
+    def update(self, price: float, valid: bool):
+        """Return raw order of bar, None if no order or bar has missing field or feature"""
+        features = self.get_features(price)
+        previous, self.previous = self.previous, features
+        if previous is None or not valid or any(value != value for value in features.values()):
+            return None
+        if self.is_exit(features, previous):
+            return HeaderFactory.EXIT
+        if features[HeaderFactory.Bollinger] < 1 <= previous[HeaderFactory.Bollinger]:
+            return HeaderFactory.SELL
+        if features[HeaderFactory.Bollinger] > -1 >= previous[HeaderFactory.Bollinger]:
+            return HeaderFactory.BUY
+        return None
+
+    def get_features(self, price: float) -> dict:
+        features = self.bollinger.update(price)
+        features[HeaderFactory.SMA] = (price / self.bollinger.get_mean()) - 1
+        return features
+
+    def is_exit(self, features: dict, previous: dict) -> bool:
+        return BollingerSignal.is_cross(features[HeaderFactory.SMA], previous[HeaderFactory.SMA])
+
+    @staticmethod
+    def is_cross(value: float, previous: float) -> bool:
+        """True if value reaches zero from opposite side"""
+        return (value >= 0 > previous) or (value <= 0 < previous)
+
+
+class MACDBollingerSignal(BollingerSignal):
+    """BollingerSignal with EXIT also on MACD crossing its signal line."""
+
+    def __init__(self, window=20):
+        super(MACDBollingerSignal, self).__init__(window)
+        self.macd = MacdState()
+
+    def get_features(self, price: float) -> dict:
+        features = super(MACDBollingerSignal, self).get_features(price)
+        macd, signal = self.macd.update(price)
+        features[HeaderFactory.MACD] = macd
+        features[HeaderFactory.MACD_SIGNAL] = signal
+        features[HeaderFactory.MACD_DIFF] = macd - signal
+        return features
+
+    def is_exit(self, features: dict, previous: dict) -> bool:
+        return super(MACDBollingerSignal, self).is_exit(features, previous) or \
+            BollingerSignal.is_cross(features[HeaderFactory.MACD_DIFF], previous[HeaderFactory.MACD_DIFF])
+
+
+class StreamingStrategy(object):
+    """Strategy callbacks per bar. Raw orders of symbol signals are turned into orders as BaseStrategy does:
+    repeated raw order is ignored, EXIT closes previous order direction and leading EXIT is dropped."""
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, symbols: list, shares=100):
+        self.symbols = symbols
+        self.shares = shares
+        self.signals = [self.create_signal() for _ in symbols]
+        self._last = [None] * len(symbols)
+
+    @abc.abstractmethod
+    def create_signal(self):
+        pass
+
+    def on_bar(self, bar: Bar) -> list:
+        orders = []
+        for position, symbol in enumerate(self.symbols):
+            raw = self.signals[position].update(bar.prices[position], bar.valid[position])
+            order = self._get_order(position, raw)
+            if order is not None:
+                orders.append(Order(bar.date, symbol, order, self.shares))
+        return orders
+
+    def _get_order(self, position: int, raw: str):
+        last = self._last[position]
+        if raw is None or raw == last:
+            return None
+        self._last[position] = raw
+        if raw != HeaderFactory.EXIT:
+            return raw
+        if last is None:
+            return None
+        return HeaderFactory.SELL if last == HeaderFactory.BUY else HeaderFactory.BUY
+
+
+class StreamingBollingerBandStrategy(StreamingStrategy):
+
+    def create_signal(self):
+        return BollingerSignal()
+
+
+class StreamingMACDBollingerBandStrategy(StreamingStrategy):
+
+    def create_signal(self):
+        return MACDBollingerSignal()
+
+
+class OrderBook(object):
+    """Orders waiting for execution, filled at close price of bar they were submitted on."""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, order: Order):
+        self.pending.append(order)
+
+    def fill(self, bar: Bar) -> list:
+        filled = [order for order in self.pending if order.date == bar.date]
+        self.pending = [order for order in self.pending if order.date != bar.date]
+        return filled
+
+
+class PortfolioLedger(object):
+    """Incremental holdings, cash and value, same accounting as OrdersSimulator over ledger symbols: trades on
+    unpriced bars are free and value is recorded from first trade on bars where all symbols are priced, as for
+    PortfolioOrders of orders in all ledger symbols. Without history only current state is kept."""
+
+    def __init__(self, symbols: list, start_val: float, history=True):
+        self.symbols = symbols
+        self.positions = {symbol: position for position, symbol in enumerate(symbols)}
+        self.start_val = start_val
+        self.history = history
+        self.holdings = np.zeros(len(symbols))
+        self.traded = False
+        self.cash = float(start_val)
+        self.value = np.nan
+        self.orders = []
+        self.dates = []
+        self.values = []
+
+    def fill(self, order: Order, price: float):
+        position = self.positions[order.symbol]
+        shares = order.get_signed_shares()
+        self.holdings[position] += shares
+        self.traded = True
+        if price == price:
+            self.cash -= shares * price
+        if self.history:
+            self.orders.append(order)
+
+    def mark(self, bar: Bar) -> float:
+        """Value of portfolio at bar close, NaN before first trade or with any symbol unpriced, held or not"""
+        if not self.traded:
+            return np.nan
+        self.value = (self.holdings * bar.prices).sum() + self.cash
+        if self.value == self.value and self.history:
+            self.dates.append(bar.date)
+            self.values.append(self.value)
+        return self.value
+
+    def get_daily_values(self) -> pd.Series:
+        return pd.Series(self.values, index=pd.DatetimeIndex(self.dates))
+
+    def get_orders(self) -> pd.DataFrame:
+        """Filled orders in StrategyManager instruction layout"""
+        orders = pd.DataFrame({"Symbol": [order.symbol for order in self.orders],
+                               HeaderFactory.Order: [order.order for order in self.orders],
+                               "Shares": [order.shares for order in self.orders]},
+                              index=pd.DatetimeIndex([order.date for order in self.orders], name="Date"),
+                              columns=["Symbol", HeaderFactory.Order, "Shares"])
+        return orders
+
+
+class EventEngine(object):
+    """Runs streaming strategy over bars: strategy orders go to order book and are filled into ledger bar by bar.
+    Memory is bounded by strategy windows when ledger history is off."""
+
+    def __init__(self, strategy: StreamingStrategy, start_val=10000, history=True):
+        self.strategy = strategy
+        self.book = OrderBook()
+        self.ledger = PortfolioLedger(strategy.symbols, start_val, history)
+
+    def run(self, bars) -> PortfolioLedger:
+        count = 0
+        for bar in bars:
+            self.on_bar(bar)
+            count += 1
+        logger.info("Processed %d bars, %d orders", count, len(self.ledger.orders))
+        return self.ledger
+
+    def on_bar(self, bar: Bar) -> float:
+        for order in self.strategy.on_bar(bar):
+            self.book.submit(order)
+        for order in self.book.fill(bar):
+            self.ledger.fill(order, bar.prices[self.ledger.positions[order.symbol]])
+        return self.ledger.mark(bar)
+
+    @staticmethod
+    def run_frame(strategy_type, symbols: list, df_prices: pd.DataFrame, start_val=10000) -> PortfolioLedger:
+        """Stream strategy price frame as used by StrategyManager"""
+        return EventEngine(strategy_type(symbols), start_val).run(BarStream(df_prices, symbols))
@@ -1,5 +1,6 @@
 import abc
 
+import numpy as np
 import pandas as pd
 
 from PortfolioBasic.Definitions import HeaderFactory
@@ -19,65 +20,86 @@ class ExitStrategy(object):
 
 class DayExitStrategy(ExitStrategy):
 
-    def __init__(self, days: int, stop_loss: StopLossStrategy):
+    def __init__(self, days: int, stop_loss: StopLossStrategy, short_stops=False):
+        """short_stops gives SELL entries short bounds of stop_loss, by default every entry has long bounds as in
+        existing results"""
         self.days = days
+        self.short_stops = short_stops
         if stop_loss is None:
             raise ValueError("Please add stop loss")
         super(DayExitStrategy, self).__init__(stop_loss)
 
     def process_exit(self, instructions: pd.DataFrame) -> pd.DataFrame:
-        mask = instructions.loc[(instructions[HeaderFactory.Order] == HeaderFactory.BUY) |
-                                (instructions[HeaderFactory.Order] == HeaderFactory.SELL)]
-
+        """Exit every position after days or on first price touching its stop bounds, on date sorted instructions.
+        Repeated signal in position direction is dropped and extends holding, reversal doubles shares. Order, Shares,
+        StopLow and StopHigh are updated in place."""
+        orders = instructions[HeaderFactory.Order].values.copy()
+        signals = np.flatnonzero((orders == HeaderFactory.BUY) | (orders == HeaderFactory.SELL))
+        if len(signals) == 0:
+            return instructions.dropna(subset=[HeaderFactory.Order])
+
+        dates = instructions.index
+        prices = instructions[HeaderFactory.Price].values
+        shares = instructions[HeaderFactory.Shares].values.copy()
+        stop_low = self._get_column(instructions, HeaderFactory.StopLow)
+        stop_high = self._get_column(instructions, HeaderFactory.StopHigh)
+        count = len(dates)
+        short = orders[signals] == HeaderFactory.SELL if self.short_stops else False
+        signal_low, signal_high = self.stop_loss.get_exits(dates[signals], short)
         action = None
-        exit_date = None
-        # current.timedelta(days=-self.days):
-        for date in mask.index:
+        exit_loc = None
+        low = high = None
+        # first touching row, when signal is on last row previous search result (initially first signal) is kept
+        first_touch = signals[0]
+        for signal, loc in enumerate(signals):
             new_order = False
-            loc = instructions.index.get_loc(date)
-            index = self.days + loc
-            if index < len(instructions.index):
-                possible_exit_date = instructions.index[index]
-            else:
-                possible_exit_date = None
-
-            if exit_date is not None and exit_date < date:
-                instructions.loc[exit_date, HeaderFactory.Order] = self._get_exit(action)
+            possible_exit = loc + self.days if loc + self.days < count else None
+            if exit_loc is not None and exit_loc < loc:
+                orders[exit_loc] = self._get_exit(action)
                 action = None
 
-            current = instructions.loc[date, HeaderFactory.Order]
+            current = orders[loc]
             if current == action or action is None:
                 if action is not None:
-                    instructions.loc[date, HeaderFactory.Order] = None
+                    orders[loc] = None
                 else:
                     new_order = True
-
-                exit_date = possible_exit_date
-                action = current
             else:
                 new_order = True
-                instructions.loc[date, HeaderFactory.Shares] *= 2
-                exit_date = possible_exit_date
-                action = current
+                shares[loc] *= 2
+            exit_loc = possible_exit
+            action = current
 
             if new_order:
-                low, high = self.stop_loss.get_exit(date)
-                instructions.loc[date, HeaderFactory.StopLow] = low
-                instructions.loc[date, HeaderFactory.StopHigh] = high
-
-            if len(instructions.index) > (loc + 1):
-                next_day = instructions.index[loc + 1]
-                mask = instructions.loc[(instructions[HeaderFactory.Price] >= high) |
-                                        (instructions[HeaderFactory.Price] <= low)].loc[next_day:possible_exit_date]
-
-            if len(mask.index) > 0:
-                exit_date = mask.index[0]
-
-        if exit_date is not None:
-            instructions.loc[exit_date, HeaderFactory.Order] = self._get_exit(action)
-
+                # bounds are kept for following signals in same direction
+                low = signal_low[signal]
+                high = signal_high[signal]
+                stop_low[loc] = low
+                stop_high[loc] = high
+
+            if count > loc + 1:
+                window = prices[loc + 1:count if possible_exit is None else possible_exit + 1]
+                touched = np.flatnonzero((window >= high) | (window <= low))
+                first_touch = loc + 1 + touched[0] if len(touched) > 0 else None
+
+            if first_touch is not None:
+                exit_loc = first_touch
+
+        if exit_loc is not None:
+            orders[exit_loc] = self._get_exit(action)
+
+        instructions[HeaderFactory.Order] = orders
+        instructions[HeaderFactory.Shares] = shares
+        instructions[HeaderFactory.StopLow] = stop_low
+        instructions[HeaderFactory.StopHigh] = stop_high
         return instructions.dropna(subset=[HeaderFactory.Order])
 
+    @staticmethod
+    def _get_column(instructions: pd.DataFrame, column: str) -> np.ndarray:
+        if column in instructions.columns:
+            return instructions[column].values.astype(np.float64)
+        return np.full(len(instructions), np.nan)
+
     def _get_exit(self, action: str) -> str:
         if action == HeaderFactory.BUY:
             return HeaderFactory.SELL
@@ -1,10 +1,13 @@
+import copy
 import datetime
 import logging
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 
 from PortfolioBasic.Definitions import HeaderFactory, Utilities
-from PortfolioBasic.MachineLearning.SimpleAlgoTrader import BaseAlgoTrader
+from PortfolioBasic.MachineLearning.ModelStore import ModelStore
+from PortfolioBasic.MachineLearning.SimpleAlgoTrader import BaseAlgoTrader, LinearAlgoTrader
 from PortfolioBasic.Portfolio import PortfolioOrders
 from PortfolioBasic.Strategy.BasicStrategies import BaseStrategy
 from PortfolioBasic.Strategy.ExitStrategies import ExitStrategy, DayExitStrategy
@@ -15,15 +18,22 @@ logger = logging.getLogger(__name__)
 
 class MachineStrategyManager(object):
 
-    def __init__(self, symbol: str, algo: BaseAlgoTrader):
+    def __init__(self, symbol: str, algo: BaseAlgoTrader, short_stops=False):
+        """short_stops gives SELL entries short stop bounds, see DayExitStrategy"""
         self.symbols = [symbol]
         self.algo = algo
+        self.short_stops = short_stops
 
-    def train_strategy(self, start_date: datetime, end_date: datetime):
+    def train_strategy(self, start_date: datetime, end_date: datetime, store: ModelStore = None):
+        """Train algo on prices of period, with store trained algo is saved and reused while prices and algo
+        configuration are unchanged"""
         logger.info("Training %s %s - %s", self.symbols[0], start_date.isoformat(), end_date.isoformat())
         df_prices = PortfolioOrders.resources.get_data(self.symbols, start_date, end_date, True)
         Utilities.fill_missing_values(df_prices)
-        self.algo.train(df_prices)
+        if store is None:
+            self.algo.train(df_prices)
+        else:
+            self.algo = store.train(self.symbols[0], self.algo, df_prices)
 
     def process_strategy(self, start_date: datetime, end_date: datetime, threshold=0.005):
         logger.info("Processing %s %s - %s", self.symbols[0], start_date.isoformat(), end_date.isoformat())
@@ -36,7 +46,7 @@ class MachineStrategyManager(object):
         created = MachineStrategy(self.symbols,
                                   self.algo,
                                   df_prices,
-                                  DayExitStrategy(self.algo.prediction_days, stop_loss),
+                                  DayExitStrategy(self.algo.prediction_days, stop_loss, self.short_stops),
                                   original_date,
                                   end_date,
                                   threshold=threshold,
@@ -45,20 +55,30 @@ class MachineStrategyManager(object):
             raise ValueError("Invalid amount of instructions")
         instruction = created.instructions[0]
         instruction.index.name = "Date"
-        return instruction.ix[original_date.isoformat():end_date.isoformat()]
+        return instruction.loc[original_date:end_date]
+
+    def walk_forward(self, start_date: datetime, end_date: datetime, train_days=504, test_days=63, step_days=None,
+                     threshold=0.005, workers=1) -> 'WalkForwardResult':
+        """Retrain and trade fold by fold over history loaded once, see WalkForwardPipeline"""
+        pipeline = WalkForwardPipeline(self.symbols[0], self.algo, train_days, test_days, step_days, threshold,
+                                       self.short_stops)
+        return pipeline.run(start_date, end_date, workers)
 
 
 class MachineStrategy(BaseStrategy):
     def __init__(self, symbols: list, algo: BaseAlgoTrader, df_prices: pd.DataFrame, exit: ExitStrategy,
-                 from_date: datetime, end_date: datetime, threshold=0.01, dump=False):
+                 from_date: datetime, end_date: datetime, threshold=0.01, dump=False, prediction=None):
+        """prediction is result of algo predict on df_prices, computed if not given"""
         if len(symbols) != 1:
             raise ValueError('Only 1 symbol can be used')
         self.exit = exit
         self.threshold = threshold
         self.algo = algo
-        self.result, self.rmse, self.c = self.algo.predict(df_prices)
-        self.result = self.result.ix[from_date.isoformat():end_date.isoformat()]
-        df_prices = df_prices.ix[from_date.isoformat():end_date.isoformat()]
+        if prediction is None:
+            prediction = self.algo.predict(df_prices)
+        self.result, self.rmse, self.c = prediction
+        self.result = self.result.loc[from_date:end_date]
+        df_prices = df_prices.loc[from_date:end_date]
         logger.info("Training result [%s] RMSE:%f Correliation:%f", symbols[0], self.rmse, self.c)
         super(MachineStrategy, self).__init__(symbols, df_prices, None, dump)
 
@@ -80,3 +100,96 @@ class MachineStrategy(BaseStrategy):
         instruction = super(MachineStrategy, self).setup_data(symbol)
         instruction = instruction.join(self.result)
         return instruction
+
+
+def train_fold(algo: LinearAlgoTrader, x_train: pd.DataFrame, y_train: pd.Series, x_test: pd.DataFrame,
+               y_test: pd.Series):
+    """Train copy of algo on fold features and predict fold test period, module level to be usable by process
+    pool. Returns trained algo and its prediction."""
+    algo = copy.deepcopy(algo)
+    algo.train_features(x_train, y_train)
+    return algo, algo.predict_features(x_test, y_test)
+
+
+class WalkForwardResult(object):
+    """Out of sample instructions of all folds, metrics per fold and algo trained for each fold."""
+
+    def __init__(self, instructions: pd.DataFrame, folds: pd.DataFrame, algos: list):
+        self.instructions = instructions
+        self.folds = folds
+        self.algos = algos
+
+
+class WalkForwardPipeline(object):
+    """Features and targets are computed once on full history, each fold trains copy of algo on train_days rows
+    (last prediction_days rows without target known at fold end are skipped) and trades following test_days
+    rows. Windows move by step_days, test_days if not specified, shorter steps would overlap test periods."""
+
+    def __init__(self, symbol: str, algo: LinearAlgoTrader, train_days=504, test_days=63, step_days=None,
+                 threshold=0.005, short_stops=False):
+        if test_days <= algo.prediction_days:
+            raise ValueError("Test period has to be longer than {} prediction days".format(algo.prediction_days))
+        if step_days is not None and step_days < test_days:
+            raise ValueError("Step of {} days would overlap test periods of {} days".format(step_days, test_days))
+        self.symbol = symbol
+        self.algo = algo
+        self.train_days = train_days
+        self.test_days = test_days
+        self.step_days = test_days if step_days is None else step_days
+        self.threshold = threshold
+        self.short_stops = short_stops
+
+    def run(self, start_date: datetime, end_date: datetime, workers=1) -> WalkForwardResult:
+        logger.info("Walk forward %s %s - %s", self.symbol, start_date.isoformat(), end_date.isoformat())
+        df_prices = PortfolioOrders.resources.get_data([self.symbol], start_date, end_date, True)
+        Utilities.fill_missing_values(df_prices)
+        return self.run_prices(df_prices, workers)
+
+    def get_folds(self, dates: pd.DatetimeIndex) -> list:
+        """Train start, train end, test start and test end date per fold, last test period may be shorter"""
+        folds = []
+        for start in range(0, len(dates) - self.train_days, self.step_days):
+            test_start = start + self.train_days
+            test_end = min(test_start + self.test_days, len(dates))
+            if test_end - test_start <= self.algo.prediction_days:
+                break
+            folds.append((dates[start], dates[test_start - 1], dates[test_start], dates[test_end - 1]))
+        return folds
+
+    def run_prices(self, df_prices: pd.DataFrame, workers=1) -> WalkForwardResult:
+        x_data, y_data = self.algo.get_data(df_prices)
+        folds = self.get_folds(df_prices.index)
+        logger.info("Walk forward over %d folds", len(folds))
+        arguments = [[], [], [], []]
+        for train_start, train_end, test_start, test_end in folds:
+            arguments[0].append(x_data.loc[train_start:train_end])
+            arguments[1].append(y_data.loc[train_start:train_end])
+            arguments[2].append(x_data.loc[test_start:test_end])
+            arguments[3].append(y_data.loc[test_start:test_end])
+
+        algos = [self.algo] * len(folds)
+        if workers <= 1 or len(folds) <= 1:
+            results = list(map(train_fold, algos, *arguments))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(train_fold, algos, *arguments))
+
+        stop_loss = ATRStopLossStrategy()
+        stop_loss.pre_process(df_prices)
+        instructions = []
+        metrics = []
+        for (train_start, train_end, test_start, test_end), (algo, prediction) in zip(folds, results):
+            result, rmse, c = prediction
+            created = MachineStrategy([self.symbol], algo, df_prices.loc[test_start:test_end],
+                                      DayExitStrategy(algo.prediction_days, stop_loss, self.short_stops), test_start,
+                                      test_end,
+                                      threshold=self.threshold, dump=algo.dump,
+                                      prediction=(result.loc[test_start:test_end], rmse, c))
+            instruction = created.instructions[0]
+            instruction.index.name = "Date"
+            instructions.append(instruction)
+            metrics.append((train_start, train_end, test_start, test_end, created.rmse, created.c, len(instruction)))
+
+        folds = pd.DataFrame(metrics, columns=["TrainStart", "TrainEnd", "TestStart", "TestEnd", "RMSE",
+                                               "Correlation", "Orders"])
+        return WalkForwardResult(pd.concat(instructions), folds, [algo for algo, _ in results])
@@ -0,0 +1,174 @@
+import datetime
+import itertools
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Market.MarketDataService import MarketDataSource
+from PortfolioBasic.Portfolio import Portfolio, PortfolioOrders
+from PortfolioBasic.Strategy.BasicStrategies import StrategyManager
+from PortfolioBasic.Strategy.MachineStrategy import MachineStrategyManager
+from PortfolioBasic.Strategy.StopLossStrategies import ATRStopLossStrategy
+from PortfolioBasic.Technical.Analysis import PortfolioAnalyser
+
+logger = logging.getLogger(__name__)
+
+
+class ParameterGrid(object):
+    """All combinations of named parameter values, last parameter changing fastest."""
+
+    def __init__(self, parameters: dict):
+        self.parameters = OrderedDict(parameters)
+
+    def __iter__(self):
+        names = list(self.parameters.keys())
+        for values in itertools.product(*self.parameters.values()):
+            yield OrderedDict(zip(names, values))
+
+    def __len__(self):
+        return int(np.prod([len(values) for values in self.parameters.values()]))
+
+    @staticmethod
+    def get_key(point: dict) -> str:
+        """Stable text key of grid point"""
+        values = [(name, value.item() if isinstance(value, np.generic) else value)
+                  for name, value in sorted(point.items())]
+        return ",".join("{}={!r}".format(name, value) for name, value in values)
+
+
+class StrategyEvaluator(object):
+    """Portfolio of StrategyManager strategy, point parameters are passed to stop loss (e.g. low and high of
+    ATRStopLossStrategy), no stop loss for empty point or stop_loss None."""
+
+    def __init__(self, strategy, symbols: list, start_date: datetime, end_date: datetime, start_val=10000,
+                 stop_loss=ATRStopLossStrategy):
+        self.strategy = strategy
+        self.symbols = symbols
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_val = start_val
+        self.stop_loss = stop_loss
+
+    def __call__(self, point: dict) -> Portfolio:
+        manager = StrategyManager(self.symbols, self.start_date, self.end_date)
+        stop_loss = None
+        if self.stop_loss is not None and len(point) > 0:
+            stop_loss = self.stop_loss(**point)
+        manager.process_strategy(self.strategy, stop_loss)
+        return PortfolioOrders(manager.instruction, self.start_val)
+
+
+class MachineStrategyEvaluator(object):
+    """Portfolio of MachineStrategy trained on train period. Point threshold is strategy threshold, other
+    parameters are passed to picklable algo factory (e.g. indicator windows, prediction_days used as exit days)."""
+
+    def __init__(self, symbol: str, algo_factory, train_start: datetime, train_end: datetime, start_date: datetime,
+                 end_date: datetime, start_val=10000):
+        self.symbol = symbol
+        self.algo_factory = algo_factory
+        self.train_start = train_start
+        self.train_end = train_end
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_val = start_val
+
+    def __call__(self, point: dict) -> Portfolio:
+        parameters = dict(point)
+        threshold = parameters.pop('threshold', 0.005)
+        manager = MachineStrategyManager(self.symbol, self.algo_factory(**parameters))
+        manager.train_strategy(self.train_start, self.train_end)
+        orders = manager.process_strategy(self.start_date, self.end_date, threshold)
+        return PortfolioOrders(orders, self.start_val)
+
+
+def use_resources(resources: MarketDataSource):
+    """Process pool initializer, workers read prices from given source"""
+    Portfolio.resources = resources
+
+
+def evaluate_point(evaluate, point: dict, interest_rate: float) -> OrderedDict:
+    """Performance metrics of portfolio created for grid point, module level to be usable by process pool."""
+    PortfolioAnalyser.interest_rate = interest_rate
+    performance = PortfolioAnalyser.assess_portfolio(evaluate(point))
+    result = OrderedDict(point)
+    for metric in SweepRunner.Metrics:
+        result[metric] = float(getattr(performance, metric))
+    return result
+
+
+class SweepRunner(object):
+    """Evaluates portfolio factory on every grid point and collects PortfolioPerformance metrics in one table.
+    Completed points are appended to checkpoint CSV as they finish and skipped when run is resumed, failed points
+    are logged and retried on next run."""
+    Key = 'key'
+    Metrics = ['cumulative_return', 'avg_daily_return', 'volatility', 'sharpe_ratio']
+
+    def __init__(self, evaluate, grid: ParameterGrid, checkpoint: str = None):
+        self.evaluate = evaluate
+        self.grid = grid
+        self.checkpoint = checkpoint
+
+    def run(self, resources: MarketDataSource = None, workers=1) -> pd.DataFrame:
+        """Run pending points on resources (SharedMarketDataSource to load prices once), current
+        Portfolio.resources if not specified. Returns results in grid order."""
+        done = self.load_checkpoint()
+        points = [point for point in self.grid if ParameterGrid.get_key(point) not in done.index]
+        logger.info("Sweep of %d points, %d done, %d pending", len(self.grid), len(done), len(points))
+        results = [done]
+        for point, result in self.run_points(points, resources, workers):
+            row = pd.DataFrame([result], index=pd.Index([ParameterGrid.get_key(point)], name=SweepRunner.Key))
+            self.save_checkpoint(row)
+            results.append(row)
+
+        table = pd.concat(results)
+        keys = [ParameterGrid.get_key(point) for point in self.grid]
+        return table.reindex([key for key in keys if key in table.index])
+
+    def run_points(self, points: list, resources: MarketDataSource, workers: int):
+        """Yield point and its result in completion order"""
+        interest_rate = PortfolioAnalyser.interest_rate
+        if workers <= 1 or len(points) <= 1:
+            original = Portfolio.resources
+            use_resources(original if resources is None else resources)
+            try:
+                for point in points:
+                    result = self.try_point(lambda: evaluate_point(self.evaluate, point, interest_rate), point)
+                    if result is not None:
+                        yield point, result
+            finally:
+                Portfolio.resources = original
+            return
+
+        if resources is None:
+            resources = Portfolio.resources
+        with ProcessPoolExecutor(max_workers=workers, initializer=use_resources,
+                                 initargs=(resources,)) as executor:
+            futures = {executor.submit(evaluate_point, self.evaluate, point, interest_rate): point
+                       for point in points}
+            for future in as_completed(futures):
+                point = futures[future]
+                result = self.try_point(future.result, point)
+                if result is not None:
+                    yield point, result
+
+    @staticmethod
+    def try_point(get_result, point: dict):
+        try:
+            return get_result()
+        except Exception as error:
+            logger.warning("Sweep point %s failed: %s", ParameterGrid.get_key(point), error)
+            return None
+
+    def load_checkpoint(self) -> pd.DataFrame:
+        if self.checkpoint is None or not os.path.isfile(self.checkpoint):
+            return pd.DataFrame(index=pd.Index([], name=SweepRunner.Key))
+        return pd.read_csv(self.checkpoint, index_col=SweepRunner.Key)
+
+    def save_checkpoint(self, row: pd.DataFrame):
+        if self.checkpoint is None:
+            return
+        row.to_csv(self.checkpoint, mode='a', header=not os.path.isfile(self.checkpoint))
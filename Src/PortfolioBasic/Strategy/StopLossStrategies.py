@@ -1,6 +1,7 @@
 import abc
 import datetime
 
+import numpy as np
 import pandas as pd
 
 from PortfolioBasic.Technical.Analysis import HeaderFactory, TechnicalPerformance
@@ -17,6 +18,14 @@ class StopLossStrategy(object):
     def get_exit(self, date: datetime, short=False):
         pass
 
+    def get_exits(self, dates, short=False):
+        """Return low and high exit arrays for dates, short can be single flag or flag per date"""
+        flags = np.broadcast_to(np.asarray(short, dtype=bool), (len(dates),))
+        bounds = [self.get_exit(date, flag) for date, flag in zip(dates, flags)]
+        low = np.array([bound[0] for bound in bounds], dtype=np.float64)
+        high = np.array([bound[1] for bound in bounds], dtype=np.float64)
+        return low, high
+
     @abc.abstractmethod
     def process(self, original_data: pd.DataFrame, instruction_original: pd.DataFrame) -> pd.DataFrame:
         pass
@@ -44,8 +53,17 @@ class ATRStopLossStrategy(StopLossStrategy):
 
         return low, high
 
-    def process(self, original_data: pd.DataFrame, instruction_original: pd.DataFrame) -> pd.DataFrame:
+    def get_exits(self, dates, short=False):
+        """Return low and high exit arrays for dates, short can be single flag or flag per date"""
+        selected = self.data.loc[dates]
+        prices = selected[HeaderFactory.Price].values
+        return StopLossEngine(self.low, self.high).get_bounds(prices, prices, selected[HeaderFactory.ADR].values,
+                                                              short)
 
+    def process(self, original_data: pd.DataFrame, instruction_original: pd.DataFrame) -> pd.DataFrame:
+        """Original rule kept for existing strategy results: every row past forward filled stops is EXIT and short
+        entries write StopTop, so their high stop is carried over from previous long entry. TrailingStopLossStrategy
+        tracks stops per position with StopLossEngine."""
         self.pre_process(original_data)
         data = self.data
         data.loc[instruction_original.index, HeaderFactory.Order] = instruction_original[HeaderFactory.Order]
@@ -73,3 +91,92 @@ class ATRStopLossStrategy(StopLossStrategy):
         original_instruction_full.loc[mask.index, HeaderFactory.Order] = HeaderFactory.EXIT
         # original_instruction_full.to_csv("instruction.csv")
         return original_instruction_full
+
+
+class StopLossEngine(object):
+    """Stop loss hits per position in single pass over price arrays, used by TrailingStopLossStrategy.
+    Long position is stopped below entry low - low * ADR and takes profit above entry high + high * ADR, short is
+    mirrored. Trailing stop follows price away from entry, profit side stays fixed."""
+    Long = 1
+    Short = -1
+    Flat = 0
+
+    def __init__(self, low=2, high=3, trailing=False):
+        self.low = low
+        self.high = high
+        self.trailing = trailing
+
+    def get_bounds(self, low_base: np.ndarray, high_base: np.ndarray, adr: np.ndarray, short=False):
+        """Return stop low and high arrays of positions entered at given bases"""
+        short = np.asarray(short, dtype=bool)
+        low = np.where(short, low_base - self.high * adr, low_base - self.low * adr)
+        high = np.where(short, high_base + self.low * adr, high_base + self.high * adr)
+        return low, high
+
+    def run(self, prices: np.ndarray, low_base: np.ndarray, high_base: np.ndarray, adr: np.ndarray,
+            events: np.ndarray):
+        """Events per row are Long or Short to enter (replacing open position), Flat to close and NaN for none.
+        Return stop low, stop high of open position per row (NaN if none) and mask of rows with stop hit."""
+        count = len(prices)
+        stop_low = np.full(count, np.nan)
+        stop_high = np.full(count, np.nan)
+        hits = np.zeros(count, dtype=bool)
+        entry_low, entry_high = self.get_bounds(low_base, high_base, adr, events == StopLossEngine.Short)
+        trailing_low = low_base - self.low * adr
+        trailing_high = high_base + self.low * adr
+        position = StopLossEngine.Flat
+        low = high = np.nan
+        for index in range(count):
+            event = events[index]
+            if event == event:
+                position = int(event)
+                if position == StopLossEngine.Flat:
+                    continue
+                low = entry_low[index]
+                high = entry_high[index]
+            elif position != StopLossEngine.Flat:
+                price = prices[index]
+                if price <= low or price >= high:
+                    hits[index] = True
+                    position = StopLossEngine.Flat
+                elif self.trailing:
+                    if position == StopLossEngine.Long:
+                        low = max(low, trailing_low[index])
+                    else:
+                        high = min(high, trailing_high[index])
+            else:
+                continue
+            stop_low[index] = low
+            stop_high[index] = high
+
+        return stop_low, stop_high, hits
+
+    @staticmethod
+    def get_events(orders: np.ndarray) -> np.ndarray:
+        """Engine events of BUY, SELL and EXIT orders"""
+        events = np.full(len(orders), np.nan)
+        events[orders == HeaderFactory.BUY] = StopLossEngine.Long
+        events[orders == HeaderFactory.SELL] = StopLossEngine.Short
+        events[orders == HeaderFactory.EXIT] = StopLossEngine.Flat
+        return events
+
+
+class TrailingStopLossStrategy(ATRStopLossStrategy):
+    """ATR stop loss tracked per position by StopLossEngine, position is exited on first stop hit only.
+    Fixed stops if trailing is False."""
+
+    def __init__(self, low=2, high=3, trailing=True):
+        super(TrailingStopLossStrategy, self).__init__(low, high)
+        self.engine = StopLossEngine(low, high, trailing)
+
+    def process(self, original_data: pd.DataFrame, instruction_original: pd.DataFrame) -> pd.DataFrame:
+        self.pre_process(original_data)
+        instructions = self.data.copy()
+        instructions.loc[instruction_original.index, HeaderFactory.Order] = instruction_original[HeaderFactory.Order]
+        orders = instructions[HeaderFactory.Order].values.copy()
+        _, _, hits = self.engine.run(instructions[HeaderFactory.Price].values, instructions[HeaderFactory.Low].values,
+                                     instructions[HeaderFactory.High].values, instructions[HeaderFactory.ADR].values,
+                                     StopLossEngine.get_events(orders))
+        orders[hits] = HeaderFactory.EXIT
+        instructions[HeaderFactory.Order] = orders
+        return instructions
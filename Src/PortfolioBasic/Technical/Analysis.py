@@ -1,9 +1,11 @@
+import numpy as np
 import pandas as pd
-import scipy.optimize as spo
 import logging
-import talib
 from PortfolioBasic import Portfolio
 from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
+from PortfolioBasic.Technical.Kernels import Kernels
+from PortfolioBasic.Technical.Optimization import SharpeObjective, SharpeOptimizer, EfficientFrontier, FrontierResult
 
 logger = logging.getLogger(__name__)
 
@@ -34,16 +36,25 @@ class PortfolioAnalyser:
     @staticmethod
     def optimize_portfolio(portfolio: Portfolio):
         logger.info("Optimizing portfolio")
+        objective = SharpeObjective.from_portfolio(portfolio, PortfolioAnalyser.interest_rate)
+        portfolio.allocations = SharpeOptimizer.optimize(objective, portfolio.allocations, disp=True)
+        logger.info("Calculated allocations %s", portfolio.allocations)
 
-        bounds = []
-        for _ in portfolio.allocations:
-            bounds.append((0, 1))
+    @staticmethod
+    def optimize_portfolios(portfolios: list, workers=1):
+        """Optimize allocations of many portfolios in one batch"""
+        logger.info("Optimizing %d portfolios", len(portfolios))
+        objectives = [SharpeObjective.from_portfolio(portfolio, PortfolioAnalyser.interest_rate)
+                      for portfolio in portfolios]
+        results = SharpeOptimizer.optimize_many(objectives, [portfolio.allocations for portfolio in portfolios],
+                                                workers)
+        for portfolio, allocations in zip(portfolios, results):
+            portfolio.allocations = allocations
 
-        constrain = ({'type': 'eq', 'fun': lambda x: 1 - sum(x)})
-        result = spo.minimize(PortfolioAnalyser.sharpe_function_optimization, portfolio.allocations, args=(portfolio,),
-                              method='SLSQP', bounds=bounds, constraints=constrain, options={'disp': True})
-        logger.info("Calculated allocations %s", result)
-        portfolio.allocations = result.x
+    @staticmethod
+    def efficient_frontier(portfolio: Portfolio, points=100, workers=1) -> FrontierResult:
+        """Minimum variance allocations for evenly spaced target daily returns"""
+        return EfficientFrontier.from_portfolio(portfolio).sweep_targets(points, workers)
 
     @staticmethod
     def sharpe_function_optimization(allocations, portfolio):
@@ -54,7 +65,10 @@ class PortfolioAnalyser:
 
 class TechnicalPerformance:
     @staticmethod
-    def compute_std(data: pd.DataFrame, window=20):
+    def compute_std(data: pd.DataFrame, window=20, graph: ComputationGraph = None):
+        if graph is not None:
+            # shared with other computations on graph of data, returned copies can be modified
+            return graph.rolling_mean(window).copy(), graph.rolling_std(window).copy()
         # 1. Compute rolling mean
         rm = data.rolling(center=False, window=window).mean()
         # 2. Compute rolling standard deviation
@@ -99,48 +113,20 @@ class TechnicalPerformance:
             Returns: panda macd
             '''
 
-        macd = data.apply(TechnicalPerformance._MACD, fastperiod=n_fast, slowperiod=n_slow, signalperiod=signal_period)
-        macd = macd.unstack().reset_index()
-        if len(macd['level_0']) > 0:
-            macd['level_0'] = macd['level_0'] + '_' + macd['level_1']
-        else:
-            macd['level_0'] = macd['level_1']
-        macd = macd.drop('level_1', axis=1)
-        raw_data = macd[0].apply(lambda x: pd.Series(x))
-        macd = macd.drop(0, axis=1).join(raw_data).transpose().reset_index()
-        macd.columns = macd.iloc[0]
-        macd = macd.drop('level_0', axis=1)
-        result = pd.DataFrame(index=data.index, data=macd.iloc[1:].values, columns=macd.columns)
-        return result
-
-    # Define the MACD function
-    @staticmethod
-    def _MACD(prices, fastperiod=12, slowperiod=26, signalperiod=9):
-        '''
-        Function to return the difference between the most recent
-        MACD value and MACD signal. Positive values are long
-        position entry signals
-
-        optional args:
-            fastperiod = 12
-            slowperiod = 26
-            signalperiod = 9
-
-        Returns: macd - signal
-        '''
-        macd, signal, hist = talib.MACD(prices.values,
-                                        fastperiod=fastperiod,
-                                        slowperiod=slowperiod,
-                                        signalperiod=signalperiod)
-
-        return pd.Series({HeaderFactory.MACD: macd, HeaderFactory.MACD_SIGNAL: signal, HeaderFactory.MACD_HIST: hist})
+        macd, signal, hist = Kernels.macd(data.values, n_fast, n_slow, signal_period)
+        fields = [(HeaderFactory.MACD, macd), (HeaderFactory.MACD_SIGNAL, signal), (HeaderFactory.MACD_HIST, hist)]
+        values = np.empty((len(data), len(data.columns) * len(fields)))
+        for position, (_, field_values) in enumerate(fields):
+            values[:, position::len(fields)] = field_values
+        columns = [HeaderFactory.get_name(symbol, field) for symbol in data.columns for field, _ in fields]
+        return pd.DataFrame(values, index=data.index, columns=columns)
 
     @staticmethod
-    def compute_bollinger_bands(data: pd.DataFrame, window=20, deviation=2):
+    def compute_bollinger_bands(data: pd.DataFrame, window=20, deviation=2, graph: ComputationGraph = None):
         # Compute Bollinger Bands
         # 1. Compute rolling mean
 
-        rm, rstd = TechnicalPerformance.compute_std(data, window)
+        rm, rstd = TechnicalPerformance.compute_std(data, window, graph)
         # 3. Compute upper and lower bands
         upper_band, lower_band = TechnicalPerformance.get_bollinger_bands(rm, rstd, deviation)
         rm.columns = HeaderFactory.get_name(rm.columns, HeaderFactory.SMA)
@@ -0,0 +1,460 @@
+import abc
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from PortfolioBasic.Technical.Kernels import Kernels
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import talib
+except ImportError:
+    talib = None
+
+logger = logging.getLogger(__name__)
+
+
+class IndicatorBackend(object):
+    """Indicator kernels on date x column float arrays. Semantics follow current pandas/talib implementations:
+    rolling windows need full window, ewm_mean is pandas adjusted ewm, rsi and macd are talib."""
+    __metaclass__ = abc.ABCMeta
+    name = None
+
+    @abc.abstractmethod
+    def sma(self, values: np.ndarray, window: int) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def rolling_std(self, values: np.ndarray, window: int) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def ewm_mean(self, values: np.ndarray, span: int, min_periods: int) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def rsi(self, values: np.ndarray, period=14) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def macd(self, values: np.ndarray, fast_period=12, slow_period=26, signal_period=9):
+        """Return macd, signal and histogram arrays"""
+        pass
+
+    @abc.abstractmethod
+    def momentum(self, values: np.ndarray, days: int) -> np.ndarray:
+        pass
+
+    def adr(self, high: np.ndarray, low: np.ndarray, period=7) -> np.ndarray:
+        return self.sma(high - low, period)
+
+
+class PandasBackend(IndicatorBackend):
+    """Reference implementation, pandas rolling/ewm and talib per column."""
+    name = 'pandas'
+
+    def sma(self, values: np.ndarray, window: int) -> np.ndarray:
+        return pd.DataFrame(values).rolling(center=False, window=window).mean().values
+
+    def rolling_std(self, values: np.ndarray, window: int) -> np.ndarray:
+        return pd.DataFrame(values).rolling(window=window, center=False).std().values
+
+    def ewm_mean(self, values: np.ndarray, span: int, min_periods: int) -> np.ndarray:
+        return pd.DataFrame(values).ewm(adjust=True, min_periods=min_periods, span=span, ignore_na=False).mean().values
+
+    def rsi(self, values: np.ndarray, period=14) -> np.ndarray:
+        result = np.empty(values.shape)
+        for column in range(values.shape[1]):
+            result[:, column] = talib.RSI(np.ascontiguousarray(values[:, column]), timeperiod=period)
+        return result
+
+    def macd(self, values: np.ndarray, fast_period=12, slow_period=26, signal_period=9):
+        result = [np.empty(values.shape) for _ in range(3)]
+        for column in range(values.shape[1]):
+            outputs = talib.MACD(np.ascontiguousarray(values[:, column]), fastperiod=fast_period,
+                                 slowperiod=slow_period, signalperiod=signal_period)
+            for output, column_values in zip(result, outputs):
+                output[:, column] = column_values
+        return tuple(result)
+
+    def momentum(self, values: np.ndarray, days: int) -> np.ndarray:
+        data = pd.DataFrame(values)
+        return (data / data.shift(days) - 1).values
+
+
+class NumpyBackend(IndicatorBackend):
+    """Vectorized over columns, rows are processed Block at a time: rolling sums restart on every block and
+    recursions are solved as products with matrix of decay powers."""
+    name = 'numpy'
+    Block = 64
+
+    def sma(self, values: np.ndarray, window: int) -> np.ndarray:
+        result = np.full(values.shape, np.nan)
+        if len(values) >= window:
+            result[window - 1:] = sliding_window_view(values, window, axis=0).mean(axis=-1)
+        return result
+
+    def rolling_std(self, values: np.ndarray, window: int) -> np.ndarray:
+        result = np.full(values.shape, np.nan)
+        if len(values) >= window > 1:
+            missing = np.isnan(values)
+            has_missing = missing.any()
+            for start in range(window - 1, len(values), NumpyBackend.Block):
+                stop = min(start + NumpyBackend.Block, len(values))
+                chunk = values[start - window + 1:stop]
+                # running sums of deviations from price inside block, small deviations keep sum of squares minus
+                # squared sum from cancelling at high prices
+                if has_missing:
+                    valid = ~missing[start - window + 1:stop]
+                    anchor = np.where(valid, chunk, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+                    deviations = np.where(valid, chunk - anchor, 0.0)
+                else:
+                    deviations = chunk - chunk[window - 1]
+                sums = np.zeros((len(chunk) + 1, chunk.shape[1]))
+                squares = np.zeros(sums.shape)
+                np.cumsum(deviations, axis=0, out=sums[1:])
+                np.cumsum(deviations * deviations, axis=0, out=squares[1:])
+                total = sums[window:] - sums[:-window]
+                variance = (squares[window:] - squares[:-window] - total * total / window) / (window - 1)
+                result[start:stop] = np.sqrt(np.maximum(variance, 0.0))
+            # windows with missing value are missing, windows of equal prices are exactly zero as in pandas
+            if has_missing:
+                counts = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+                np.cumsum(missing, axis=0, out=counts[1:])
+                result[window - 1:][counts[window:] > counts[:-window]] = np.nan
+            changes = np.ones(values.shape, dtype=np.int64)
+            np.not_equal(values[1:], values[:-1], out=changes[1:])
+            runs = np.cumsum(changes, axis=0)
+            result[window - 1:][runs[window - 1:] == runs[:len(values) - window + 1]] = 0.0
+        return result
+
+    def ewm_mean(self, values: np.ndarray, span: int, min_periods: int) -> np.ndarray:
+        # weighted sum and weight recursion, equal to pandas weighted average update
+        factor = 1.0 - 2.0 / (span + 1)
+        observed = ~np.isnan(values)
+        initial = np.zeros(values.shape[1])
+        numerator = NumpyBackend._decay(np.where(observed, values, 0.0), factor, initial)
+        denominator = NumpyBackend._decay(observed.astype(np.float64), factor, initial)
+        observations = np.cumsum(observed, axis=0)
+        with np.errstate(invalid='ignore'):
+            return np.where(observations >= max(min_periods, 1), numerator / denominator, np.nan)
+
+    def rsi(self, values: np.ndarray, period=14) -> np.ndarray:
+        first_valid = Kernels.get_first_valid(values)
+        aligned = Kernels.align(values, first_valid)
+        result = np.full(values.shape, np.nan)
+        if len(values) > period:
+            changes = np.diff(aligned, axis=0)
+            # gains and losses side by side, missing change goes to gains as in talib
+            columns = values.shape[1]
+            moves = np.empty((len(changes), 2 * columns))
+            np.maximum(changes, 0.0, out=moves[:, :columns])
+            np.minimum(changes, 0.0, out=moves[:, columns:])
+            np.negative(moves[:, columns:], out=moves[:, columns:])
+            average = moves[0].copy()
+            for row in range(1, period):
+                average += moves[row]
+            average /= period
+            # Wilder smoothing seeded by simple average, missing change makes all following averages missing
+            moves = moves[period - 1:] / period
+            moves[0] = average
+            averages = NumpyBackend._decay(moves, (period - 1) / period, np.zeros(2 * columns))
+            result[period:] = NumpyBackend._get_rsi(averages[:, :columns], averages[:, columns:])
+        return Kernels.restore(result, first_valid)
+
+    def macd(self, values: np.ndarray, fast_period=12, slow_period=26, signal_period=9):
+        return Kernels.macd(values, fast_period, slow_period, signal_period)
+
+    def momentum(self, values: np.ndarray, days: int) -> np.ndarray:
+        result = np.full(values.shape, np.nan)
+        if len(values) > days:
+            result[days:] = values[days:] / values[:-days] - 1
+        return result
+
+    @staticmethod
+    def _decay(values: np.ndarray, factor: float, initial: np.ndarray) -> np.ndarray:
+        """Rows of result[row] = factor * result[row - 1] + values[row] following initial row. Recursion runs Block
+        rows at once as product with lower triangular matrix of factor powers, missing value makes following rows
+        missing."""
+        powers = factor ** np.arange(NumpyBackend.Block + 1)
+        offsets = np.subtract.outer(np.arange(NumpyBackend.Block), np.arange(NumpyBackend.Block))
+        decay = np.where(offsets >= 0, powers[np.abs(offsets)], 0.0)
+        missing = np.isnan(values)
+        has_missing = missing.any()
+        if has_missing:
+            values = np.where(missing, 0.0, values)
+        result = np.empty(values.shape)
+        previous = initial
+        for start in range(0, len(values), NumpyBackend.Block):
+            rows = min(NumpyBackend.Block, len(values) - start)
+            np.dot(decay[:rows, :rows], values[start:start + rows], out=result[start:start + rows])
+            result[start:start + rows] += np.outer(powers[1:rows + 1], previous)
+            previous = result[start + rows - 1]
+        if has_missing:
+            result[np.logical_or.accumulate(missing, axis=0)] = np.nan
+        return result
+
+    @staticmethod
+    def _get_rsi(gain: np.ndarray, loss: np.ndarray) -> np.ndarray:
+        total = gain + loss
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rsi = 100 * (gain / total)
+        # talib outputs zero unless gains and losses add up to positive value, missing included
+        return np.where(total > 0, rsi, 0.0)
+
+
+def _rolling_std_loop(values, window, block, result):
+    rows, columns = values.shape
+    for column in range(columns):
+        anchor = 0.0
+        total = 0.0
+        squares = 0.0
+        missing = 0
+        run = 0
+        for row in range(rows):
+            value = values[row, column]
+            run = run + 1 if row > 0 and value == values[row - 1, column] else 1
+            if row < window - 1:
+                continue
+            if (row - window + 1) % block == 0:
+                # sums restart from deviations of window mean
+                anchor = 0.0
+                count = 0
+                for position in range(row - window + 1, row + 1):
+                    if values[position, column] == values[position, column]:
+                        anchor += values[position, column]
+                        count += 1
+                anchor = anchor / count if count > 0 else 0.0
+                total = 0.0
+                squares = 0.0
+                missing = 0
+                for position in range(row - window + 1, row + 1):
+                    if values[position, column] == values[position, column]:
+                        deviation = values[position, column] - anchor
+                        total += deviation
+                        squares += deviation * deviation
+                    else:
+                        missing += 1
+            else:
+                if value == value:
+                    deviation = value - anchor
+                    total += deviation
+                    squares += deviation * deviation
+                else:
+                    missing += 1
+                removed = values[row - window, column]
+                if removed == removed:
+                    deviation = removed - anchor
+                    total -= deviation
+                    squares -= deviation * deviation
+                else:
+                    missing -= 1
+            if missing > 0:
+                continue
+            if run >= window:
+                result[row, column] = 0.0
+                continue
+            variance = (squares - total * total / window) / (window - 1)
+            result[row, column] = np.sqrt(variance) if variance > 0 else 0.0
+
+
+def _ewm_mean_loop(values, factor, min_periods, result):
+    rows, columns = values.shape
+    for column in range(columns):
+        numerator = 0.0
+        denominator = 0.0
+        observations = 0
+        for row in range(rows):
+            value = values[row, column]
+            numerator *= factor
+            denominator *= factor
+            if value == value:
+                numerator += value
+                denominator += 1.0
+                observations += 1
+            result[row, column] = numerator / denominator if observations >= min_periods else np.nan
+
+
+def _macd_loop(values, fast_period, slow_period, signal_period, macd, signal):
+    rows, columns = values.shape
+    fast_k = 2.0 / (fast_period + 1)
+    slow_k = 2.0 / (slow_period + 1)
+    signal_k = 2.0 / (signal_period + 1)
+    for column in range(columns):
+        first = 0
+        while first < rows and values[first, column] != values[first, column]:
+            first += 1
+        start = first + slow_period - 1
+        output = start + signal_period - 1
+        if output >= rows:
+            continue
+        slow = 0.0
+        for row in range(first, start + 1):
+            slow += values[row, column]
+        slow /= slow_period
+        fast = 0.0
+        for row in range(start - fast_period + 1, start + 1):
+            fast += values[row, column]
+        fast /= fast_period
+        average = fast - slow
+        for row in range(start + 1, rows):
+            value = values[row, column]
+            fast = ((value - fast) * fast_k) + fast
+            slow = ((value - slow) * slow_k) + slow
+            line = fast - slow
+            if row < output:
+                average += line
+                continue
+            if row == output:
+                average += line
+                average /= signal_period
+            else:
+                average = ((line - average) * signal_k) + average
+            macd[row, column] = line
+            signal[row, column] = average
+
+
+def _rsi_loop(values, period, result):
+    rows, columns = values.shape
+    for column in range(columns):
+        first = 0
+        while first < rows and values[first, column] != values[first, column]:
+            first += 1
+        gain = 0.0
+        loss = 0.0
+        for row in range(first + 1, rows):
+            change = values[row, column] - values[row - 1, column]
+            count = row - first
+            if count > period:
+                gain *= period - 1
+                loss *= period - 1
+            if change < 0:
+                loss -= change
+            else:
+                gain += change
+            if count < period:
+                continue
+            gain /= period
+            loss /= period
+            total = gain + loss
+            result[row, column] = 100 * (gain / total) if total > 0 else 0.0
+
+
+class NumbaBackend(NumpyBackend):
+    """NumpyBackend with recursive kernels compiled by numba on first use."""
+    name = 'numba'
+
+    def __init__(self):
+        self._rolling_std_loop = numba.njit(_rolling_std_loop)
+        self._ewm_mean_loop = numba.njit(_ewm_mean_loop)
+        self._macd_loop = numba.njit(_macd_loop)
+        self._rsi_loop = numba.njit(_rsi_loop)
+
+    def rolling_std(self, values: np.ndarray, window: int) -> np.ndarray:
+        result = np.full(values.shape, np.nan, order='F')
+        if window > 1:
+            self._rolling_std_loop(np.asfortranarray(values, dtype=np.float64), window, NumpyBackend.Block, result)
+        return result
+
+    def ewm_mean(self, values: np.ndarray, span: int, min_periods: int) -> np.ndarray:
+        # loops run down columns, column major arrays keep them contiguous
+        result = np.empty(values.shape, order='F')
+        self._ewm_mean_loop(np.asfortranarray(values, dtype=np.float64), 1.0 - 2.0 / (span + 1),
+                            max(min_periods, 1), result)
+        return result
+
+    def rsi(self, values: np.ndarray, period=14) -> np.ndarray:
+        result = np.full(values.shape, np.nan, order='F')
+        self._rsi_loop(np.asfortranarray(values, dtype=np.float64), period, result)
+        return result
+
+    def macd(self, values: np.ndarray, fast_period=12, slow_period=26, signal_period=9):
+        if slow_period < fast_period:
+            fast_period, slow_period = slow_period, fast_period
+        macd = np.full(values.shape, np.nan, order='F')
+        signal = np.full(values.shape, np.nan, order='F')
+        self._macd_loop(np.asfortranarray(values, dtype=np.float64), fast_period, slow_period, signal_period, macd,
+                        signal)
+        return macd, signal, macd - signal
+
+
+class IndicatorBackends(object):
+    """Backend registry, default backend is used by ComputationGraph unless one is given."""
+    default = PandasBackend.name if talib is not None else NumpyBackend.name
+    _backends = {}
+
+    @staticmethod
+    def available() -> list:
+        names = [NumpyBackend.name]
+        if talib is not None:
+            names.insert(0, PandasBackend.name)
+        if numba is not None:
+            names.append(NumbaBackend.name)
+        return names
+
+    @staticmethod
+    def get(name: str = None) -> IndicatorBackend:
+        if isinstance(name, IndicatorBackend):
+            return name
+        name = name or IndicatorBackends.default
+        if name == NumbaBackend.name and numba is None:
+            logger.warning("numba is not installed, using %s backend", NumpyBackend.name)
+            name = NumpyBackend.name
+        if name == PandasBackend.name and talib is None:
+            logger.warning("talib is not installed, using %s backend", NumpyBackend.name)
+            name = NumpyBackend.name
+        backend = IndicatorBackends._backends.get(name)
+        if backend is None:
+            types = {PandasBackend.name: PandasBackend, NumpyBackend.name: NumpyBackend,
+                     NumbaBackend.name: NumbaBackend}
+            if name not in types:
+                raise ValueError("Unknown indicator backend: {}".format(name))
+            backend = types[name]()
+            IndicatorBackends._backends[name] = backend
+        return backend
+
+    @staticmethod
+    def set_default(name: str):
+        IndicatorBackends.get(name)
+        IndicatorBackends.default = name
+
+    @staticmethod
+    def benchmark(values: np.ndarray, high: np.ndarray = None, low: np.ndarray = None, names: list = None,
+                  repeat=3) -> pd.DataFrame:
+        """Best of repeat seconds per kernel and backend with largest absolute difference to pandas backend."""
+        values = np.asarray(values, dtype=np.float64)
+        if high is None or low is None:
+            high, low = values * 1.01, values * 0.99
+        kernels = [('sma', lambda backend: backend.sma(values, 20)),
+                   ('rolling_std', lambda backend: backend.rolling_std(values, 20)),
+                   ('ewm_mean', lambda backend: backend.ewm_mean(values, 26, 25)),
+                   ('rsi', lambda backend: backend.rsi(values)),
+                   ('macd', lambda backend: backend.macd(values)),
+                   ('momentum', lambda backend: backend.momentum(values, 5)),
+                   ('adr', lambda backend: backend.adr(high, low))]
+        reference = IndicatorBackends.get(PandasBackend.name)
+        rows = []
+        for name in names or IndicatorBackends.available():
+            backend = IndicatorBackends.get(name)
+            for kernel, run in kernels:
+                expected = np.asarray(run(reference))
+                # first call compiles jit kernels
+                result = np.asarray(run(backend))
+                seconds = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    run(backend)
+                    seconds.append(time.perf_counter() - started)
+                with np.errstate(invalid='ignore'):
+                    difference = np.nanmax(np.abs(expected - result)) if np.isfinite(expected).any() else 0.0
+                mismatch = bool((np.isnan(expected) != np.isnan(result)).any())
+                rows.append(dict(kernel=kernel, backend=backend.name, seconds=min(seconds), difference=difference,
+                                 missing_mismatch=mismatch))
+        return pd.DataFrame(rows, columns=['kernel', 'backend', 'seconds', 'difference', 'missing_mismatch'])
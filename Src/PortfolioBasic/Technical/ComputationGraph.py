@@ -0,0 +1,72 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Technical.Backends import IndicatorBackend, IndicatorBackends
+
+logger = logging.getLogger(__name__)
+
+
+class ComputationGraph(object):
+    """Intermediate series of one source, each node is computed once and shared between indicators.
+    Nodes are keyed by operation, parameters and input node key, inputs are referenced by key. Kernels run on
+    backend, default IndicatorBackends backend if not specified."""
+    Source = ('source',)
+
+    def __init__(self, data: pd.DataFrame, column=HeaderFactory.Price, backend: IndicatorBackend = None):
+        self.data = data
+        self.column = column
+        self.backend = IndicatorBackends.get(backend)
+        self.nodes = {}
+        self.computed = 0
+        self.reused = 0
+
+    def node(self, key: tuple, compute):
+        """Return node value, computing it on first request"""
+        if key in self.nodes:
+            self.reused += 1
+            return self.nodes[key]
+        value = compute()
+        self.nodes[key] = value
+        self.computed += 1
+        return value
+
+    def source(self):
+        return self.node(ComputationGraph.Source,
+                         lambda: self.data if self.column is None else self.data[self.column])
+
+    def get(self, key: tuple):
+        if key == ComputationGraph.Source:
+            return self.source()
+        return self.nodes[key]
+
+    def rolling_mean(self, window: int, of=Source):
+        return self.apply(('rolling_mean', window, of), of, lambda x: self.backend.sma(x, window))
+
+    def rolling_std(self, window: int, of=Source):
+        return self.apply(('rolling_std', window, of), of, lambda x: self.backend.rolling_std(x, window))
+
+    def ewm_mean(self, span: int, min_periods: int, of=Source):
+        return self.apply(('ewm_mean', span, min_periods, of), of,
+                          lambda x: self.backend.ewm_mean(x, span, min_periods))
+
+    def shift(self, periods: int, of=Source):
+        return self.node(('shift', periods, of), lambda: self.get(of).shift(periods))
+
+    def returns(self, periods: int, of=Source):
+        return self.apply(('returns', periods, of), of, lambda x: self.backend.momentum(x, periods))
+
+    def rsi(self, period: int, of=Source):
+        return self.apply(('rsi', period, of), of, lambda x: self.backend.rsi(x, period))
+
+    def apply(self, key: tuple, of: tuple, kernel):
+        """Node computed by backend kernel on date x column values of input node."""
+        def compute():
+            source = self.get(of)
+            values = np.asarray(source.values, dtype=np.float64)
+            if isinstance(source, pd.Series):
+                return pd.Series(kernel(values[:, None])[:, 0], index=source.index, name=source.name)
+            return pd.DataFrame(kernel(values), index=source.index, columns=source.columns)
+        return self.node(key, compute)
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
+from PortfolioBasic.Technical.Indicators import Indicator
+
+logger = logging.getLogger(__name__)
+
+
+class IndicatorCache(object):
+    """Bounded LRU cache of indicator results keyed by indicator fingerprint and input data hash, optionally
+    persisted as pickles in base_dir."""
+    DataSuffix = ".pkl"
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_entries=None, base_dir: str = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.base_dir = base_dir
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if base_dir is not None and not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+
+    @staticmethod
+    def get_key(indicator: Indicator, data: pd.DataFrame) -> str:
+        """Content hash of data values, index and columns combined with indicator fingerprint."""
+        digest = hashlib.sha1(indicator.fingerprint().encode('utf-8'))
+        digest.update(repr(list(data.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> pd.DataFrame:
+        """Return copy of cached result or None."""
+        result = self.entries.get(key)
+        if result is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return result.copy()
+        file_path = self.key_to_path(key)
+        if file_path is not None and os.path.isfile(file_path):
+            self.disk_hits += 1
+            result = pd.read_pickle(file_path)
+            self._add(key, result)
+            return result.copy()
+        self.misses += 1
+        return None
+
+    def put(self, key: str, result: pd.DataFrame):
+        self._add(key, result.copy())
+        file_path = self.key_to_path(key)
+        if file_path is not None:
+            result.to_pickle(file_path)
+
+    def invalidate(self):
+        """Drop all results held in memory and on disk."""
+        self.entries.clear()
+        self.size = 0
+        if self.base_dir is not None:
+            for file_name in os.listdir(self.base_dir):
+                if file_name.endswith(IndicatorCache.DataSuffix):
+                    os.remove(os.path.join(self.base_dir, file_name))
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, disk_hits=self.disk_hits, misses=self.misses, evictions=self.evictions,
+                    entries=len(self.entries), size=self.size)
+
+    def key_to_path(self, key: str):
+        if self.base_dir is None:
+            return None
+        return os.path.join(self.base_dir, key + IndicatorCache.DataSuffix)
+
+    def _add(self, key: str, result: pd.DataFrame):
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            logger.debug("Indicator result (%d bytes) exceeds cache size, not cached", size)
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= int(previous.memory_usage(index=True, deep=True).sum())
+        self.entries[key] = result
+        self.size += size
+        while self.size > self.max_bytes or (self.max_entries is not None and len(self.entries) > self.max_entries):
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= int(evicted.memory_usage(index=True, deep=True).sum())
+            self.evictions += 1
+
+
+class CachedIndicator(Indicator):
+    """Indicator serving repeated calculate calls on identical data from cache, streaming is delegated."""
+
+    def __init__(self, indicator: Indicator, cache: IndicatorCache = None):
+        self.indicator = indicator
+        self.cache = cache if cache is not None else IndicatorCache()
+
+    def calculate(self, data: pd.DataFrame) -> pd.DataFrame:
+        key = IndicatorCache.get_key(self.indicator, data)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.indicator.calculate(data)
+            self.cache.put(key, result)
+        return result
+
+    def columns(self) -> list:
+        return self.indicator.columns()
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        """Values keyed by graph source (its column name included), missing ones are evaluated on graph so its
+        nodes and backend are shared. Source column result is cached as calculate result, for symbol columns
+        source output columns are (output, symbol) pairs."""
+        source = graph.source()
+        frame = source.to_frame() if isinstance(source, pd.Series) else source
+        key = IndicatorCache.get_key(self.indicator, frame)
+        result = self.cache.get(key)
+        if result is not None:
+            values = result.values
+            if isinstance(source, pd.Series):
+                return [values[:, position] for position in range(values.shape[1])]
+            width = len(source.columns)
+            return [values[:, position:position + width] for position in range(0, values.shape[1], width)]
+
+        values = self.indicator.evaluate(graph)
+        if isinstance(source, pd.Series):
+            columns = self.columns()
+        else:
+            columns = pd.MultiIndex.from_product([self.columns(), source.columns])
+        self.cache.put(key, pd.DataFrame(np.column_stack(values), index=source.index, columns=columns))
+        return values
+
+    def required_days(self) -> int:
+        return self.indicator.required_days()
+
+    def reset(self):
+        self.indicator.reset()
+
+    def update(self, bar) -> dict:
+        return self.indicator.update(bar)
+
+    def fingerprint(self) -> str:
+        return self.indicator.fingerprint()
@@ -1,25 +1,103 @@
 import abc
 import logging
+from collections import deque
 
+import numpy as np
 import pandas as pd
-import talib
 
+from PortfolioBasic.Artifacts import Artifacts
 from PortfolioBasic.Definitions import HeaderFactory
-from PortfolioBasic.Technical.Analysis import TechnicalPerformance
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
 logger = logging.getLogger(__name__)
 
 
 class Indicator(object):
     __metaclass__ = abc.ABCMeta
 
+    def calculate(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Evaluate on computation graph of data, outputs are written into single preallocated frame"""
+        columns = self.columns()
+        duplicated = sorted(set(column for column in columns if columns.count(column) > 1))
+        if len(duplicated) > 0:
+            raise ValueError("Duplicate indicator columns: {}".format(duplicated))
+        return pd.DataFrame(self.calculate_matrix(data), index=data.index, columns=columns, copy=False)
+
+    def calculate_matrix(self, data: pd.DataFrame, dtype=np.float64) -> np.ndarray:
+        """Values of calculate written into one preallocated C-contiguous date x column matrix of dtype"""
+        values = np.empty((len(data), len(self.columns())), dtype=dtype)
+        for position, column_values in enumerate(self.evaluate(ComputationGraph(data))):
+            values[:, position] = column_values
+        return values
+
+    @abc.abstractmethod
+    def columns(self) -> list:
+        """Output column names"""
+        pass
+
     @abc.abstractmethod
-    def calculate(self, data: pd.DataFrame)-> pd.DataFrame:
+    def evaluate(self, graph: ComputationGraph) -> list:
+        """Output values per column, computed from shared graph nodes"""
         pass
 
     @abc.abstractmethod
     def required_days(self) -> int:
         pass
 
+    @abc.abstractmethod
+    def reset(self):
+        """Clear streaming state before first update"""
+        pass
+
+    @abc.abstractmethod
+    def update(self, bar) -> dict:
+        """Add next bar and return latest indicator values by column, same as last row of calculate"""
+        pass
+
+    def calculate_incremental(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Calculate bar by bar through update, matches calculate"""
+        self.reset()
+        rows = [self.update(price) for price in data[HeaderFactory.Price].values]
+        return pd.DataFrame(rows, index=data.index)
+
+    def fingerprint(self) -> str:
+        """Indicator type and public parameters, equal for indicators computing same values"""
+        parameters = ["{}={!r}".format(name, value) for name, value in sorted(vars(self).items())
+                      if not name.startswith('_')]
+        return "{}({})".format(type(self).__name__, ",".join(parameters))
+
+    @staticmethod
+    def get_price(bar) -> float:
+        """Bar is either price or row with Price column"""
+        if np.isscalar(bar):
+            return float(bar)
+        return float(bar[HeaderFactory.Price])
+
+
+class EwmState(object):
+    """Running pandas ewm(adjust=True, ignore_na=False) mean, same recursion as pandas."""
+
+    def __init__(self, span: int, min_periods: int):
+        self.new_weight = 1.0
+        self.old_weight_factor = 1.0 - 2.0 / (span + 1)
+        self.min_periods = max(min_periods, 1)
+        self.average = np.nan
+        self.old_weight = 1.0
+        self.observations = 0
+
+    def update(self, value: float) -> float:
+        is_observation = value == value
+        self.observations += is_observation
+        if self.average == self.average:
+            self.old_weight *= self.old_weight_factor
+            if is_observation:
+                if self.average != value:
+                    self.average = ((self.old_weight * self.average) + (self.new_weight * value)) / \
+                                   (self.old_weight + self.new_weight)
+                self.old_weight += self.new_weight
+        elif is_observation:
+            self.average = value
+        return self.average if self.observations >= self.min_periods else np.nan
+
 
 class CombinedIndicator(Indicator):
 
@@ -29,11 +107,24 @@ class CombinedIndicator(Indicator):
     def __init__(self, indicators: list):
         self.indicators = indicators
 
-    def calculate(self, data: pd.DataFrame) -> pd.DataFrame:
-        result = pd.DataFrame(index=data.index)
+    def columns(self) -> list:
+        return [column for indicator in self.indicators for column in indicator.columns()]
+
+    def fingerprint(self) -> str:
+        return "{}({})".format(type(self).__name__, ",".join(indicator.fingerprint() for indicator in self.indicators))
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        return [values for indicator in self.indicators for values in indicator.evaluate(graph)]
+
+    def reset(self):
+        for indicator in self.indicators:
+            indicator.reset()
+
+    def update(self, bar) -> dict:
+        price = Indicator.get_price(bar)
+        result = {}
         for indicator in self.indicators:
-            indicator_result = indicator.calculate(data)
-            result = result.join(indicator_result)
+            result.update(indicator.update(price))
         return result
 
 
@@ -41,81 +132,190 @@ class MomentumIndicator(Indicator):
 
     def __init__(self, days=5):
         self.days = days
+        self.reset()
 
     def required_days(self) -> int:
         return self.days + 1
 
-    def calculate(self, data: pd.DataFrame) -> pd.DataFrame:
-        data = data[HeaderFactory.Price].copy()
-        previous = data.shift(self.days)
-        data = data / previous - 1
-        result = pd.DataFrame(index=data.index, data=data.values, columns=[HeaderFactory.MOM])
-        return result
+    def reset(self):
+        self._prices = deque(maxlen=self.days + 1)
+
+    def update(self, bar) -> dict:
+        self._prices.append(Indicator.get_price(bar))
+        if len(self._prices) <= self.days:
+            return {HeaderFactory.MOM: np.nan}
+        return {HeaderFactory.MOM: self._prices[-1] / self._prices[0] - 1}
+
+    def columns(self) -> list:
+        return [HeaderFactory.MOM]
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        return [graph.returns(self.days).values]
 
 
 class BollingerIndicator(Indicator):
 
     def __init__(self, windows=20):
         self.windows = windows
+        self.reset()
 
     def required_days(self) -> int:
         return self.windows
 
-    def calculate(self, data: pd.DataFrame) -> pd.DataFrame:
-        data = data[HeaderFactory.Price].copy()
-        rm, rstd = TechnicalPerformance.compute_std(data, self.windows)
-        result = (data - rm) / (2 * rstd)
-        result = pd.DataFrame(index=result.index, data=result.values, columns=[HeaderFactory.Bollinger])
-        return result
+    def reset(self):
+        # window prices with running mean and sum of squared deviations, add/remove as in pandas rolling
+        self._prices = deque()
+        self._missing = 0
+        self._count = 0
+        self._mean = 0.0
+        self._squares = 0.0
+
+    def update(self, bar) -> dict:
+        price = Indicator.get_price(bar)
+        self._prices.append(price)
+        self._add(price)
+        if len(self._prices) > self.windows:
+            self._remove(self._prices.popleft())
+        if len(self._prices) < self.windows or self._missing > 0 or self._count < 2:
+            return {HeaderFactory.Bollinger: np.nan}
+        std = np.sqrt(np.float64(max(self._squares, 0.0) / (self._count - 1)))
+        return {HeaderFactory.Bollinger: (price - self._mean) / (2 * std)}
+
+    def get_mean(self) -> float:
+        """Window mean after last update, NaN until window is full without missing prices"""
+        if len(self._prices) < self.windows or self._missing > 0 or self._count == 0:
+            return np.nan
+        return self._mean
+
+    def _add(self, price: float):
+        if price != price:
+            self._missing += 1
+            return
+        self._count += 1
+        delta = price - self._mean
+        self._mean += delta / self._count
+        self._squares += ((self._count - 1) * delta * delta) / self._count
+
+    def _remove(self, price: float):
+        if price != price:
+            self._missing -= 1
+            return
+        self._count -= 1
+        if self._count == 0:
+            self._mean = 0.0
+            self._squares = 0.0
+            return
+        delta = price - self._mean
+        self._mean -= delta / self._count
+        self._squares -= ((self._count + 1) * delta * delta) / self._count
+
+    def columns(self) -> list:
+        return [HeaderFactory.Bollinger]
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        rm = graph.rolling_mean(self.windows)
+        rstd = graph.rolling_std(self.windows)
+        return [((graph.source() - rm) / (2 * rstd)).values]
 
 
 class RsiIndicator(Indicator):
+    Period = 14
+
+    def __init__(self):
+        self.reset()
 
     def required_days(self) -> int:
         return 15
 
-    def calculate(self, data: pd.DataFrame) -> pd.DataFrame:
-        data = pd.DataFrame(data[HeaderFactory.Price])
-        data.to_csv("data.csv")
-        rsi = data.apply(RsiIndicator._RSI, axis=0)
-        rsi /= 100
-        data = rsi[HeaderFactory.Price]
-        result = pd.DataFrame(index=data.index, data=data.values, columns=[HeaderFactory.RSI])
-        return result
-
-    @staticmethod
-    def _RSI(prices):
-        rsi = talib.RSI(prices.values)
-        return rsi
+    def reset(self):
+        # Wilder smoothing as talib RSI, seeded with simple average of first period changes
+        self._previous = np.nan
+        self._changes = 0
+        self._gain = 0.0
+        self._loss = 0.0
+
+    def update(self, bar) -> dict:
+        price = Indicator.get_price(bar)
+        previous, self._previous = self._previous, price
+        if previous != previous and self._changes == 0:
+            # talib skips leading missing values
+            return {HeaderFactory.RSI: np.nan}
+        change = price - previous
+        period = RsiIndicator.Period
+        self._changes += 1
+        if self._changes <= period:
+            if change < 0:
+                self._loss -= change
+            else:
+                self._gain += change
+            if self._changes < period:
+                return {HeaderFactory.RSI: np.nan}
+            self._gain /= period
+            self._loss /= period
+        else:
+            self._gain *= period - 1
+            self._loss *= period - 1
+            if change < 0:
+                self._loss -= change
+            else:
+                self._gain += change
+            self._gain /= period
+            self._loss /= period
+        total = self._gain + self._loss
+        rsi = 100 * (self._gain / total) if total > 0 else 0.0
+        return {HeaderFactory.RSI: rsi / 100}
+
+    def columns(self) -> list:
+        return [HeaderFactory.RSI]
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        if Artifacts.is_enabled():
+            source = graph.source()
+            source = source.to_frame() if isinstance(source, pd.Series) else source
+            # one artifact per source column (Price or symbol), named by indicator so calls do not overwrite
+            for column in source.columns:
+                Artifacts.write("data_{}_{}".format(self.fingerprint(), column), source[[column]])
+        return [graph.rsi(RsiIndicator.Period).values / 100]
 
 
 class MACDIndicator(Indicator):
 
-    def __init__(self):
+    def __init__(self, normalized=False):
         self.n_fast = 12
         self.n_slow = 26
         self.signal_period = 9
+        self.normalized = normalized
+        self.reset()
 
     def required_days(self) -> int:
         return 26
 
-    def calculate(self, data: pd.DataFrame, normalized=False) -> pd.DataFrame:
-        fast = data[HeaderFactory.Price].ewm(adjust=True, min_periods=self.n_slow - 1, span=self.n_fast,
-                                             ignore_na=False).mean()
-        EMAfast = pd.Series(fast)
-
-        slow = data[HeaderFactory.Price].ewm(adjust=True, min_periods=self.n_slow - 1, span=self.n_slow,
-                                             ignore_na=False).mean()
-        EMAslow = pd.Series(slow)
-        result = EMAfast - EMAslow
-        if normalized:
-            result = result / EMAslow
-        MACD = pd.Series(result, name=HeaderFactory.MACD)
-        signal = MACD.ewm(adjust=True, min_periods=self.signal_period - 1, span=self.signal_period,
-                          ignore_na=False).mean()
-        MACDsign = pd.Series(signal, name=HeaderFactory.MACD_SIGNAL)
-        MACDdiff = pd.Series(MACD - MACDsign, name=HeaderFactory.MACD_DIFF)
-        data = pd.DataFrame(MACD).join(MACDsign)
-        data = data.join(MACDdiff)
-        return data
-
+    def reset(self):
+        self._fast = EwmState(self.n_fast, self.n_slow - 1)
+        self._slow = EwmState(self.n_slow, self.n_slow - 1)
+        self._signal = EwmState(self.signal_period, self.signal_period - 1)
+
+    def update(self, bar) -> dict:
+        price = Indicator.get_price(bar)
+        slow = self._slow.update(price)
+        macd = self._fast.update(price) - slow
+        if self.normalized:
+            macd = macd / slow
+        signal = self._signal.update(macd)
+        return {HeaderFactory.MACD: macd, HeaderFactory.MACD_SIGNAL: signal, HeaderFactory.MACD_DIFF: macd - signal}
+
+    def calculate(self, data: pd.DataFrame, normalized=None) -> pd.DataFrame:
+        if normalized is not None and normalized != self.normalized:
+            return MACDIndicator(normalized).calculate(data)
+        return super(MACDIndicator, self).calculate(data)
+
+    def columns(self) -> list:
+        return [HeaderFactory.MACD, HeaderFactory.MACD_SIGNAL, HeaderFactory.MACD_DIFF]
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        fast = graph.ewm_mean(self.n_fast, self.n_slow - 1)
+        slow = graph.ewm_mean(self.n_slow, self.n_slow - 1)
+        key = ('macd', self.n_fast, self.n_slow, self.normalized)
+        macd = graph.node(key, lambda: (fast - slow) / slow if self.normalized else fast - slow)
+        signal = graph.ewm_mean(self.signal_period, self.signal_period - 1, of=key)
+        return [macd.values, signal.values, (macd - signal).values]
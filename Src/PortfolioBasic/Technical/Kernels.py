@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class Kernels(object):
+    """Column wise indicator kernels on date x symbol float arrays, following talib conventions."""
+
+    @staticmethod
+    def get_first_valid(values: np.ndarray) -> np.ndarray:
+        """Row of first non missing value per column, number of rows for empty columns."""
+        valid = ~np.isnan(values)
+        return np.where(valid.any(axis=0), valid.argmax(axis=0), len(values))
+
+    @staticmethod
+    def ema(values: np.ndarray, period: int, first: int) -> np.ndarray:
+        """talib EMA starting at row first, seeded with simple average of period rows ending there."""
+        result = np.full(values.shape, np.nan)
+        if first >= len(values):
+            return result
+        k = 2.0 / (period + 1)
+        # sequential sum as talib, keeps results identical
+        previous = values[first - period + 1].copy()
+        for row in range(first - period + 2, first + 1):
+            previous += values[row]
+        previous /= period
+        result[first] = previous
+        for row in range(first + 1, len(values)):
+            previous = ((values[row] - previous) * k) + previous
+            result[row] = previous
+        return result
+
+    @staticmethod
+    def align(values: np.ndarray, first_valid: np.ndarray) -> np.ndarray:
+        """Shift every column up so its first valid value is on row 0, padding end with missing values."""
+        if not first_valid.any():
+            return values.copy()
+        aligned = np.full(values.shape, np.nan)
+        for offset in np.unique(first_valid):
+            columns = np.flatnonzero(first_valid == offset)
+            aligned[:len(values) - offset, columns] = values[offset:, columns]
+        return aligned
+
+    @staticmethod
+    def restore(aligned: np.ndarray, first_valid: np.ndarray) -> np.ndarray:
+        """Inverse of align, rows before first valid value are missing."""
+        if not first_valid.any():
+            return aligned
+        values = np.full(aligned.shape, np.nan)
+        for offset in np.unique(first_valid):
+            columns = np.flatnonzero(first_valid == offset)
+            values[offset:, columns] = aligned[:len(aligned) - offset, columns]
+        return values
+
+    @staticmethod
+    def macd(values: np.ndarray, fast_period=12, slow_period=26, signal_period=9):
+        """talib MACD of every column, returns macd, signal and histogram arrays. Leading missing values are skipped
+        per column as talib does by aligning columns on their first valid row."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.size == 0:
+            return values.copy(), values.copy(), values.copy()
+        if slow_period < fast_period:
+            fast_period, slow_period = slow_period, fast_period
+        first_valid = Kernels.get_first_valid(values)
+        aligned = Kernels.align(values, first_valid)
+        slow_first = slow_period - 1
+        macd = Kernels.ema(aligned, fast_period, slow_first) - Kernels.ema(aligned, slow_period, slow_first)
+        signal_first = slow_first + signal_period - 1
+        signal = Kernels.ema(macd, signal_period, signal_first)
+        macd[:signal_first] = np.nan
+        macd = Kernels.restore(macd, first_valid)
+        signal = Kernels.restore(signal, first_valid)
+        return macd, signal, macd - signal
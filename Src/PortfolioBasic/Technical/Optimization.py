@@ -0,0 +1,180 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.optimize as spo
+
+logger = logging.getLogger(__name__)
+
+
+class SharpeObjective(object):
+    """Negative Sharpe ratio of allocations and its analytic gradient, on prices normalized once."""
+
+    def __init__(self, normalized: np.ndarray, interest_rate=0.01):
+        self.normalized = np.ascontiguousarray(normalized, dtype=np.float64)
+        self.daily_risk_free = ((1.0 + interest_rate) ** (1. / 252.)) - 1
+
+    @staticmethod
+    def from_prices(prices: pd.DataFrame, interest_rate=0.01) -> 'SharpeObjective':
+        values = prices.values.astype(np.float64)
+        return SharpeObjective(values / values[0], interest_rate)
+
+    @staticmethod
+    def from_portfolio(portfolio, interest_rate=0.01) -> 'SharpeObjective':
+        """Objective of PortfolioAllocations, same daily values as PortfolioPerformance up to scale."""
+        return SharpeObjective.from_prices(portfolio.df_data[portfolio.symbols], interest_rate)
+
+    def sharpe_ratio(self, allocations: np.ndarray) -> float:
+        return -self.evaluate(allocations)[0]
+
+    def evaluate(self, allocations: np.ndarray):
+        """Return negative Sharpe ratio and its gradient."""
+        values = self.normalized.dot(allocations)
+        previous, current = values[:-1], values[1:]
+        returns = current / previous - 1
+        count = len(returns)
+        mean = returns.mean()
+        deviation = returns - mean
+        volatility = np.sqrt(deviation.dot(deviation) / (count - 1))
+        excess = mean - self.daily_risk_free
+        sharpe = np.sqrt(252) * excess / volatility
+
+        # d return_t / d w = N_t / v_{t-1} - N_{t-1} v_t / v_{t-1}^2, contracted without days x symbols temporary
+        inverse = 1 / previous
+        scaled = current * inverse * inverse
+        d_mean = (inverse.dot(self.normalized[1:]) - scaled.dot(self.normalized[:-1])) / count
+        d_volatility = ((deviation * inverse).dot(self.normalized[1:]) -
+                        (deviation * scaled).dot(self.normalized[:-1])) / ((count - 1) * volatility)
+        d_sharpe = np.sqrt(252) * (d_mean * volatility - excess * d_volatility) / volatility ** 2
+        return -sharpe, -d_sharpe
+
+
+class SharpeOptimizer(object):
+
+    @staticmethod
+    def optimize(objective: SharpeObjective, allocations: np.ndarray = None, disp=False) -> np.ndarray:
+        """Long only, fully invested allocations maximizing Sharpe ratio."""
+        symbols = objective.normalized.shape[1]
+        if allocations is None:
+            allocations = np.full(symbols, 1.0 / symbols)
+        constrain = ({'type': 'eq', 'fun': lambda x: 1 - np.sum(x), 'jac': lambda x: -np.ones_like(x)})
+        result = spo.minimize(objective.evaluate, np.asarray(allocations, dtype=np.float64), jac=True,
+                              method='SLSQP', bounds=[(0, 1)] * symbols, constraints=constrain,
+                              options={'disp': disp})
+        logger.debug("Calculated allocations %s", result)
+        return result.x
+
+    @staticmethod
+    def optimize_many(objectives: list, allocations: list = None, workers=1) -> list:
+        """Optimize portfolios with different symbol sets or windows in one call, spread over processes."""
+        if allocations is None:
+            allocations = [None] * len(objectives)
+        if workers <= 1 or len(objectives) <= 1:
+            return [SharpeOptimizer.optimize(objective, initial) for objective, initial in zip(objectives,
+                                                                                               allocations)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(SharpeOptimizer.optimize, objectives, allocations))
+
+
+class FrontierResult(object):
+    """Sweep points: parameter (target return or risk aversion), weights, daily mean return and volatility."""
+
+    def __init__(self, parameters: np.ndarray, weights: np.ndarray, returns: np.ndarray, risks: np.ndarray):
+        self.parameters = parameters
+        self.weights = weights
+        self.returns = returns
+        self.risks = risks
+
+    def get_sharpe_ratios(self, interest_rate=0.0) -> np.ndarray:
+        daily_risk_free = ((1.0 + interest_rate) ** (1. / 252.)) - 1
+        return np.sqrt(252) * (self.returns - daily_risk_free) / self.risks
+
+
+class EfficientFrontier(object):
+    """Long only, fully invested mean-variance allocations from one mean and covariance estimate of daily returns
+    (rebalanced daily)."""
+    TARGET = 'target'
+    RISK_AVERSION = 'risk_aversion'
+
+    def __init__(self, returns: np.ndarray):
+        returns = np.asarray(returns, dtype=np.float64)
+        self.mean = returns.mean(axis=0)
+        self.covariance = np.cov(returns, rowvar=False, ddof=1)
+        # daily variances are ~1e-4, below SLSQP tolerance, objectives are scaled by average variance
+        self.scale = 1 / np.mean(np.diag(self.covariance))
+
+    @staticmethod
+    def from_prices(prices: pd.DataFrame) -> 'EfficientFrontier':
+        values = prices.values.astype(np.float64)
+        return EfficientFrontier(values[1:] / values[:-1] - 1)
+
+    @staticmethod
+    def from_portfolio(portfolio) -> 'EfficientFrontier':
+        return EfficientFrontier.from_prices(portfolio.df_data[portfolio.symbols])
+
+    def get_targets(self, points: int) -> np.ndarray:
+        """Target returns from minimum variance portfolio up to best single symbol."""
+        lowest = self.mean.dot(self.solve(EfficientFrontier.RISK_AVERSION, np.inf))
+        return np.linspace(lowest, self.mean.max(), points)
+
+    def solve(self, kind: str, parameter: float, allocations: np.ndarray = None) -> np.ndarray:
+        symbols = len(self.mean)
+        if allocations is None:
+            allocations = np.full(symbols, 1.0 / symbols)
+        constraints = [{'type': 'eq', 'fun': lambda x: 1 - np.sum(x), 'jac': lambda x: -np.ones_like(x)}]
+        if kind == EfficientFrontier.TARGET:
+            mean = self.mean / np.abs(self.mean).max()
+            target = parameter / np.abs(self.mean).max()
+            constraints.append({'type': 'eq', 'fun': lambda x: mean.dot(x) - target, 'jac': lambda x: mean})
+            objective = self._variance
+        elif np.isinf(parameter):
+            objective = self._variance
+        else:
+            objective = lambda x: self._utility(x, parameter)
+        result = spo.minimize(objective, allocations, jac=True, method='SLSQP', bounds=[(0, 1)] * symbols,
+                              constraints=constraints, options={'ftol': 1e-10})
+        if not result.success:
+            logger.warning("Frontier point %s=%f: %s", kind, parameter, result.message)
+        return result.x
+
+    def solve_chain(self, kind: str, parameters: np.ndarray, allocations: np.ndarray = None) -> np.ndarray:
+        """Solve parameters in order, each warm started from previous solution."""
+        weights = np.empty((len(parameters), len(self.mean)))
+        for position, parameter in enumerate(parameters):
+            allocations = self.solve(kind, parameter, allocations)
+            weights[position] = allocations
+        return weights
+
+    def sweep(self, kind: str, parameters: np.ndarray, workers=1) -> FrontierResult:
+        """Solve grid split in contiguous chunks, warm started within chunk, chunks spread over processes."""
+        parameters = np.asarray(parameters, dtype=np.float64)
+        if workers <= 1 or len(parameters) <= 1:
+            weights = self.solve_chain(kind, parameters)
+        else:
+            chunks = np.array_split(parameters, min(workers, len(parameters)))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                weights = np.concatenate(list(executor.map(self.solve_chain, [kind] * len(chunks), chunks)))
+        returns = weights.dot(self.mean)
+        risks = np.sqrt(np.einsum('ij,jk,ik->i', weights, self.covariance, weights))
+        return FrontierResult(parameters, weights, returns, risks)
+
+    def sweep_targets(self, targets, workers=1) -> FrontierResult:
+        """Minimum variance allocations per target daily return, number of points or list of targets."""
+        if np.isscalar(targets):
+            targets = self.get_targets(targets)
+        return self.sweep(EfficientFrontier.TARGET, targets, workers)
+
+    def sweep_risk_aversion(self, aversions, workers=1) -> FrontierResult:
+        """Allocations maximizing mean - aversion / 2 * variance per risk aversion level."""
+        return self.sweep(EfficientFrontier.RISK_AVERSION, aversions, workers)
+
+    def _variance(self, allocations: np.ndarray):
+        product = self.scale * self.covariance.dot(allocations)
+        return allocations.dot(product), 2 * product
+
+    def _utility(self, allocations: np.ndarray, aversion: float):
+        # both terms scaled alike, minimum is same as of unscaled aversion / 2 * variance - mean
+        product = self.covariance.dot(allocations)
+        return self.scale * (aversion / 2 * allocations.dot(product) - self.mean.dot(allocations)), \
+            self.scale * (aversion * product - self.mean)
@@ -7,6 +7,7 @@ import numpy as np
 import pandas as pd
 from sklearn.preprocessing import scale
 from sklearn.preprocessing import StandardScaler
+from PortfolioBasic.Artifacts import Artifacts, CsvArtifactSink
 from PortfolioBasic.Definitions import HeaderFactory
 from PortfolioBasic.MachineLearning.SimpleAlgoTrader import LinearAlgoTrader
 from PortfolioBasic.Market.Interactive import IBDataCollector
@@ -106,6 +107,7 @@ def test_real_machine():
     symbol_list = ['RY', 'AZNCF', 'GSK', 'GLD']
     symbol_list = ['EZJ.L']
     symbol_list = ['CS']
+    Artifacts.enable(CsvArtifactSink("dump"))
 
     for symbol in symbol_list:
         algo = LinearAlgoTrader(indicators, dump=True)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Artifacts import Artifacts, MemoryArtifactSink, DiskArtifactSink, CsvArtifactSink
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
+from PortfolioBasic.Technical.Indicators import RsiIndicator
+
+
+class ArtifactsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.current = os.getcwd()
+        os.chdir(self.directory)
+        self.prices = pd.DataFrame({HeaderFactory.Price: np.linspace(10, 20, 50)},
+                                   index=pd.bdate_range('2010-01-01', periods=50))
+
+    def tearDown(self):
+        Artifacts.disable()
+        os.chdir(self.current)
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        RsiIndicator().calculate(self.prices)
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_memory(self):
+        sink = Artifacts.enable()
+        RsiIndicator().calculate(self.prices)
+        self.assertEqual(['data_RsiIndicator()_Price'], sink.names())
+        self.assertTrue(sink.get('data_RsiIndicator()_Price').equals(self.prices))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_memory_symbols(self):
+        sink = Artifacts.enable()
+        symbols = pd.DataFrame({'IBM': self.prices[HeaderFactory.Price], 'MSFT': self.prices[HeaderFactory.Price] * 2})
+        RsiIndicator().evaluate(ComputationGraph(symbols, None))
+        RsiIndicator().calculate(self.prices)
+        self.assertEqual(['data_RsiIndicator()_IBM', 'data_RsiIndicator()_MSFT', 'data_RsiIndicator()_Price'],
+                         sink.names())
+        self.assertTrue(sink.get('data_RsiIndicator()_MSFT').equals(symbols[['MSFT']]))
+
+    def test_memory_limit(self):
+        sink = MemoryArtifactSink(max_items=2)
+        for name in ('a', 'b', 'c'):
+            sink.write(name, self.prices)
+        self.assertEqual(['b', 'c'], sink.names())
+
+    def test_disk(self):
+        first = Artifacts.enable(DiskArtifactSink(self.directory, run='first'))
+        Artifacts.write('prices', self.prices)
+        second = Artifacts.enable(CsvArtifactSink(self.directory, run='second'))
+        Artifacts.write('prices', self.prices)
+        self.assertEqual(['first', 'second'], sorted(os.listdir(self.directory)))
+        self.assertTrue(first.read('prices').equals(self.prices))
+        np.testing.assert_array_almost_equal(self.prices.values, second.read('prices').values)
+
+
+if __name__ == '__main__':
+    unittest.main()
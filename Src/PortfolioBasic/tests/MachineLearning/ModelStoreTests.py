@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.MachineLearning.ModelStore import ModelStore
+from PortfolioBasic.MachineLearning.SimpleAlgoTrader import LinearAlgoTrader, OnlineLinearAlgoTrader
+from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource
+from PortfolioBasic.Portfolio import Portfolio
+from PortfolioBasic.Strategy.MachineStrategy import MachineStrategyManager
+from PortfolioBasic.Technical.Indicators import MomentumIndicator, BollingerIndicator, RsiIndicator, CombinedIndicator
+from PortfolioBasic.tests.Market.MarketDataServiceTests import write_csv_directory
+
+
+def create_algo(days=5) -> LinearAlgoTrader:
+    return LinearAlgoTrader(CombinedIndicator((MomentumIndicator(days), BollingerIndicator(), RsiIndicator())))
+
+
+class ModelStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.store = ModelStore(os.path.join(self.base_dir, "models"))
+        rng = np.random.RandomState(0)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 300)))
+        self.prices = pd.DataFrame({HeaderFactory.Price: prices}, index=pd.bdate_range('2010-01-01', periods=300))
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_fingerprint(self):
+        self.assertEqual(create_algo().fingerprint(), create_algo().fingerprint())
+        self.assertNotEqual(create_algo().fingerprint(), create_algo(10).fingerprint())
+        self.assertNotEqual(create_algo().fingerprint(),
+                            LinearAlgoTrader(create_algo().indicators, dtype=np.float32).fingerprint())
+        self.assertNotEqual(OnlineLinearAlgoTrader(create_algo().indicators).fingerprint(),
+                            OnlineLinearAlgoTrader(create_algo().indicators, window=100).fingerprint())
+
+    def test_reuse(self):
+        trained = self.store.train("IBM", create_algo(), self.prices)
+        loaded = ModelStore(self.store.base_dir).train("IBM", create_algo(), self.prices.copy())
+        self.assertIsNot(trained, loaded)
+        np.testing.assert_array_equal(trained.regression.coef_, loaded.regression.coef_)
+        self.assertEqual(trained.predict(self.prices)[1], loaded.predict(self.prices)[1])
+        record = self.store.get_record("IBM")
+        self.assertEqual(self.prices.index[0], record['start'])
+        self.assertEqual(self.prices.index[-1], record['end'])
+
+    def test_retrain(self):
+        self.store.train("IBM", create_algo(), self.prices)
+        self.store.train("IBM", create_algo(10), self.prices)
+        changed = self.prices.copy()
+        changed.iloc[-1] += 1
+        self.store.train("IBM", create_algo(10), changed)
+        self.store.train("IBM", create_algo(10), changed)
+        self.assertEqual(3, self.store.trains)
+        self.assertEqual(1, self.store.loads)
+
+    def test_corrupted(self):
+        with open(self.store.name_to_path("IBM"), 'wb') as file:
+            file.write(b"partial")
+        self.store.train("IBM", create_algo(), self.prices)
+        self.assertEqual(1, self.store.trains)
+        self.assertIsNotNone(self.store.get_record("IBM"))
+        self.assertEqual(["IBM" + ModelStore.DataSuffix], os.listdir(self.store.base_dir))
+
+    def test_train_strategy(self):
+        resources = Portfolio.resources
+        Portfolio.resources = LocalMarketDataSource(write_csv_directory(self.base_dir, ["SPY", "IBM"]))
+        try:
+            first = MachineStrategyManager("IBM", create_algo())
+            first.train_strategy(datetime(2005, 1, 1), datetime(2005, 12, 31), self.store)
+            second = MachineStrategyManager("IBM", create_algo())
+            second.train_strategy(datetime(2005, 1, 1), datetime(2005, 12, 31), self.store)
+        finally:
+            Portfolio.resources = resources
+        self.assertEqual(1, self.store.trains)
+        self.assertEqual(1, self.store.loads)
+        np.testing.assert_array_equal(first.algo.regression.coef_, second.algo.regression.coef_)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,16 @@
 import unittest
 from datetime import datetime
 
-from PortfolioBasic.MachineLearning.SimpleAlgoTrader import LinearAlgoTrader
+import numpy as np
+import pandas as pd
+from sklearn import linear_model
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.MachineLearning.SimpleAlgoTrader import LinearAlgoTrader, OnlineLinearAlgoTrader, \
+    BatchLinearAlgoTrader
 from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource
-from PortfolioBasic.Technical.Indicators import MomentumIndicator, BollingerIndicator, RsiIndicator, CombinedIndicator
+from PortfolioBasic.Technical.Indicators import MomentumIndicator, BollingerIndicator, RsiIndicator, \
+    CombinedIndicator, MACDIndicator
 
 
 class SimpleAlgoTraderTests(unittest.TestCase):
@@ -21,3 +28,118 @@ class SimpleAlgoTraderTests(unittest.TestCase):
         data, rmse, c = algo.predict(self.test_prices)
         self.assertEquals(0.027115168423577626, rmse)
         self.assertEquals(0.25628745701762157, c)
+
+
+class LinearAlgoTraderTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (400, 2)), axis=0))
+        prices[300, 1] = np.nan
+        self.prices = pd.DataFrame(prices, index=pd.bdate_range('2010-01-01', periods=400),
+                                   columns=[HeaderFactory.Price, HeaderFactory.Index])
+        self.indicators = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator()))
+
+    def test_get_data(self):
+        x_data, y_data = LinearAlgoTrader(self.indicators).get_data(self.prices)
+        expected = self.indicators.calculate(self.prices).dropna()
+        pd.testing.assert_frame_equal(expected, x_data)
+        expected = (self.prices.shift(-5) / self.prices - 1.0).loc[expected.index, HeaderFactory.Price]
+        pd.testing.assert_series_equal(expected, y_data)
+        # training rows are passed to regression without copy
+        self.assertTrue(x_data.values.flags['C_CONTIGUOUS'])
+        self.assertTrue(np.shares_memory(x_data.values, x_data.iloc[:-5].values))
+
+    def test_float32(self):
+        algo = LinearAlgoTrader(self.indicators, dtype=np.float32)
+        x_data, y_data = algo.get_data(self.prices)
+        self.assertEqual(np.float32, x_data.values.dtype)
+        self.assertEqual(np.float32, y_data.values.dtype)
+        expected = LinearAlgoTrader(self.indicators)
+        expected.train(self.prices)
+        algo.train(self.prices)
+        np.testing.assert_allclose(expected.regression.coef_, algo.regression.coef_, rtol=1e-3, atol=1e-4)
+
+
+class OnlineLinearAlgoTraderTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 400)))
+        self.prices = pd.DataFrame({HeaderFactory.Price: prices}, index=pd.bdate_range('2010-01-01', periods=400))
+        self.indicators = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator()))
+        self.x_data, self.y_data = LinearAlgoTrader(self.indicators).get_data(self.prices)
+
+    def assert_regression(self, expected: linear_model.LinearRegression, algo: OnlineLinearAlgoTrader):
+        np.testing.assert_allclose(expected.coef_, algo.regression.coef_, rtol=1e-7, atol=1e-9)
+        self.assertAlmostEqual(expected.intercept_, algo.regression.intercept_, 9)
+
+    def test_full_refit(self):
+        expected = LinearAlgoTrader(self.indicators)
+        expected.train(self.prices)
+        algo = OnlineLinearAlgoTrader(self.indicators)
+        algo.train(self.prices)
+        self.assert_regression(expected.regression, algo)
+        np.testing.assert_allclose(expected.predict(self.prices)[0].values, algo.predict(self.prices)[0].values,
+                                   rtol=1e-7, atol=1e-9)
+
+    def test_window_updates(self):
+        algo = OnlineLinearAlgoTrader(self.indicators, window=150)
+        algo.train_features(self.x_data.iloc[:200], self.y_data.iloc[:200])
+        # rows 195 - 299 get their targets one by one
+        algo.update_features(self.x_data.iloc[195:300], self.y_data.iloc[195:300])
+        expected = linear_model.LinearRegression().fit(self.x_data.values[150:300], self.y_data.values[150:300])
+        self.assert_regression(expected, algo)
+
+    def test_forgetting(self):
+        algo = OnlineLinearAlgoTrader(self.indicators, forgetting=0.99)
+        algo.train_features(self.x_data.iloc[:100], self.y_data.iloc[:100])
+        algo.update_features(self.x_data.iloc[95:250], self.y_data.iloc[95:250])
+        weights = 0.99 ** np.arange(249, -1, -1)
+        expected = linear_model.LinearRegression().fit(self.x_data.values[:250], self.y_data.values[:250],
+                                                       sample_weight=weights)
+        self.assert_regression(expected, algo)
+
+
+class BatchLinearAlgoTraderTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.symbols = ["A", "B", "C"]
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (400, 3)), axis=0))
+        prices[:30, 1] = np.nan
+        self.prices = pd.DataFrame(prices, index=pd.bdate_range('2010-01-01', periods=400), columns=self.symbols)
+        # MACD diff is collinear with MACD and signal
+        self.indicators = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator(),
+                                             MACDIndicator()))
+
+    def get_symbol(self, data: pd.DataFrame, symbol: str) -> pd.DataFrame:
+        return data[[symbol]].rename(columns={symbol: HeaderFactory.Price})
+
+    def test_per_symbol(self):
+        train, test = self.prices.iloc[:300], self.prices.iloc[200:]
+        algo = BatchLinearAlgoTrader(self.indicators, self.symbols)
+        algo.train(train)
+        result, rmse, c = algo.predict(test)
+        for position, symbol in enumerate(self.symbols):
+            expected = LinearAlgoTrader(self.indicators)
+            expected.train(self.get_symbol(train, symbol))
+            expected_result, expected_rmse, expected_c = expected.predict(self.get_symbol(test, symbol))
+            np.testing.assert_allclose(expected.regression.coef_, algo.coefficients[position, 1:],
+                                       rtol=1e-6, atol=1e-9)
+            np.testing.assert_allclose(expected_result[HeaderFactory.MACHINE].values,
+                                       result[HeaderFactory.get_name(symbol, HeaderFactory.MACHINE)].dropna().values,
+                                       rtol=1e-6, atol=1e-9)
+            self.assertAlmostEqual(expected_rmse, rmse[symbol], 9)
+            self.assertAlmostEqual(expected_c, c[symbol], 6)
+            self.assertAlmostEqual(expected_rmse, algo.get_trader(symbol).predict(self.get_symbol(test, symbol))[1], 9)
+
+    def test_pooled(self):
+        algo = BatchLinearAlgoTrader(self.indicators, self.symbols, pooled=True)
+        algo.train(self.prices)
+        x_data, y_data, valid = algo.get_tensor(self.prices)
+        known = algo.get_known(y_data, valid)
+        expected = linear_model.LinearRegression().fit(x_data[known][:, 1:], y_data[known])
+        for coefficients in algo.coefficients:
+            np.testing.assert_allclose(expected.coef_, coefficients[1:], rtol=1e-6, atol=1e-9)
+            self.assertAlmostEqual(expected.intercept_, coefficients[0], 9)
@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Market.AsyncMarketDataService import AsyncMarketDataSource, SyncMarketDataSource, \
+    ExecutorAsyncMarketDataSource
+from PortfolioBasic.Market.MarketDataService import MarketDataSource
+
+
+class FakeAsyncMarketDataSource(AsyncMarketDataSource):
+
+    def __init__(self, max_concurrency=8, failures=0, delay=0.05):
+        super(FakeAsyncMarketDataSource, self).__init__(max_concurrency, retries=2, backoff=0.01)
+        self.failures = failures
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.max_running = 0
+
+    async def fetch_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        self.requests.append((symbol, from_date, to_date))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures > 0:
+                self.failures -= 1
+                raise IOError("Connection reset")
+        finally:
+            self.running -= 1
+        dates = pd.bdate_range(from_date or datetime(2004, 1, 1), to_date or datetime(2005, 12, 31))
+        return pd.DataFrame(index=dates, data={symbol: np.arange(len(dates), dtype=np.float64)})
+
+
+class BlockingMarketDataSource(MarketDataSource):
+
+    def can_use(self, symbol):
+        return symbol != 'Test'
+
+    def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        dates = pd.bdate_range(from_date, to_date)
+        return pd.DataFrame(index=dates, data={symbol: 1.0})
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncMarketDataSourceTests(unittest.TestCase):
+
+    def test_bounded_concurrency(self):
+        source = FakeAsyncMarketDataSource(max_concurrency=2)
+        requests = [(symbol, datetime(2005, 1, 1), datetime(2005, 1, 31)) for symbol in ['A', 'B', 'C', 'D', 'E']]
+        result = run(source.get_many(requests))
+        self.assertEqual(2, source.max_running)
+        self.assertEqual(['A', 'B', 'C', 'D', 'E'], [data.columns[0] for data, _ in result])
+
+    def test_coalescing(self):
+        source = FakeAsyncMarketDataSource()
+
+        async def request():
+            return await asyncio.gather(source.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31)),
+                                        source.get_stock_data('IBM', datetime(2005, 1, 10), datetime(2005, 1, 14)),
+                                        source.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 2, 28)))
+
+        first, second, third = run(request())
+        self.assertEqual([('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31)),
+                          ('IBM', datetime(2005, 1, 1), datetime(2005, 2, 28))], source.requests)
+        self.assertEqual(21, len(first))
+        self.assertEqual(5, len(second))
+        self.assertEqual(41, len(third))
+        np.testing.assert_array_equal(first.loc[second.index].values, second.values)
+
+    def test_coalescing_unbounded(self):
+        source = FakeAsyncMarketDataSource()
+
+        async def request():
+            return await asyncio.gather(source.get_stock_data('IBM', None, datetime(2005, 1, 31)),
+                                        source.get_stock_data('IBM', datetime(2005, 1, 10), datetime(2005, 1, 14)),
+                                        source.get_stock_data('IBM', datetime(2005, 1, 1), None),
+                                        source.get_stock_data('IBM', None, datetime(2005, 1, 14)))
+
+        first, second, third, fourth = run(request())
+        self.assertEqual([('IBM', None, datetime(2005, 1, 31)),
+                          ('IBM', datetime(2005, 1, 1), None)], source.requests)
+        self.assertEqual(5, len(second))
+        self.assertEqual(datetime(2005, 12, 30), third.index[-1])
+        self.assertTrue(first.loc[:datetime(2005, 1, 14)].equals(fourth))
+
+    def test_retry(self):
+        source = FakeAsyncMarketDataSource(failures=2)
+        result = run(source.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31)))
+        self.assertEqual(3, len(source.requests))
+        self.assertEqual(21, len(result))
+
+        source = FakeAsyncMarketDataSource(failures=3)
+        with self.assertRaises(IOError):
+            run(source.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31)))
+
+    def test_executor(self):
+        source = ExecutorAsyncMarketDataSource(BlockingMarketDataSource())
+        self.assertFalse(source.can_use('Test'))
+        result = run(source.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31)))
+        self.assertEqual(21, len(result))
+
+
+class SyncMarketDataSourceTests(unittest.TestCase):
+
+    def test_get_data(self):
+        source = FakeAsyncMarketDataSource(delay=0.2)
+        resources = SyncMarketDataSource(source)
+        result = resources.get_data(['IBM', 'MSFT'], datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self.assertEqual([HeaderFactory.Index, 'IBM', 'MSFT'], list(result.columns))
+        self.assertEqual(21, len(result))
+        self.assertEqual(3, source.max_running)
+        self.assertEqual(['SPY', 'IBM', 'MSFT'], list(resources.load_latency.keys()))
+
+        result = resources.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self.assertEqual(21, len(result))
+
+
+if __name__ == '__main__':
+    unittest.main()
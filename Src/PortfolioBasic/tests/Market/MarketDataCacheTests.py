@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Market.MarketDataCache import MarketDataCache
+from PortfolioBasic.Market.MarketDataService import MarketDataSource
+
+
+class CountingMarketDataSource(MarketDataSource):
+
+    def __init__(self, full_history=False):
+        self.full_history = full_history
+        self.requests = []
+        self.dates = pd.bdate_range(datetime(2005, 1, 1), datetime(2006, 12, 31))
+
+    def can_use(self, symbol):
+        return True
+
+    def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        self.requests.append((symbol, from_date, to_date))
+        dates = self.dates[(self.dates >= (from_date or self.dates[0])) & (self.dates <= (to_date or self.dates[-1]))]
+        prices = np.arange(len(dates), dtype=np.float64) + 10
+        return pd.DataFrame(index=dates, data={"Close": prices, symbol: prices})
+
+
+class MarketDataCacheTests(unittest.TestCase):
+
+    def test_sub_range_served_from_cache(self):
+        resources = CountingMarketDataSource()
+        cache = resources.enable_cache()
+        first = resources.get_data(['IBM'], datetime(2005, 1, 1), datetime(2005, 6, 30))
+        second = resources.get_data(['IBM'], datetime(2005, 2, 1), datetime(2005, 3, 31))
+        self.assertEqual(2, len(resources.requests))
+        self.assertEqual(dict(hits=2, misses=2, evictions=0, symbols=2, size=cache.size), cache.stats())
+        np.testing.assert_array_equal(first.loc[second.index, 'IBM'].values, second['IBM'].values)
+
+    def test_miss_extends_range(self):
+        resources = CountingMarketDataSource()
+        resources.enable_cache()
+        resources.load_stock_data('IBM', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        resources.load_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 4, 30))
+        self.assertEqual(('IBM', datetime(2005, 1, 1), datetime(2005, 6, 30)), resources.requests[-1])
+        resources.load_stock_data('IBM', datetime(2005, 5, 1), datetime(2005, 6, 1))
+        self.assertEqual(2, len(resources.requests))
+
+    def test_full_history(self):
+        resources = CountingMarketDataSource(True)
+        cache = resources.enable_cache()
+        resources.load_stock_data('IBM', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        result = resources.load_stock_data('IBM', datetime(2006, 3, 1), datetime(2006, 3, 31))
+        self.assertEqual([('IBM', None, None)], resources.requests)
+        self.assertEqual(23, len(result))
+        self.assertEqual(1, cache.hits)
+
+    def test_returns_copy(self):
+        resources = CountingMarketDataSource()
+        resources.enable_cache()
+        result = resources.load_stock_data('IBM', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        result.rename(columns={'IBM': 'Price'}, inplace=True)
+        result = resources.load_stock_data('IBM', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        self.assertTrue('IBM' in result.columns)
+
+    def test_eviction(self):
+        resources = CountingMarketDataSource()
+        cache = resources.enable_cache(max_symbols=2)
+        for symbol in ['IBM', 'MSFT', 'IBM', 'GOOG']:
+            resources.load_stock_data(symbol, datetime(2005, 3, 1), datetime(2005, 6, 30))
+        self.assertEqual(['IBM', 'GOOG'], list(cache.entries.keys()))
+        self.assertEqual(1, cache.evictions)
+
+        size = cache.entries['IBM'].size
+        cache = MarketDataCache(max_bytes=size * 2)
+        for symbol in ['IBM', 'MSFT', 'GOOG']:
+            cache.put(symbol, None, None, resources.get_stock_data('IBM', None, None).loc['2005-03-01':'2005-06-30'])
+        self.assertEqual(['MSFT', 'GOOG'], list(cache.entries.keys()))
+        self.assertEqual(size * 2, cache.size)
+
+    def test_invalidate(self):
+        resources = CountingMarketDataSource()
+        cache = resources.enable_cache()
+        resources.load_stock_data('IBM', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        resources.load_stock_data('MSFT', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        cache.invalidate('IBM')
+        self.assertEqual(['MSFT'], list(cache.entries.keys()))
+        resources.load_stock_data('IBM', datetime(2005, 3, 1), datetime(2005, 6, 30))
+        self.assertEqual(3, len(resources.requests))
+        cache.invalidate()
+        self.assertEqual(0, cache.size)
+        self.assertEqual(0, len(cache.entries))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,16 @@
+import os
+import shutil
+import tempfile
+import time
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource, YahooMarketDataSource
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource, YahooMarketDataSource, \
+    BinaryMarketDataSource, MarketDataSource
 
 
 class LocalMarketDataSourceTests(unittest.TestCase):
@@ -26,3 +35,179 @@ class YahooMarketDataSourceTests(unittest.TestCase):
         self.assertEquals(21, len(result['GOOG']))
 
 
+def write_csv_directory(base_dir: str, symbols: list) -> str:
+    csv_dir = os.path.join(base_dir, "csv")
+    os.makedirs(csv_dir)
+    dates = pd.bdate_range(datetime(2005, 1, 1), datetime(2005, 12, 31))
+    for position, symbol in enumerate(symbols):
+        prices = np.linspace(10, 20, len(dates)) * (position + 1)
+        data = pd.DataFrame({"Date": dates, "Open": prices, "High": prices + 1, "Low": prices - 1,
+                             "Close": prices, "Volume": 1000, "Adj Close": prices})
+        # files are stored newest first, as downloaded
+        data.iloc[::-1].to_csv(os.path.join(csv_dir, "{}.csv".format(symbol)), index=False)
+    return csv_dir
+
+
+class BinaryMarketDataSourceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.local = LocalMarketDataSource(write_csv_directory(self.base_dir, ["SPY", "IBM"]))
+        self.resources = BinaryMarketDataSource.convert(self.local, os.path.join(self.base_dir, "binary"))
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_construct(self):
+        self.assertEqual(["IBM", "SPY"], sorted(self.resources.indexes))
+        self.assertTrue(self.resources.can_use("IBM"))
+        self.assertFalse(self.resources.can_use("Test"))
+        reloaded = BinaryMarketDataSource(self.resources.base_dir)
+        self.assertEqual(["IBM", "SPY"], sorted(reloaded.indexes))
+
+    def test_get_stock_data(self):
+        result = self.resources.get_stock_data("IBM", datetime(2005, 3, 1), datetime(2005, 3, 31))
+        expected = self.local.get_stock_data("IBM", None, None).sort_index().loc["2005-03-01":"2005-03-31"]
+        self.assertEqual(23, len(result))
+        self.assertEqual(list(expected.columns), list(result.columns))
+        np.testing.assert_array_equal(expected.index.values, result.index.values)
+        np.testing.assert_array_almost_equal(expected.values, result.values)
+
+    def test_get_stock_data_writable(self):
+        result = self.resources.get_stock_data("IBM", datetime(2005, 3, 1), datetime(2005, 3, 31))
+        self.assertTrue(result.values.flags.writeable)
+        result.iloc[0, 0] = -1
+        result["IBM"] *= 2
+        reloaded = self.resources.get_stock_data("IBM", datetime(2005, 3, 1), datetime(2005, 3, 31))
+        self.assertNotEqual(-1, reloaded.iloc[0, 0])
+        np.testing.assert_array_almost_equal(reloaded["IBM"].values * 2, result["IBM"].values)
+
+    def test_get_data(self):
+        result = self.resources.get_data(['IBM'], datetime(2005, 1, 1), datetime(2005, 2, 1))
+        self.assertEqual(22, len(result))
+        expected = self.local.get_data(['IBM'], datetime(2005, 1, 1), datetime(2005, 2, 1))
+        np.testing.assert_array_almost_equal(expected['IBM'].values, result['IBM'].values)
+
+    def test_get_data_index_position(self):
+        result = self.resources.get_data(['IBM', 'SPY'], datetime(2005, 1, 1), datetime(2005, 2, 1))
+        self.assertEqual([HeaderFactory.Index], list(result.columns[-1:]))
+        self.assertEqual('IBM', result.columns[-2])
+        expected = self.local.get_data(['IBM'], datetime(2005, 1, 1), datetime(2005, 2, 1))
+        np.testing.assert_array_almost_equal(expected[HeaderFactory.Index].values, result[HeaderFactory.Index].values)
+
+
+class StubShare(object):
+    requests = []
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def get_historical(self, from_date: str, to_date: str):
+        StubShare.requests.append((self.symbol, from_date, to_date))
+        # newest first, all values as strings
+        return [dict(Symbol=self.symbol, Date=date.strftime('%Y-%m-%d'), Open=str(date.day), High=str(date.day + 1),
+                     Low=str(date.day - 1), Close=str(date.day), Volume='1000', Adj_Close=str(date.day))
+                for date in reversed(pd.bdate_range(from_date, to_date))]
+
+
+class YahooMarketDataSourceCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        StubShare.requests = []
+        self.base_dir = tempfile.mkdtemp()
+        self.resources = YahooMarketDataSource(self.base_dir, share_factory=StubShare)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_sub_range(self):
+        self.resources.get_stock_data('GOOG', datetime(2005, 1, 1), datetime(2005, 2, 28))
+        result = self.resources.get_stock_data('GOOG', datetime(2005, 1, 10), datetime(2005, 1, 14))
+        self.assertEqual([('GOOG', '2005-01-01', '2005-02-28')], StubShare.requests)
+        self.assertEqual(5, len(result))
+        self.assertEqual(14.0, result.loc[datetime(2005, 1, 14), 'GOOG'])
+
+    def test_fetch_missing_gaps(self):
+        self.resources.get_stock_data('GOOG', datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self.resources.get_stock_data('GOOG', datetime(2005, 3, 1), datetime(2005, 3, 31))
+        result = self.resources.get_stock_data('GOOG', datetime(2004, 12, 1), datetime(2005, 4, 15))
+        self.assertEqual([('GOOG', '2005-01-01', '2005-01-31'),
+                          ('GOOG', '2005-03-01', '2005-03-31'),
+                          ('GOOG', '2004-12-01', '2004-12-31'),
+                          ('GOOG', '2005-02-01', '2005-02-28'),
+                          ('GOOG', '2005-04-01', '2005-04-15')], StubShare.requests)
+        self.assertEqual(len(pd.bdate_range(datetime(2004, 12, 1), datetime(2005, 4, 15))), len(result))
+        self.assertTrue(result.index.is_monotonic_increasing)
+        self.assertEqual([(pd.Timestamp(2004, 12, 1), pd.Timestamp(2005, 4, 15))],
+                         self.resources.store.get_ranges('GOOG'))
+        self.assertEqual(['GOOG.csv', 'GOOG.ranges.json'], sorted(os.listdir(self.base_dir)))
+
+    def test_get_data(self):
+        result = self.resources.get_data(['GOOG'], start_date=datetime(2005, 1, 1), end_date=datetime(2005, 2, 1))
+        self.assertEqual(22, len(result['GOOG']))
+
+    def test_eviction(self):
+        self.resources.get_stock_data('GOOG', datetime(2005, 1, 1), datetime(2005, 12, 31))
+        size = self.resources.store.get_size()
+        self.resources.store.max_bytes = size * 1.5
+        os.utime(self.resources.store.symbol_to_path('GOOG', '.csv'), (0, 0))
+        self.resources.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 12, 31))
+        self.assertEqual(['IBM.csv', 'IBM.ranges.json'], sorted(os.listdir(self.base_dir)))
+        self.resources.get_stock_data('GOOG', datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self.assertEqual(('GOOG', '2005-01-01', '2005-01-31'), StubShare.requests[-1])
+
+    def test_eviction_keeps_merged(self):
+        self.resources.store.max_bytes = 1
+        self.resources.get_stock_data('GOOG', datetime(2005, 1, 1), datetime(2005, 1, 31))
+        result = self.resources.get_stock_data('IBM', datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self.assertEqual(21, len(result['IBM']))
+        self.assertEqual(['IBM.csv', 'IBM.ranges.json'], sorted(os.listdir(self.base_dir)))
+
+    def test_recent_range(self):
+        today = pd.Timestamp.now().normalize()
+        from_date = today - timedelta(days=10)
+        self.resources.get_stock_data('GOOG', from_date, today)
+        self.assertEqual([(from_date, today - timedelta(days=1))], self.resources.store.get_ranges('GOOG'))
+        self.resources.get_stock_data('GOOG', from_date, today)
+        self.assertEqual(('GOOG', today.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')), StubShare.requests[-1])
+
+
+class SlowMarketDataSource(MarketDataSource):
+
+    def can_use(self, symbol):
+        return True
+
+    def get_stock_data(self, symbol: str, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+        time.sleep(0.2)
+        dates = pd.bdate_range(from_date, to_date)
+        return pd.DataFrame(index=dates, data={symbol: np.arange(len(dates), dtype=np.float64) + len(symbol)})
+
+
+class ParallelLoadingTests(unittest.TestCase):
+
+    def test_threads(self):
+        resources = SlowMarketDataSource()
+        resources.set_parallel(workers=5)
+        symbols = ['IBM', 'MSFT', 'GOOG', 'AAPL']
+        started = time.perf_counter()
+        result = resources.get_data(symbols, datetime(2005, 1, 1), datetime(2005, 2, 1))
+        self.assertLess(time.perf_counter() - started, 0.6)
+        self.assertEqual([HeaderFactory.Index] + symbols, list(result.columns))
+        self.assertEqual(['SPY'] + symbols, list(resources.load_latency.keys()))
+        self.assertTrue(all(latency >= 0.2 for latency in resources.load_latency.values()))
+
+    def test_processes(self):
+        base_dir = tempfile.mkdtemp()
+        try:
+            symbols = ['IBM', 'MSFT', 'GOOG']
+            resources = LocalMarketDataSource(write_csv_directory(base_dir, ['SPY'] + symbols))
+            expected = resources.get_data(symbols, datetime(2005, 1, 1), datetime(2005, 2, 1))
+            resources.enable_cache()
+            resources.set_parallel(workers=2, use_processes=True)
+            result = resources.get_data(symbols, datetime(2005, 1, 1), datetime(2005, 2, 1))
+            self.assertEqual(list(expected.columns), list(result.columns))
+            np.testing.assert_array_equal(expected.values, result.values)
+            self.assertEqual(4, resources.cache.misses)
+            self.assertEqual(4, len(resources.cache.entries))
+        finally:
+            shutil.rmtree(base_dir)
@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Market.MarketPanel import MarketPanel
+
+
+class MarketPanelTests(unittest.TestCase):
+
+    def setUp(self):
+        dates = pd.bdate_range(datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self.index = pd.Series(np.arange(len(dates), dtype=np.float64), index=dates, name='SPY')
+        self.ibm = pd.DataFrame(index=dates, data={"Open": 1.0, "High": 2.0, "Low": 3.0, "Close": 4.0,
+                                                   "Volume": 5.0, "IBM": 6.0})
+        # newest first and one day missing
+        self.msft = self.ibm.rename(columns={"IBM": "MSFT"}).iloc[::-1].drop(dates[3]) * 10
+        self.panel = MarketPanel.build(self.index.drop(dates[1]), ["IBM", "MSFT"], [self.ibm, self.msft],
+                                       datetime(2005, 1, 1), datetime(2005, 1, 20))
+
+    def test_build(self):
+        self.assertEqual((13, 2, 6), self.panel.values.shape)
+        self.assertEqual(datetime(2005, 1, 3), self.panel.dates[0])
+        self.assertEqual(datetime(2005, 1, 20), self.panel.dates[-1])
+        self.assertEqual(0.0, self.panel.index[0])
+        self.assertTrue(np.isnan(self.panel.values[2, 1, :]).all())
+        self.assertEqual(60.0, self.panel.values[3, 1, -1])
+
+    def test_to_frame(self):
+        result = self.panel.to_frame()
+        self.assertEqual([HeaderFactory.Index, 'Open_IBM', 'High_IBM', 'Low_IBM', 'Close_IBM', 'Volume_IBM', 'IBM',
+                          'Open_MSFT', 'High_MSFT', 'Low_MSFT', 'Close_MSFT', 'Volume_MSFT', 'MSFT'],
+                         list(result.columns))
+        self.assertEqual(13, len(result))
+        self.assertEqual(20.0, result['High_MSFT'].iloc[0])
+        self.assertEqual(6.0, result['IBM'].iloc[-1])
+
+    def test_to_frame_single(self):
+        panel = MarketPanel.build(self.index, ["IBM"], [self.ibm], datetime(2005, 1, 1), datetime(2005, 1, 20))
+        result = panel.to_frame(True)
+        self.assertEqual([HeaderFactory.Index, 'Open', 'High', 'Low', 'Close', 'Volume', HeaderFactory.Price],
+                         list(result.columns))
+
+    def test_missing_fields(self):
+        panel = MarketPanel.build(self.index, ["IBM"], [self.ibm[["Close", "IBM"]]], datetime(2005, 1, 1),
+                                  datetime(2005, 1, 20))
+        self.assertEqual([HeaderFactory.Index, 'Close_IBM', 'IBM'], list(panel.to_frame().columns))
+
+    def test_index_position(self):
+        panel = MarketPanel.build(self.index, ["IBM", "MSFT"], [self.ibm[["Close", "IBM"]], self.msft],
+                                  datetime(2005, 1, 1), datetime(2005, 1, 20), 1)
+        result = panel.to_frame()
+        self.assertEqual(['Close_IBM', 'IBM', HeaderFactory.Index, 'Open_MSFT', 'High_MSFT', 'Low_MSFT', 'Close_MSFT',
+                          'Volume_MSFT', 'MSFT'], list(result.columns))
+        self.assertEqual(list(self.index.iloc[:len(result)]), list(result[HeaderFactory.Index]))
+        self.assertEqual(6.0, result['IBM'].iloc[0])
+        self.assertEqual(10.0, result['Open_MSFT'].iloc[0])
+
+    def test_views(self):
+        self.assertEqual(60.0, self.panel.get_field(HeaderFactory.Price)['MSFT'].iloc[0])
+        multi = self.panel.to_multi_frame()
+        self.assertEqual(50.0, multi[('MSFT', 'Volume')].iloc[0])
+        self.panel.values[0, 0, 0] = -1
+        self.assertEqual(-1, multi[('IBM', 'Open')].iloc[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
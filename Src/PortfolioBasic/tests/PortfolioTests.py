@@ -1,7 +1,10 @@
 import unittest
 from datetime import datetime
+
+import numpy as np
 from testfixtures import ShouldRaise
-from PortfolioBasic.Portfolio import PortfolioAllocations, PortfolioOrdersFactory
+from PortfolioBasic.Portfolio import PortfolioAllocations, PortfolioOrdersFactory, OrdersSimulator, \
+    PortfolioOrdersLeverageManager
 
 
 class PortfolioAllocationsTests(unittest.TestCase):
@@ -42,5 +45,40 @@ class PortfolioOrdersTests(unittest.TestCase):
         self.portfolio
 
 
+class PortfolioOrdersLeverageManagerTests(unittest.TestCase):
+
+    def test_deleverage_matches_iterative(self):
+        for file_name in ["orders-11-modified.csv", "orders-12-modified.csv", "orders-leverage-1.csv",
+                          "orders-leverage-2.csv", "orders-leverage-3.csv"]:
+            file_name = "..\\ml4t\\mc2p1\\" + file_name
+            expected = PortfolioOrdersFactory.load(file_name)
+            while expected.is_over_leveraged():
+                deleveraged = PortfolioOrdersLeverageManager.deleverage_once(expected)
+                if deleveraged is None:
+                    break
+                expected = deleveraged
+
+            result = PortfolioOrdersLeverageManager.deleverage(PortfolioOrdersFactory.load(file_name))
+            columns = ["Symbol", "Order", "Shares"]
+            self.assertTrue(expected.orders[columns].equals(result.orders[columns]), file_name)
+            self.assertTrue(expected.daily_portfolio_values.equals(result.daily_portfolio_values), file_name)
+
+
+class OrdersSimulatorTests(unittest.TestCase):
+
+    def test_simulate(self):
+        prices = np.array([[10.0, 20.0], [np.nan, np.nan], [11.0, 19.0], [12.0, np.nan]])
+        trades = OrdersSimulator.get_trades(np.array([0, 0, 2, 2]), np.array([0, 1, 0, 0]),
+                                            np.array([100.0, -50.0, 10.0, -60.0]), prices.shape)
+        np.testing.assert_array_equal([[100, -50], [0, 0], [-50, 0], [0, 0]], trades)
+        holdings, cash, values, valid = OrdersSimulator.simulate(trades, prices, 1000)
+        np.testing.assert_array_equal([[100, -50], [100, -50], [50, -50], [50, -50]], holdings)
+        np.testing.assert_array_equal([1000, 1000, 1550, 1550], cash)
+        np.testing.assert_array_equal([True, False, True, False], valid)
+        np.testing.assert_array_equal([0, -400], values[valid].sum(axis=1))
+        leverage = OrdersSimulator.get_leverage(values[valid], cash[valid])
+        np.testing.assert_array_almost_equal([2000 / 1000, 1500 / 1150], leverage)
+
+
 if __name__ == '__main__':
     unittest.main()
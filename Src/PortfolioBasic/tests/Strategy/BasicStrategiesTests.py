@@ -3,10 +3,18 @@ from datetime import datetime
 
 from PortfolioBasic.Portfolio import PortfolioOrders
 from PortfolioBasic.Strategy.BasicStrategies import BollingerBandStrategy, StrategyManager, MACDBollingerBandStrategy
-from PortfolioBasic.Strategy.StopLossStrategies import ATRStopLossStrategy
+from PortfolioBasic.Strategy.StopLossStrategies import ATRStopLossStrategy, TrailingStopLossStrategy
 from PortfolioBasic.Technical.Analysis import PortfolioAnalyser
 
 
+class RecordingStrategy(MACDBollingerBandStrategy):
+    stop_losses = []
+
+    def __init__(self, symbols, df_prices, stop_loss=None):
+        RecordingStrategy.stop_losses.append(stop_loss)
+        super(RecordingStrategy, self).__init__(symbols, df_prices, stop_loss)
+
+
 class BollingerBandStrategyTests(unittest.TestCase):
 
     def setUp(self):
@@ -58,3 +66,11 @@ class BollingerBandStrategyTests(unittest.TestCase):
         self.assertEquals(round(0.00441, 5), round(analysis.volatility, 5))
         self.assertEquals(12273.0, analysis.portfolio.daily_portfolio_values[-1])
         self.assertEquals(round(0.00045, 5), round(analysis.avg_daily_return, 5))
+
+    def test_MACD_Bollinger_with_trailing_stops(self):
+        RecordingStrategy.stop_losses = []
+        self.manager.process_strategy(RecordingStrategy, ATRStopLossStrategy(0.1, 0.3), trailing=False)
+        stop_loss = RecordingStrategy.stop_losses[0]
+        self.assertIsInstance(stop_loss, TrailingStopLossStrategy)
+        self.assertEqual((0.1, 0.3, False), (stop_loss.engine.low, stop_loss.engine.high, stop_loss.engine.trailing))
+        self.assertGreater(len(self.manager.instruction), 0)
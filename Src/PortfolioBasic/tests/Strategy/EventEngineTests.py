@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Portfolio import OrdersSimulator
+from PortfolioBasic.Strategy.BasicStrategies import BollingerBandStrategy, MACDBollingerBandStrategy
+from PortfolioBasic.Strategy.EventEngine import EventEngine, BarStream, MacdState, \
+    StreamingBollingerBandStrategy, StreamingMACDBollingerBandStrategy
+from PortfolioBasic.Technical.Analysis import TechnicalPerformance
+
+
+def get_prices(symbols, days=400, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range('2010-01-01', periods=days, name="Date")
+    data = pd.DataFrame({HeaderFactory.Index: 100 + np.cumsum(rng.normal(0, 1, days))}, index=dates)
+    for symbol in symbols:
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        for field in HeaderFactory.Columns:
+            data[field + '_' + symbol] = prices * rng.uniform(0.99, 1.01, days)
+        data[symbol] = prices
+    return data
+
+
+class EventEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.symbols = ["IBM", "MSFT"]
+        self.prices = get_prices(self.symbols)
+        self.prices.loc[self.prices.index[[50, 120]], "IBM"] = np.nan
+        self.prices.loc[self.prices.index[200], "Open_MSFT"] = np.nan
+
+    def get_batch_orders(self, strategy_type) -> pd.DataFrame:
+        strategy = strategy_type(self.symbols, self.prices, None)
+        return pd.concat([instruction[["Symbol", HeaderFactory.Order, "Shares"]]
+                          for instruction in strategy.instructions])
+
+    def assert_batch_orders(self, strategy_type, streaming_type):
+        expected = self.get_batch_orders(strategy_type)
+        result = EventEngine.run_frame(streaming_type, self.symbols, self.prices).get_orders()
+        expected = expected.reset_index().sort_values(["Symbol", "Date"]).reset_index(drop=True)
+        result = result.reset_index().sort_values(["Symbol", "Date"]).reset_index(drop=True)
+        self.assertGreater(len(result), 10)
+        self.assertEqual(list(expected["Date"]), list(result["Date"]))
+        self.assertEqual(list(expected[HeaderFactory.Order]), list(result[HeaderFactory.Order]))
+        self.assertEqual(list(expected["Symbol"]), list(result["Symbol"]))
+
+    def test_bollinger(self):
+        self.assert_batch_orders(BollingerBandStrategy, StreamingBollingerBandStrategy)
+
+    def test_macd_bollinger(self):
+        self.assert_batch_orders(MACDBollingerBandStrategy, StreamingMACDBollingerBandStrategy)
+
+    def test_macd_state(self):
+        expected = TechnicalPerformance.compute_macd(self.prices[["IBM"]])
+        state = MacdState()
+        result = np.array([state.update(price) for price in self.prices["IBM"].values])
+        np.testing.assert_allclose(expected["IBM_MACD"].values, result[:, 0], rtol=1e-12)
+        np.testing.assert_allclose(expected["IBM_MACD_SIGNAL"].values, result[:, 1], rtol=1e-12)
+
+    def test_ledger(self):
+        prices = get_prices(self.symbols, seed=1)
+        # unpriced bars of either symbol, held or not yet traded, have no value as in OrdersSimulator
+        prices.loc[prices.index[[36, 61, 150, 300]], "MSFT"] = np.nan
+        prices.loc[prices.index[[90, 250]], "IBM"] = np.nan
+        ledger = EventEngine.run_frame(StreamingMACDBollingerBandStrategy, self.symbols, prices, 10000)
+        orders = ledger.get_orders()
+        calendar = pd.date_range(orders.index[0], prices.index[-1])
+        symbols = pd.Index(self.symbols)
+        values = prices[self.symbols].reindex(calendar).values
+        shares = np.where(orders[HeaderFactory.Order] == HeaderFactory.BUY, 1.0, -1.0) * orders["Shares"].values
+        trades = OrdersSimulator.get_trades(calendar.get_indexer(orders.index), symbols.get_indexer(orders["Symbol"]),
+                                            shares, values.shape)
+        _, cash, values, valid = OrdersSimulator.simulate(trades, values, 10000)
+        result = ledger.get_daily_values()
+        self.assertEqual(list(calendar[valid]), list(result.index))
+        np.testing.assert_allclose(values[valid].sum(axis=1) + cash[valid], result.values, rtol=1e-12)
+
+    def test_without_history(self):
+        engine = EventEngine(StreamingBollingerBandStrategy(self.symbols), 10000, history=False)
+        ledger = engine.run(BarStream(self.prices, self.symbols))
+        self.assertEqual(0, len(ledger.values))
+        self.assertEqual(0, len(ledger.orders))
+        self.assertNotEqual(10000, ledger.cash)
+        self.assertTrue(ledger.value == ledger.value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Strategy.ExitStrategies import DayExitStrategy
+from PortfolioBasic.Strategy.StopLossStrategies import ATRStopLossStrategy, StopLossStrategy
+
+
+class FixedStopLossStrategy(StopLossStrategy):
+
+    def __init__(self, data: pd.DataFrame, bound=0.03):
+        self.data = data
+        self.bound = bound
+
+    def pre_process(self, data: pd.DataFrame):
+        pass
+
+    def get_exit(self, date, short=False):
+        price = self.data.loc[date, HeaderFactory.Price]
+        return price * (1 - self.bound), price * (1 + self.bound)
+
+    def process(self, original_data: pd.DataFrame, instruction_original: pd.DataFrame) -> pd.DataFrame:
+        return instruction_original
+
+
+class DayExitStrategyTests(unittest.TestCase):
+
+    def setUp(self):
+        file_name = os.path.join(os.path.dirname(__file__), '..', 'Data', 'exit_data.csv')
+        self.data = pd.read_csv(file_name, index_col=0, parse_dates=True)
+
+    def test_exit_data(self):
+        stop_loss = ATRStopLossStrategy()
+        stop_loss.pre_process(self.data)
+        result = DayExitStrategy(2, stop_loss).process_exit(self.data.copy())
+        self.assertEqual(['SELL', 'BUY', 'SELL', 'BUY', 'BUY', 'SELL', 'BUY', 'SELL'],
+                         list(result[HeaderFactory.Order]))
+        self.assertEqual([100, 100, 100, 100, 100, 200, 200, 100], list(result[HeaderFactory.Shares]))
+        self.assertEqual(3, result[HeaderFactory.StopLow].count())
+        self.assertAlmostEqual(1475.892334, result[HeaderFactory.StopLow].iloc[4], 5)
+
+    def test_stop_touch(self):
+        result = DayExitStrategy(5, FixedStopLossStrategy(self.data)).process_exit(self.data.copy())
+        # sell of 01/04 is closed on 01/07 when price falls under low bound, before 5 days pass
+        self.assertEqual(pd.Timestamp('2016-01-07'), result.index[1])
+        self.assertEqual(['SELL', 'BUY', 'SELL', 'BUY', 'BUY', 'SELL', 'BUY', 'SELL'],
+                         list(result[HeaderFactory.Order]))
+        self.assertAlmostEqual(1673.670044 * 0.97, result[HeaderFactory.StopLow].iloc[0], 5)
+
+    def test_short_stops(self):
+        stop_loss = ATRStopLossStrategy()
+        stop_loss.pre_process(self.data)
+        expected = DayExitStrategy(2, stop_loss).process_exit(self.data.copy())
+        result = DayExitStrategy(2, stop_loss, short_stops=True).process_exit(self.data.copy())
+        self.assertEqual(list(expected[HeaderFactory.Order]), list(result[HeaderFactory.Order]))
+        entries = result.dropna(subset=[HeaderFactory.StopLow])
+        self.assertIn(HeaderFactory.SELL, list(entries[HeaderFactory.Order]))
+        for date, row in entries.iterrows():
+            low, high = stop_loss.get_exit(date, row[HeaderFactory.Order] == HeaderFactory.SELL)
+            self.assertAlmostEqual(low, row[HeaderFactory.StopLow], 5)
+            self.assertAlmostEqual(high, row[HeaderFactory.StopHigh], 5)
+
+    def test_no_signals(self):
+        self.data[HeaderFactory.Order] = np.nan
+        result = DayExitStrategy(2, FixedStopLossStrategy(self.data)).process_exit(self.data.copy())
+        self.assertEqual(0, len(result))
+
+
+if __name__ == '__main__':
+    unittest.main()
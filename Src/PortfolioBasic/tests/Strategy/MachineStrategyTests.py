@@ -41,4 +41,41 @@ class MachineStrategyTests(unittest.TestCase):
         indicators = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator()))
         algo = LinearAlgoTrader(indicators)
         manager = MachineStrategyManager('IBM', algo)
-        manager.train_strategy(datetime(2007, 12, 31), datetime(2009, 12, 31))
\ No newline at end of file
+        manager.train_strategy(datetime(2007, 12, 31), datetime(2009, 12, 31))
+
+
+class WalkForwardPipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        indicators = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator(), MACDIndicator()))
+        self.algo = LinearAlgoTrader(indicators)
+        self.manager = MachineStrategyManager('IBM', self.algo)
+
+    def test_walk_forward(self):
+        result = self.manager.walk_forward(datetime(2008, 1, 1), datetime(2010, 12, 31), 252, 63)
+        self.assertEqual(9, len(result.folds))
+        self.assertEqual(len(result.instructions), result.folds["Orders"].sum())
+        for _, fold in result.folds.iterrows():
+            self.assertGreater(fold["TestStart"], fold["TrainEnd"])
+        self.assertTrue(result.instructions.index.is_monotonic_increasing)
+
+        parallel = self.manager.walk_forward(datetime(2008, 1, 1), datetime(2010, 12, 31), 252, 63, workers=2)
+        self.assertTrue(result.folds.equals(parallel.folds))
+        self.assertTrue(result.instructions.equals(parallel.instructions))
+
+    def test_fold_training(self):
+        result = self.manager.walk_forward(datetime(2008, 1, 1), datetime(2010, 12, 31), 252, 63)
+        fold = result.folds.iloc[1]
+        prices = PortfolioOrders.resources.get_data(['IBM'], datetime(2008, 1, 1), datetime(2010, 12, 31), True)
+        x_data, y_data = self.algo.get_data(prices)
+        algo = LinearAlgoTrader(self.algo.indicators)
+        algo.train_features(x_data.loc[fold["TrainStart"]:fold["TrainEnd"]],
+                            y_data.loc[fold["TrainStart"]:fold["TrainEnd"]])
+        _, rmse, c = algo.predict_features(x_data.loc[fold["TestStart"]:fold["TestEnd"]],
+                                           y_data.loc[fold["TestStart"]:fold["TestEnd"]])
+        self.assertAlmostEqual(rmse, fold["RMSE"])
+        self.assertAlmostEqual(c, fold["Correlation"])
+
+    def test_overlapping_steps(self):
+        with self.assertRaises(ValueError):
+            self.manager.walk_forward(datetime(2008, 1, 1), datetime(2010, 12, 31), 252, 63, step_days=21)
@@ -0,0 +1,94 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.MachineLearning.SimpleAlgoTrader import LinearAlgoTrader
+from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource, SharedMarketDataSource
+from PortfolioBasic.Portfolio import PortfolioOrders
+from PortfolioBasic.Strategy.ParameterSweep import ParameterGrid, SweepRunner, MachineStrategyEvaluator
+from PortfolioBasic.Technical.Indicators import CombinedIndicator, MomentumIndicator, BollingerIndicator, RsiIndicator
+from PortfolioBasic.tests.Market.MarketDataServiceTests import write_csv_directory
+
+
+def evaluate_orders(point: dict) -> PortfolioOrders:
+    dates = pd.bdate_range(datetime(2005, 2, 1), periods=point['hold'] + 1)
+    orders = pd.DataFrame({"Symbol": "IBM", "Order": ["BUY", "SELL"], "Shares": point['shares']},
+                          index=pd.DatetimeIndex(dates[[0, -1]], name="Date"))
+    return PortfolioOrders(orders, 10000)
+
+
+def create_algo(days=5) -> LinearAlgoTrader:
+    return LinearAlgoTrader(CombinedIndicator((MomentumIndicator(days), BollingerIndicator(), RsiIndicator())))
+
+
+def evaluate_failing(point: dict) -> PortfolioOrders:
+    raise ValueError("Not expected")
+
+
+class ParameterSweepTests(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.local = LocalMarketDataSource(write_csv_directory(self.base_dir, ["SPY", "IBM"]))
+        self.resources = SharedMarketDataSource.preload(self.local, ["IBM"], datetime(2005, 1, 1),
+                                                        datetime(2005, 12, 31))
+        self.grid = ParameterGrid({'hold': [5, 10], 'shares': [100, 200]})
+
+    def tearDown(self):
+        self.resources.release()
+        shutil.rmtree(self.base_dir)
+
+    def test_grid(self):
+        self.assertEqual(4, len(self.grid))
+        self.assertEqual([(5, 100), (5, 200), (10, 100), (10, 200)],
+                         [(point['hold'], point['shares']) for point in self.grid])
+        self.assertEqual("hold=5,shares=100", ParameterGrid.get_key({'shares': np.int64(100), 'hold': 5}))
+
+    def test_shared_source(self):
+        expected = self.local.get_stock_data("IBM", None, None).sort_index().loc["2005-03-01":"2005-03-31"]
+        attached = pickle.loads(pickle.dumps(self.resources))
+        for source in (self.resources, attached):
+            result = source.get_stock_data("IBM", datetime(2005, 3, 1), datetime(2005, 3, 31))
+            np.testing.assert_array_equal(expected.values, result.values)
+            self.assertEqual(list(expected.index), list(result.index))
+        self.assertEqual("SPY", attached.get_index(["IBM"]))
+        self.assertTrue(attached.can_use("IBM"))
+        attached.release()
+
+    def test_run(self):
+        expected = SweepRunner(evaluate_orders, self.grid).run(self.resources)
+        result = SweepRunner(evaluate_orders, self.grid).run(self.resources, workers=2)
+        self.assertEqual(["hold", "shares"] + SweepRunner.Metrics, list(result.columns))
+        self.assertEqual([ParameterGrid.get_key(point) for point in self.grid], list(result.index))
+        np.testing.assert_array_almost_equal(expected.values, result.values)
+        self.assertTrue((result['cumulative_return'] > 0).all())
+        self.assertGreater(result.loc["hold=10,shares=200", 'cumulative_return'],
+                           result.loc["hold=10,shares=100", 'cumulative_return'])
+
+    def test_machine_strategy(self):
+        evaluate = MachineStrategyEvaluator("IBM", create_algo, datetime(2005, 1, 1), datetime(2005, 6, 30),
+                                            datetime(2005, 7, 1), datetime(2005, 12, 31))
+        grid = ParameterGrid({'days': [5, 10], 'threshold': [0.001, 0.01]})
+        result = SweepRunner(evaluate, grid).run(self.resources)
+        self.assertEqual([ParameterGrid.get_key(point) for point in grid], list(result.index))
+        self.assertFalse(result[SweepRunner.Metrics].isnull().any().any())
+
+    def test_resume(self):
+        checkpoint = os.path.join(self.base_dir, "sweep.csv")
+        expected = SweepRunner(evaluate_orders, self.grid, checkpoint).run(self.resources)
+        grid = ParameterGrid({'hold': [5, 10, 15], 'shares': [100, 200]})
+        result = SweepRunner(evaluate_failing, grid, checkpoint).run(self.resources)
+        np.testing.assert_array_almost_equal(expected.values, result.values)
+        result = SweepRunner(evaluate_orders, grid, checkpoint).run(self.resources)
+        self.assertEqual(6, len(result))
+        self.assertEqual(6, len(pd.read_csv(checkpoint)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
 import unittest
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
 from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource
-from PortfolioBasic.Strategy.StopLossStrategies import ATRStopLossStrategy
+from PortfolioBasic.Strategy.StopLossStrategies import ATRStopLossStrategy, StopLossEngine, TrailingStopLossStrategy
 
 
 class ATRStopLossStrategyTests(unittest.TestCase):
@@ -23,3 +27,77 @@ class ATRStopLossStrategyTests(unittest.TestCase):
         self.assertEqual(181.7657142857143, low)
         self.assertEqual(199.50285714285715, high)
 
+
+class StopLossEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.prices = np.array([100, 101, 103, 106, 104, 102, 99, 98, 97, 110], dtype=np.float64)
+        self.adr = np.ones(len(self.prices))
+
+    def get_events(self, *orders):
+        events = np.full(len(self.prices), np.nan)
+        for index, event in orders:
+            events[index] = event
+        return events
+
+    def test_long(self):
+        engine = StopLossEngine(2, 3)
+        stop_low, stop_high, hits = engine.run(self.prices, self.prices, self.prices, self.adr,
+                                               self.get_events((0, StopLossEngine.Long)))
+        # profit taken at 103
+        self.assertEqual([2], list(np.flatnonzero(hits)))
+        self.assertEqual(98, stop_low[0])
+        self.assertEqual(103, stop_high[2])
+        self.assertTrue(np.isnan(stop_low[3:]).all())
+
+    def test_short(self):
+        engine = StopLossEngine(2, 3)
+        stop_low, stop_high, hits = engine.run(self.prices, self.prices, self.prices, self.adr,
+                                               self.get_events((4, StopLossEngine.Short)))
+        # short entered at 104 is stopped above 106 only by last price, profit below 101 taken first
+        self.assertEqual([6], list(np.flatnonzero(hits)))
+        self.assertEqual(101, stop_low[4])
+        self.assertEqual(106, stop_high[4])
+
+    def test_trailing(self):
+        fixed = StopLossEngine(3.5, 20).run(self.prices, self.prices, self.prices, self.adr,
+                                          self.get_events((0, StopLossEngine.Long)))
+        trailing = StopLossEngine(3.5, 20, trailing=True).run(self.prices, self.prices, self.prices, self.adr,
+                                                            self.get_events((0, StopLossEngine.Long)))
+        self.assertEqual([], list(np.flatnonzero(fixed[2])))
+        # stop follows 106 peak to 102.5
+        self.assertEqual([5], list(np.flatnonzero(trailing[2])))
+        self.assertEqual(102.5, trailing[0][4])
+
+    def test_exit_and_reversal(self):
+        engine = StopLossEngine(2, 3)
+        events = self.get_events((0, StopLossEngine.Long), (1, StopLossEngine.Flat), (5, StopLossEngine.Short),
+                                 (6, StopLossEngine.Long))
+        stop_low, _, hits = engine.run(self.prices, self.prices, self.prices, self.adr, events)
+        self.assertEqual([8], list(np.flatnonzero(hits)))
+        self.assertTrue(np.isnan(stop_low[1:5]).all())
+        self.assertEqual(97, stop_low[6])
+
+    def test_get_exits(self):
+        dates = pd.bdate_range('2012-01-02', periods=len(self.prices))
+        data = pd.DataFrame({HeaderFactory.Price: self.prices, HeaderFactory.High: self.prices + 1,
+                             HeaderFactory.Low: self.prices - 1}, index=dates)
+        strategy = ATRStopLossStrategy()
+        strategy.pre_process(data)
+        for short in (False, True):
+            low, high = strategy.get_exits(dates[7:], short)
+            expected = [strategy.get_exit(date, short) for date in dates[7:]]
+            np.testing.assert_array_almost_equal([bound[0] for bound in expected], low)
+            np.testing.assert_array_almost_equal([bound[1] for bound in expected], high)
+
+    def test_process(self):
+        prices = np.array([100] * 8 + [101, 103, 98, 97], dtype=np.float64)
+        dates = pd.bdate_range('2012-01-02', periods=len(prices))
+        data = pd.DataFrame({HeaderFactory.Price: prices, HeaderFactory.High: prices + 0.5,
+                             HeaderFactory.Low: prices - 0.5}, index=dates)
+        instructions = pd.DataFrame({HeaderFactory.Order: [HeaderFactory.BUY]}, index=dates[[8]])
+        result = TrailingStopLossStrategy(2, 3, trailing=False).process(data, instructions)
+        # stop at 98.5, exit only on first hit
+        orders = result[HeaderFactory.Order].dropna()
+        self.assertEqual([HeaderFactory.BUY, HeaderFactory.EXIT], list(orders))
+        self.assertEqual(dates[10], orders.index[1])
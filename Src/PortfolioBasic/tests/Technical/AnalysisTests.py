@@ -2,6 +2,8 @@ import unittest
 from datetime import datetime
 
 import numpy as np
+import pandas as pd
+import talib
 
 from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource, YahooMarketDataSource
 from PortfolioBasic.Portfolio import PortfolioAllocations, Portfolio
@@ -31,6 +33,29 @@ class TechnicalPerformanceTest(unittest.TestCase):
         self.assertEquals(2.625714285714285, last_row)
 
 
+class ComputeMacdTests(unittest.TestCase):
+
+    def test_matches_talib(self):
+        rng = np.random.RandomState(0)
+        values = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (300, 6)), axis=0))
+        values[:5, 1] = np.nan
+        values[:40, 2] = np.nan
+        values[:, 3] = np.nan
+        values[100, 4] = np.nan
+        prices = pd.DataFrame(values, index=pd.bdate_range('2010-01-01', periods=300),
+                              columns=['A', 'B', 'C', 'D', 'E', 'F'])
+        macd = TechnicalPerformance.compute_macd(prices)
+        self.assertEqual(['A_MACD', 'A_MACD_SIGNAL', 'A_MACD_HIST'], list(macd.columns[:3]))
+        self.assertEqual(18, len(macd.columns))
+        for symbol in prices.columns:
+            expected = talib.MACD(prices[symbol].values)
+            for field, values in zip((HeaderFactory.MACD, HeaderFactory.MACD_SIGNAL, HeaderFactory.MACD_HIST),
+                                     expected):
+                result = macd[HeaderFactory.get_name(symbol, field)].values
+                np.testing.assert_array_equal(np.isnan(values), np.isnan(result))
+                np.testing.assert_allclose(values, result, rtol=1e-12, atol=1e-12)
+
+
 class PortfolioAnalyserTests(unittest.TestCase):
     def setUp(self):
         PortfolioAnalyser.interest_rate = 0
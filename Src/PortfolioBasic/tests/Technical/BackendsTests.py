@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.Technical import Backends
+from PortfolioBasic.Technical.Backends import IndicatorBackends, NumpyBackend, PandasBackend
+from PortfolioBasic.Technical.Indicators import CombinedIndicator, MomentumIndicator, BollingerIndicator, \
+    RsiIndicator, MACDIndicator
+
+
+def random_values(days=400, symbols=8, seed=0):
+    rng = np.random.RandomState(seed)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (days, symbols)), axis=0))
+    values[:3, 1] = np.nan
+    values[:50, 2] = np.nan
+    values[:, 3] = np.nan
+    values[100, 4] = np.nan
+    return values
+
+
+class IndicatorBackendsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.default = IndicatorBackends.default
+
+    def tearDown(self):
+        IndicatorBackends.default = self.default
+
+    def assert_close(self, expected, result):
+        np.testing.assert_array_equal(np.isnan(expected), np.isnan(result))
+        np.testing.assert_allclose(expected, result, rtol=1e-9, atol=1e-9)
+
+    def test_equivalence(self):
+        values = random_values()
+        high, low = values * 1.01, values * 0.98
+        reference = IndicatorBackends.get(PandasBackend.name)
+        for name in IndicatorBackends.available():
+            backend = IndicatorBackends.get(name)
+            self.assert_close(reference.sma(values, 20), backend.sma(values, 20))
+            self.assert_close(reference.rolling_std(values, 20), backend.rolling_std(values, 20))
+            self.assert_close(reference.ewm_mean(values, 26, 25), backend.ewm_mean(values, 26, 25))
+            self.assert_close(reference.rsi(values), backend.rsi(values))
+            self.assert_close(reference.momentum(values, 5), backend.momentum(values, 5))
+            self.assert_close(reference.adr(high, low), backend.adr(high, low))
+            for expected, result in zip(reference.macd(values), backend.macd(values)):
+                self.assert_close(expected, result)
+
+    def test_rolling_std_high_prices(self):
+        # small moves at high price level and flat prices, where sum of squares minus squared mean cancels
+        values = 1e5 + np.cumsum(np.random.RandomState(1).normal(0, 0.01, (400, 4)), axis=0)
+        values[:, 0] = 1e7 + 0.1
+        expected = np.full(values.shape, np.nan)
+        for row in range(19, len(values)):
+            expected[row] = np.std(values[row - 19:row + 1], axis=0, ddof=1)
+        expected[19:, 0] = 0
+        for name in IndicatorBackends.available():
+            result = IndicatorBackends.get(name).rolling_std(values, 20)
+            # pandas running sums keep rounding of prices left window
+            tolerance = 1e-6 if name == PandasBackend.name else 1e-9
+            np.testing.assert_allclose(expected, result, rtol=tolerance)
+
+    def test_indicators_on_backend(self):
+        prices = pd.DataFrame({HeaderFactory.Price: random_values()[:, 0]},
+                              index=pd.bdate_range('2010-01-01', periods=400))
+        indicator = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator(), MACDIndicator()))
+        expected = indicator.calculate(prices)
+        IndicatorBackends.set_default(NumpyBackend.name)
+        result = indicator.calculate(prices)
+        self.assert_close(expected.values, result.values)
+
+    def test_numba_fallback(self):
+        numba = Backends.numba
+        Backends.numba = None
+        try:
+            self.assertNotIn('numba', IndicatorBackends.available())
+            self.assertIsInstance(IndicatorBackends.get('numba'), NumpyBackend)
+        finally:
+            Backends.numba = numba
+        self.assertRaises(ValueError, IndicatorBackends.get, 'unknown')
+
+    def test_talib_fallback(self):
+        talib = Backends.talib
+        Backends.talib = None
+        try:
+            self.assertNotIn('pandas', IndicatorBackends.available())
+            self.assertIsInstance(IndicatorBackends.get('pandas'), NumpyBackend)
+        finally:
+            Backends.talib = talib
+
+    def test_benchmark(self):
+        result = IndicatorBackends.benchmark(random_values(days=200), names=[NumpyBackend.name], repeat=1)
+        self.assertEqual(7, len(result))
+        self.assertTrue((result['difference'] < 1e-9).all())
+        self.assertFalse(result['missing_mismatch'].any())
+
+
+if __name__ == '__main__':
+    unittest.main()
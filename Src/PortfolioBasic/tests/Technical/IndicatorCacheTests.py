@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from PortfolioBasic.Definitions import HeaderFactory
+from PortfolioBasic.MachineLearning.SimpleAlgoTrader import BatchLinearAlgoTrader
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
+from PortfolioBasic.Technical.IndicatorCache import IndicatorCache, CachedIndicator
+from PortfolioBasic.Technical.Indicators import MomentumIndicator, CombinedIndicator, BollingerIndicator, \
+    RsiIndicator
+
+
+class CountingIndicator(MomentumIndicator):
+
+    def __init__(self, days=5):
+        super(CountingIndicator, self).__init__(days)
+        self.calls = 0
+
+    def evaluate(self, graph: ComputationGraph) -> list:
+        self.calls += 1
+        return super(CountingIndicator, self).evaluate(graph)
+
+    def fingerprint(self) -> str:
+        # evaluated values don't depend on calls
+        return MomentumIndicator(self.days).fingerprint()
+
+
+class IndicatorCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.prices = pd.DataFrame({HeaderFactory.Price: 100 + np.cumsum(rng.normal(0, 1, 100))},
+                                   index=pd.bdate_range('2010-01-01', periods=100))
+
+    def test_fingerprint(self):
+        self.assertEqual("MomentumIndicator(days=5)", MomentumIndicator().fingerprint())
+        self.assertNotEqual(MomentumIndicator(5).fingerprint(), MomentumIndicator(10).fingerprint())
+        self.assertEqual("CombinedIndicator(MomentumIndicator(days=5),BollingerIndicator(windows=20))",
+                         CombinedIndicator((MomentumIndicator(), BollingerIndicator())).fingerprint())
+
+    def test_served_from_cache(self):
+        counting = CountingIndicator()
+        indicator = CachedIndicator(counting)
+        first = indicator.calculate(self.prices)
+        first.dropna(inplace=True)
+        second = indicator.calculate(self.prices.copy())
+        self.assertEqual(1, counting.calls)
+        self.assertEqual(100, len(second))
+        self.assertTrue(second.equals(MomentumIndicator().calculate(self.prices)))
+
+        changed = self.prices.copy()
+        changed.iloc[-1] += 1
+        indicator.calculate(changed)
+        self.assertEqual(2, counting.calls)
+        self.assertEqual(dict(hits=1, disk_hits=0, misses=2, evictions=0, entries=2, size=indicator.cache.size),
+                         indicator.cache.stats())
+
+    def test_graph_column(self):
+        data = pd.DataFrame({HeaderFactory.Price: self.prices[HeaderFactory.Price].values[::-1],
+                             "Close": self.prices[HeaderFactory.Price].values}, index=self.prices.index)
+        counting = CountingIndicator()
+        indicator = CachedIndicator(counting)
+        graph = ComputationGraph(data, column="Close")
+        result = indicator.evaluate(graph)
+        np.testing.assert_array_equal(MomentumIndicator().calculate(self.prices).values[:, 0], result[0])
+        self.assertIn(('returns', 5, ComputationGraph.Source), graph.nodes)
+        indicator.evaluate(ComputationGraph(data.copy(), column="Close"))
+        indicator.evaluate(ComputationGraph(data))
+        self.assertEqual(2, counting.calls)
+        indicator.calculate(data[[HeaderFactory.Price]])
+        self.assertEqual(2, counting.calls)
+
+    def test_symbol_columns(self):
+        rng = np.random.RandomState(1)
+        symbols = ["A", "B", "C"]
+        prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (200, 3)), axis=0)),
+                              index=pd.bdate_range('2010-01-01', periods=200), columns=symbols)
+        indicators = CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator()))
+        expected = BatchLinearAlgoTrader(indicators, symbols)
+        expected.train(prices)
+        cached = CachedIndicator(indicators)
+        for _ in range(2):
+            algo = BatchLinearAlgoTrader(cached, symbols)
+            algo.train(prices)
+            np.testing.assert_array_equal(expected.coefficients, algo.coefficients)
+        self.assertEqual(1, cached.cache.hits)
+
+    def test_eviction(self):
+        cache = IndicatorCache(max_entries=2)
+        indicators = [CachedIndicator(MomentumIndicator(days), cache) for days in (1, 2, 3)]
+        for indicator in indicators:
+            indicator.calculate(self.prices)
+        self.assertEqual(1, cache.evictions)
+        self.assertIsNone(cache.get(IndicatorCache.get_key(indicators[0], self.prices)))
+        self.assertIsNotNone(cache.get(IndicatorCache.get_key(indicators[2], self.prices)))
+
+    def test_disk(self):
+        base_dir = tempfile.mkdtemp()
+        try:
+            CachedIndicator(CountingIndicator(), IndicatorCache(base_dir=base_dir)).calculate(self.prices)
+            counting = CountingIndicator()
+            indicator = CachedIndicator(counting, IndicatorCache(base_dir=base_dir))
+            result = indicator.calculate(self.prices)
+            self.assertEqual(0, counting.calls)
+            self.assertEqual(1, indicator.cache.disk_hits)
+            self.assertTrue(result.equals(MomentumIndicator().calculate(self.prices)))
+        finally:
+            shutil.rmtree(base_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
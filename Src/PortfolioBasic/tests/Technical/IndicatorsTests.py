@@ -1,9 +1,13 @@
 import unittest
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
 from PortfolioBasic.Definitions import HeaderFactory
 from PortfolioBasic.Market.MarketDataService import LocalMarketDataSource
 from PortfolioBasic.Technical.Analysis import TechnicalPerformance
+from PortfolioBasic.Technical.ComputationGraph import ComputationGraph
 from PortfolioBasic.Technical.Indicators import MomentumIndicator, BollingerIndicator, RsiIndicator, CombinedIndicator, \
     MACDIndicator
 
@@ -63,3 +67,64 @@ class IndicatorsTest(unittest.TestCase):
         result = indicator.calculate(self.prices, True)
         last_row = result.iloc[-1]
         self.assertEquals(0.007523893334979043, last_row[HeaderFactory.MACD])
+
+
+class ComputationGraphTest(unittest.TestCase):
+    def setUp(self):
+        market = LocalMarketDataSource()
+        self.prices = market.get_data(["IBM"], datetime(2012, 1, 1), datetime(2012, 12, 1), True)
+
+    def test_combined_matches_children(self):
+        indicators = (MomentumIndicator(), BollingerIndicator(), RsiIndicator(), MACDIndicator())
+        result = CombinedIndicator(indicators).calculate(self.prices)
+        expected = pd.concat([indicator.calculate(self.prices) for indicator in indicators], axis=1)
+        self.assertEqual(list(expected.columns), list(result.columns))
+        np.testing.assert_array_equal(expected.values, result.values)
+
+    def test_shared_nodes(self):
+        graph = ComputationGraph(self.prices)
+        indicator = CombinedIndicator((BollingerIndicator(), MACDIndicator(), MACDIndicator()))
+        indicator.evaluate(graph)
+        indicator.evaluate(graph)
+        # source, rolling mean/std, fast/slow/signal ewm and macd computed once
+        self.assertEqual(7, graph.computed)
+
+    def test_duplicate_columns(self):
+        indicator = CombinedIndicator((RsiIndicator(), RsiIndicator()))
+        self.assertRaises(ValueError, indicator.calculate, self.prices)
+
+    def test_bollinger_bands(self):
+        prices = self.prices[[HeaderFactory.Price]]
+        expected = TechnicalPerformance.compute_bollinger_bands(prices)
+        result = TechnicalPerformance.compute_bollinger_bands(prices, graph=ComputationGraph(prices, None))
+        self.assertTrue(expected.equals(result))
+
+
+class StreamingIndicatorsTest(unittest.TestCase):
+    def setUp(self):
+        market = LocalMarketDataSource()
+        self.prices = market.get_data(["IBM"], datetime(2012, 1, 1), datetime(2012, 12, 1), True)
+
+    def assert_streaming(self, indicator):
+        expected = indicator.calculate(self.prices)
+        result = indicator.calculate_incremental(self.prices)[expected.columns]
+        np.testing.assert_array_equal(expected.isnull().values, result.isnull().values)
+        np.testing.assert_allclose(expected.values, result.values, rtol=1e-9, atol=1e-10)
+
+    def test_streaming(self):
+        for indicator in (MomentumIndicator(), BollingerIndicator(), RsiIndicator(), MACDIndicator(),
+                          MACDIndicator(True)):
+            self.assert_streaming(indicator)
+
+    def test_streaming_combined(self):
+        self.assert_streaming(CombinedIndicator((MomentumIndicator(), BollingerIndicator(), RsiIndicator(),
+                                                 MACDIndicator())))
+
+    def test_update(self):
+        indicator = CombinedIndicator((MomentumIndicator(), RsiIndicator()))
+        expected = indicator.calculate(self.prices).iloc[-1]
+        indicator.reset()
+        for _, row in self.prices.iterrows():
+            result = indicator.update(row)
+        self.assertAlmostEqual(expected[HeaderFactory.MOM], result[HeaderFactory.MOM], 12)
+        self.assertAlmostEqual(expected[HeaderFactory.RSI], result[HeaderFactory.RSI], 12)
@@ -0,0 +1,126 @@
+import itertools
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import check_grad
+
+from PortfolioBasic.Technical.Optimization import SharpeObjective, SharpeOptimizer, EfficientFrontier
+
+
+def random_prices(days, symbols, seed=0):
+    rng = np.random.RandomState(seed)
+    drift = rng.uniform(-0.0005, 0.001, symbols)
+    returns = rng.normal(drift, 0.01, (days, symbols))
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)))
+
+
+class SharpeObjectiveTests(unittest.TestCase):
+
+    def test_sharpe_ratio(self):
+        prices = random_prices(250, 4)
+        allocations = np.array([0.1, 0.2, 0.3, 0.4])
+        values = (prices / prices.iloc[0] * allocations).sum(axis=1)
+        daily_returns = (values / values.shift(1) - 1)[1:]
+        daily_risk_free = (1.01 ** (1. / 252.)) - 1
+        expected = np.sqrt(252) * (daily_returns - daily_risk_free).mean() / daily_returns.std()
+        objective = SharpeObjective.from_prices(prices, 0.01)
+        self.assertAlmostEqual(expected, objective.sharpe_ratio(allocations), 12)
+
+    def test_gradient(self):
+        objective = SharpeObjective.from_prices(random_prices(250, 6, 1), 0)
+        allocations = np.random.RandomState(2).dirichlet(np.ones(6))
+        error = check_grad(lambda x: objective.evaluate(x)[0], lambda x: objective.evaluate(x)[1], allocations)
+        self.assertLess(error, 1e-5)
+
+
+class SharpeOptimizerTests(unittest.TestCase):
+
+    def test_optimize(self):
+        objective = SharpeObjective.from_prices(random_prices(500, 5, 3), 0)
+        allocations = SharpeOptimizer.optimize(objective)
+        self.assertAlmostEqual(1, allocations.sum())
+        self.assertTrue((allocations >= -1e-10).all())
+        best = objective.sharpe_ratio(allocations)
+        for other in np.random.RandomState(4).dirichlet(np.ones(5), 100):
+            self.assertLessEqual(objective.sharpe_ratio(other), best + 1e-9)
+
+    def test_optimize_many(self):
+        objectives = [SharpeObjective.from_prices(random_prices(300, symbols, symbols), 0) for symbols in (3, 4, 5)]
+        expected = [SharpeOptimizer.optimize(objective) for objective in objectives]
+        for workers in (1, 2):
+            results = SharpeOptimizer.optimize_many(objectives, workers=workers)
+            for expected_allocations, allocations in zip(expected, results):
+                np.testing.assert_array_almost_equal(expected_allocations, allocations)
+
+
+class EfficientFrontierTests(unittest.TestCase):
+
+    def setUp(self):
+        self.frontier = EfficientFrontier.from_prices(random_prices(500, 5, 5))
+
+    def test_sweep_targets(self):
+        result = self.frontier.sweep_targets(20)
+        self.assertEqual((20, 5), result.weights.shape)
+        np.testing.assert_array_almost_equal(np.ones(20), result.weights.sum(axis=1))
+        self.assertTrue((result.weights >= -1e-10).all())
+        np.testing.assert_array_almost_equal(result.parameters, result.returns)
+        # risk grows with target above minimum variance portfolio
+        self.assertTrue((np.diff(result.risks) >= -1e-10).all())
+        mean = self.frontier.mean
+        lowest, highest = np.eye(5)[mean.argmin()], np.eye(5)[mean.argmax()]
+        for target, risk in zip(result.parameters, result.risks):
+            for other in np.random.RandomState(6).dirichlet(np.ones(5), 50):
+                # mixed with lowest or highest return symbol to reach target exactly
+                vertex = highest if other.dot(mean) < target else lowest
+                share = (target - other.dot(mean)) / (vertex.dot(mean) - other.dot(mean))
+                other = other + share * (vertex - other)
+                self.assertAlmostEqual(target, other.dot(mean), 12)
+                self.assertGreaterEqual(np.sqrt(other.dot(self.frontier.covariance).dot(other)), risk - 1e-9)
+
+    def test_sweep_risk_aversion(self):
+        result = self.frontier.sweep_risk_aversion([1, 10, 100, 1000, 10000])
+        self.assertTrue((np.diff(result.risks) <= 1e-10).all())
+        self.assertTrue((np.diff(result.returns) <= 1e-10).all())
+        minimum = self.frontier.solve(EfficientFrontier.RISK_AVERSION, np.inf)
+        self.assertLessEqual(minimum.dot(self.frontier.covariance).dot(minimum), result.risks[-1] ** 2 + 1e-12)
+
+    def test_risk_aversion_optimum(self):
+        aversions = [1, 5, 20, 100]
+        result = self.frontier.sweep_risk_aversion(aversions)
+        for aversion, weights in zip(aversions, result.weights):
+            expected = self.get_best_utility(aversion)
+            self.assertAlmostEqual(expected, self.get_utility(weights, aversion), 9)
+
+    def get_utility(self, allocations: np.ndarray, aversion: float) -> float:
+        variance = allocations.dot(self.frontier.covariance).dot(allocations)
+        return self.frontier.mean.dot(allocations) - aversion / 2 * variance
+
+    def get_best_utility(self, aversion: float) -> float:
+        """Best of unconstrained optima on each set of held symbols, without short positions"""
+        best = -np.inf
+        symbols = len(self.frontier.mean)
+        for size in range(1, symbols + 1):
+            for held in itertools.combinations(range(symbols), size):
+                held = list(held)
+                system = np.zeros((size + 1, size + 1))
+                system[:size, :size] = aversion * self.frontier.covariance[np.ix_(held, held)]
+                system[:size, size] = 1
+                system[size, :size] = 1
+                solution = np.linalg.solve(system, np.append(self.frontier.mean[held], 1))
+                if (solution[:size] >= 0).all():
+                    allocations = np.zeros(symbols)
+                    allocations[held] = solution[:size]
+                    best = max(best, self.get_utility(allocations, aversion))
+        return best
+
+    def test_parallel_sweep(self):
+        targets = self.frontier.get_targets(12)
+        expected = self.frontier.sweep_targets(targets)
+        result = self.frontier.sweep_targets(targets, workers=3)
+        np.testing.assert_array_almost_equal(expected.weights, result.weights, 5)
+        np.testing.assert_array_almost_equal(expected.risks, result.risks)
+
+
+if __name__ == '__main__':
+    unittest.main()